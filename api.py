@@ -0,0 +1,355 @@
+"""
+JSON API（/api/v1）：供自助借还机、移动端等客户端使用
+- 登录状态与网页共用Flask-Login会话（POST /api/v1/session 登录），除登录外的接口均需登录
+- 资源接口返回ETag，客户端带If-None-Match重复请求且内容未变时返回304
+- 列表接口可用fields参数只返回需要的字段，如?fields=id,title,is_borrowed
+"""
+from functools import wraps
+from flask import Blueprint, request, jsonify, url_for
+from flask_login import login_user, logout_user, current_user
+from sqlalchemy.orm import joinedload, contains_eager
+from werkzeug.exceptions import HTTPException
+from models import db, Publication, Copy, BorrowRecord, BorrowRecordArchive, Document, Hold
+from auth import authenticate
+from ingestion import create_document
+from search import search_publications
+from pagination import keyset_paginate, get_page_size
+from config import API_BATCH_MAX_IDS
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# ---------------- 工具函数 ----------------
+def api_login_required(view):
+    """未登录时返回401（而不是重定向到登录页）"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return error_response('未登录', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def error_response(message, status):
+    return jsonify({'error': message}), status
+
+
+def conditional_json(data, last_modified=None):
+    """返回带ETag（及Last-Modified）的JSON响应，请求的If-None-Match与ETag一致时返回304（不含响应体）"""
+    response = jsonify(data)
+    response.add_etag()
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response.make_conditional(request)
+
+
+def get_fields():
+    """请求参数fields指定的字段集合（未指定时返回None，表示全部字段）"""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+def serializer(to_dict, fields=None):
+    """按fields裁剪to_dict的结果"""
+    if fields is None:
+        return to_dict
+    return lambda item: {key: value for key, value in to_dict(item).items() if key in fields}
+
+
+def get_ids():
+    """
+    读取批量接口的ID列表：GET参数ids=1,2,3 或 POST JSON {"ids": [1, 2, 3]}
+    :return: (去重后的ID列表或None, 错误信息)
+    """
+    if request.method == 'POST':
+        raw = (request.get_json(silent=True) or {}).get('ids')
+    else:
+        raw = request.args.get('ids', '').split(',')
+    if not isinstance(raw, list):
+        return None, "ids必须是ID列表"
+    try:
+        ids = list(dict.fromkeys(int(value) for value in raw if str(value).strip()))
+    except (TypeError, ValueError):
+        return None, "ids必须是整数"
+    if not ids:
+        return None, "缺少ids参数"
+    if len(ids) > API_BATCH_MAX_IDS:
+        return None, f"单次最多查询{API_BATCH_MAX_IDS}个ID"
+    return ids, "成功"
+
+
+def get_owned_document(doc_id):
+    """获取当前用户可访问的文档（管理员可访问全部）；无权访问时按不存在处理"""
+    document = db.session.get(Document, doc_id)
+    if document is None or (document.uploader_id != current_user.id and current_user.role != 'admin'):
+        return None
+    return document
+
+
+@api.errorhandler(413)
+@api.errorhandler(HTTPException)
+def handle_http_error(error):
+    # API内的404、413等错误统一返回JSON（413需单独注册，否则会先匹配到app中按状态码注册的处理函数）
+    return error_response(error.description, error.code)
+
+
+# ---------------- 会话 ----------------
+@api.route('/session', methods=['POST'])
+def create_session():
+    data = request.get_json(silent=True) or request.form
+    user, message = authenticate(data.get('username', ''), data.get('password', ''))
+    if user is None:
+        return error_response(message, 401)
+    login_user(user)
+    return jsonify({'id': user.id, 'username': user.username, 'role': user.role})
+
+
+@api.route('/session', methods=['DELETE'])
+@api_login_required
+def delete_session():
+    logout_user()
+    return '', 204
+
+
+# ---------------- 出版物 ----------------
+@api.route('/publications')
+@api_login_required
+def list_publications():
+    """
+    出版物列表：有q参数时按相关度搜索（page分页），否则按ID倒序游标分页（cursor）
+    其他参数：type=book/magazine，available=1只返回可借的，fields、per_page
+    """
+    pub_type = request.args.get('type', 'all')
+    available_only = request.args.get('available') == '1'
+    to_dict = serializer(Publication.to_dict, get_fields())
+
+    keyword = request.args.get('q', '').strip()
+    if keyword:
+        page_num = max(request.args.get('page', 1, type=int), 1)
+        per_page = get_page_size()
+        publications, total = search_publications(keyword, pub_type, available_only=available_only,
+                                                  page=page_num, per_page=per_page)
+        return conditional_json({
+            'items': [to_dict(pub) for pub in publications],
+            'total': total,
+            'page': page_num,
+            'per_page': per_page
+        })
+
+    query = Publication.query
+    if available_only:
+        query = query.filter(Publication.available_copies > 0)
+    if pub_type != 'all':
+        query = query.filter_by(type=pub_type)
+    page = keyset_paginate(query, [Publication.id], request.args.get('cursor'))
+    return conditional_json(page.to_dict(to_dict))
+
+
+@api.route('/publications/<int:pub_id>')
+@api_login_required
+def get_publication(pub_id):
+    pub = db.session.get(Publication, pub_id)
+    if pub is None:
+        return error_response('出版物不存在', 404)
+    return conditional_json(serializer(Publication.to_dict, get_fields())(pub), pub.updated_at)
+
+
+@api.route('/publications/batch', methods=['GET', 'POST'])
+@api_login_required
+def batch_publications():
+    """按ID批量获取出版物（不存在的ID返回null）"""
+    ids, message = get_ids()
+    if ids is None:
+        return error_response(message, 400)
+    to_dict = serializer(Publication.to_dict, get_fields())
+    found = {pub.id: to_dict(pub) for pub in Publication.query.filter(Publication.id.in_(ids))}
+    return conditional_json({'items': {str(pub_id): found.get(pub_id) for pub_id in ids}})
+
+
+@api.route('/publications/availability', methods=['GET', 'POST'])
+@api_login_required
+def publication_availability():
+    """
+    批量查询可借状态（只读取副本数量列），不存在的ID返回null
+    同时返回排队人数和当前用户的预约（排队位置 = 预约号 - 叫号计数，每项O(1)）
+    """
+    ids, message = get_ids()
+    if ids is None:
+        return error_response(message, 400)
+    rows = db.session.query(Publication.id, Publication.available_copies, Publication.total_copies,
+                            Publication.hold_head, Publication.hold_tail) \
+        .filter(Publication.id.in_(ids)).all()
+    # 没有可借副本时返回最早的到期时间（一次分组查询）
+    next_due = dict(db.session.query(Copy.publication_id, db.func.min(Copy.due_date)).filter(
+        Copy.publication_id.in_([row.id for row in rows if row.available_copies == 0]),
+        Copy.status == 'borrowed'
+    ).group_by(Copy.publication_id).all())
+    my_holds = {hold.publication_id: hold for hold in db.session.query(
+        Hold.publication_id, Hold.status, Hold.ticket, Hold.expires_at
+    ).filter(Hold.user_id == current_user.id, Hold.publication_id.in_(ids),
+             Hold.status.in_(Hold.ACTIVE_STATUSES))}
+
+    def my_hold(row):
+        hold = my_holds.get(row.id)
+        if hold is None:
+            return None
+        return {
+            'status': hold.status,
+            'position': 0 if hold.status == 'ready' else hold.ticket - row.hold_head,
+            'expires_at': hold.expires_at.isoformat() if hold.expires_at else None
+        }
+
+    found = {row.id: {
+        'available': row.available_copies > 0,
+        'available_copies': row.available_copies,
+        'total_copies': row.total_copies,
+        'due_date': next_due[row.id].isoformat() if next_due.get(row.id) else None,
+        'hold_queue_length': row.hold_tail - row.hold_head,
+        'my_hold': my_hold(row)
+    } for row in rows}
+    return conditional_json({'items': {str(pub_id): found.get(pub_id) for pub_id in ids}})
+
+
+@api.route('/publications/<int:pub_id>/borrow', methods=['POST'])
+@api_login_required
+def borrow_publication(pub_id):
+    pub = db.session.get(Publication, pub_id)
+    if pub is None:
+        return error_response('出版物不存在', 404)
+
+    # 借阅失败（已被他人借出等）返回409
+    success, message = pub.borrow(current_user)
+    if not success:
+        return error_response(message, 409)
+    db.session.refresh(pub)
+    return jsonify({'message': message, 'publication': pub.to_dict()})
+
+
+@api.route('/publications/<int:pub_id>/return', methods=['POST'])
+@api_login_required
+def return_publication(pub_id):
+    pub = db.session.get(Publication, pub_id)
+    if pub is None:
+        return error_response('出版物不存在', 404)
+
+    # 只能归还自己借阅的出版物（条件UPDATE同时校验借阅人）
+    success, message = pub.return_book(current_user)
+    if not success:
+        return error_response(message, 409)
+    db.session.refresh(pub)
+    return jsonify({'message': message, 'publication': pub.to_dict()})
+
+
+@api.route('/publications/<int:pub_id>/hold', methods=['POST'])
+@api_login_required
+def hold_publication(pub_id):
+    """预约已借出（或已预留给他人）的出版物，返回201和预约（含排队位置）"""
+    pub = db.session.get(Publication, pub_id)
+    if pub is None:
+        return error_response('出版物不存在', 404)
+
+    success, message = pub.place_hold(current_user)
+    if not success:
+        return error_response(message, 409)
+    hold = Hold.query.filter(Hold.publication_id == pub_id, Hold.user_id == current_user.id,
+                             Hold.status.in_(Hold.ACTIVE_STATUSES)).first()
+    response = jsonify({'message': message, 'hold': hold.to_dict()})
+    response.headers['Location'] = url_for('api.my_holds')
+    return response, 201
+
+
+# ---------------- 预约 ----------------
+@api.route('/holds')
+@api_login_required
+def my_holds():
+    """当前用户有效的预约（排队中/已保留），按预约时间排序"""
+    holds = Hold.query.filter(Hold.user_id == current_user.id, Hold.status.in_(Hold.ACTIVE_STATUSES)) \
+        .join(Publication).options(contains_eager(Hold.publication)).order_by(Hold.created_at)
+    return conditional_json({'items': [hold.to_dict() for hold in holds]})
+
+
+@api.route('/holds/<int:hold_id>', methods=['DELETE'])
+@api_login_required
+def cancel_hold(hold_id):
+    hold = db.session.get(Hold, hold_id)
+    if hold is None or hold.user_id != current_user.id:
+        return error_response('预约不存在', 404)
+
+    success, message = hold.cancel()
+    if not success:
+        return error_response(message, 409)
+    return '', 204
+
+
+# ---------------- 借阅记录 ----------------
+@api.route('/loans')
+@api_login_required
+def my_loans():
+    """
+    当前用户的借阅记录（按借阅时间倒序游标分页），status=borrowed只返回未归还的；
+    archived=1时返回已归档的历史记录（见archive.py）
+    """
+    if request.args.get('archived') == '1':
+        model = BorrowRecordArchive
+        query = BorrowRecordArchive.query.filter_by(user_id=current_user.id).options(
+            joinedload(BorrowRecordArchive.publication))
+    else:
+        model = BorrowRecord
+        query = BorrowRecord.query.filter_by(user_id=current_user.id).options(
+            joinedload(BorrowRecord.publication), joinedload(BorrowRecord.copy))
+        status = request.args.get('status')
+        if status in ('borrowed', 'returned'):
+            query = query.filter_by(status=status)
+    page = keyset_paginate(query, [model.borrow_time, model.id], request.args.get('cursor'))
+    return jsonify(page.to_dict(serializer(model.to_dict, get_fields())))
+
+
+# ---------------- 文档 ----------------
+@api.route('/documents')
+@api_login_required
+def list_documents():
+    query = Document.query.filter_by(uploader_id=current_user.id)
+    page = keyset_paginate(query, [Document.upload_time, Document.id], request.args.get('cursor'))
+    return jsonify(page.to_dict(serializer(Document.to_dict, get_fields())))
+
+
+@api.route('/documents', methods=['POST'])
+@api_login_required
+def upload_document():
+    """上传文档（multipart字段file），返回202和文档状态，客户端通过Location轮询解析进度"""
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return error_response('未选择文件', 400)
+
+    document, message = create_document(file, current_user.id)
+    if document is None:
+        return error_response(message, 400)
+    status = 201 if document.status == 'done' else 202
+    response = jsonify({'message': message, 'document': document.to_status_dict()})
+    response.headers['Location'] = url_for('api.document_status', doc_id=document.id)
+    return response, status
+
+
+@api.route('/documents/<int:doc_id>')
+@api_login_required
+def document_status(doc_id):
+    document = get_owned_document(doc_id)
+    if document is None:
+        return error_response('文档不存在', 404)
+    return jsonify({**document.to_dict(), **document.to_status_dict()})
+
+
+@api.route('/documents/status', methods=['GET', 'POST'])
+@api_login_required
+def batch_document_status():
+    """批量查询解析状态（不存在或无权访问的ID返回null）"""
+    ids, message = get_ids()
+    if ids is None:
+        return error_response(message, 400)
+    query = Document.query.filter(Document.id.in_(ids))
+    if current_user.role != 'admin':
+        query = query.filter(Document.uploader_id == current_user.id)
+    found = {document.id: document.to_status_dict() for document in query}
+    return jsonify({'items': {str(doc_id): found.get(doc_id) for doc_id in ids}})
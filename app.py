@@ -1,24 +1,86 @@
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify
+import time
+
+# 记录应用启动耗时（Web进程不加载Marker模型，应在1秒内完成）
+_startup_begin = time.perf_counter()
+
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, \
+    stream_with_context, send_file
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 import pymysql
-from config import DB_CONFIG, SECRET_KEY, UPLOAD_FOLDER, MAX_BOOK_LOAN_DAYS, MAX_MAGAZINE_LOAN_DAYS
-from models import db, User, Publication, BorrowRecord, Document
-from utils import save_uploaded_file
+from config import DATABASE_URI, SECRET_KEY, UPLOAD_FOLDER, MAX_BOOK_LOAN_DAYS, MAX_MAGAZINE_LOAN_DAYS, \
+    MAX_UPLOAD_BYTES, INGESTION_WORKERS, INGESTION_MAX_QUEUED, INGESTION_JOB_TIMEOUT, MARKER_WARMUP, \
+    QUERY_COUNT_WARNING, DOCUMENT_PAGE_CHARS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, \
+    DB_POOL_PRE_PING, METRICS_TOKEN, MAX_COPIES_PER_ADD, BORROW_ARCHIVE_DAYS, REPORT_MAX_DAYS
+from models import db, User, Publication, Copy, BorrowRecord, BorrowRecordArchive, PublicationBorrowCount, \
+    Document, StatCounter, DocumentContentChunk, Hold, Report, CATALOGUE_VERSION
+from ingestion import ingestion_queue, create_document
+from api import api
+from http_cache import init_http_cache, catalogue_page, cached_fragment
+from search import search_publications, search_documents
+from pagination import keyset_paginate, get_page_size, wants_json, pager_url
+from instrumentation import init_query_tracking, TimedQueuePool, pool_stats, route_stats, slow_queries
+from metrics import registry
+from cache import content_cache
+from translation import chunk_cache
+from stats import get_dashboard_stats, get_statistics
+from catalog_io import import_publications, export_publications
+from overdue import get_overdue_summary
+from reports import report_queue, request_report, available_formats, REPORT_KINDS
+from upload_stream import UploadRequest
+from auth import authenticate, hash_password, load_cached_user, PasswordHashBusy
+import click
+from sqlalchemy.orm import joinedload, contains_eager
 import os
 from datetime import datetime, timedelta
 
 # 初始化Flask应用
 app = Flask(__name__)
+# 上传文件边接收边写盘并计算哈希（见upload_stream.py）
+app.request_class = UploadRequest
 app.config['SECRET_KEY'] = SECRET_KEY
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# 请求体超过上限时在读取前直接拒绝（413）
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 # 配置数据库
-app.config[
-    'SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['db']}?charset=utf8mb4"
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# 连接池配置（TimedQueuePool额外记录获取连接的等待时间，见/admin/metrics）
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'poolclass': TimedQueuePool,
+    'pool_size': DB_POOL_SIZE,
+    'max_overflow': DB_MAX_OVERFLOW,
+    'pool_timeout': DB_POOL_TIMEOUT,
+    'pool_recycle': DB_POOL_RECYCLE,
+    'pool_pre_ping': DB_POOL_PRE_PING
+}
+# 配置文档解析任务队列
+app.config['INGESTION_WORKERS'] = INGESTION_WORKERS
+app.config['INGESTION_MAX_QUEUED'] = INGESTION_MAX_QUEUED
+app.config['INGESTION_JOB_TIMEOUT'] = INGESTION_JOB_TIMEOUT
+app.config['MARKER_WARMUP'] = MARKER_WARMUP
+app.config['QUERY_COUNT_WARNING'] = QUERY_COUNT_WARNING
 
 # 初始化数据库
 db.init_app(app)
 
+# 统计每个请求执行的SQL（调试模式下通过响应头返回）
+init_query_tracking(app)
+
+# 初始化文档解析任务队列
+ingestion_queue.init_app(app)
+
+# 初始化统计报表生成队列
+report_queue.init_app(app)
+
+# 模板中生成翻页链接
+app.jinja_env.globals['pager_url'] = pager_url
+
+# JSON API（/api/v1）
+app.register_blueprint(api)
+
+# 静态文件指纹与响应压缩
+init_http_cache(app)
+
 # 初始化登录管理器
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -28,7 +90,15 @@ login_manager.login_view = 'login'
 # 用户加载回调
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # 进程内缓存USER_CACHE_TTL秒，避免每个请求查询一次用户表
+    return load_cached_user(int(user_id))
+
+
+# 上传文件超过大小上限
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    flash(f'文件过大（最大{MAX_UPLOAD_BYTES // (1024 * 1024)}MB）！', 'danger')
+    return redirect(request.url)
 
 
 # 主页（重定向到登录页）
@@ -51,15 +121,15 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        user = User.query.filter_by(username=username).first()
+        user, message = authenticate(username, password)
 
-        if user and user.check_password(password):
+        if user:
             login_user(user)
             flash('登录成功！', 'success')
             next_page = request.args.get('next')
             return redirect(next_page or url_for('index'))
         else:
-            flash('用户名或密码错误！', 'danger')
+            flash(f'{message}！', 'danger')
 
     return render_template('login.html')
 
@@ -85,8 +155,13 @@ def register():
 
         # 创建新用户（默认读者角色）
         user = User(username=username, role='reader')
-        user.set_password(password)
+        try:
+            user.password_hash = hash_password(password)
+        except PasswordHashBusy as e:
+            flash(f'{e}！', 'danger')
+            return render_template('register.html')
         db.session.add(user)
+        StatCounter.adjust('total_users', 1)
         db.session.commit()
 
         flash('注册成功，请登录！', 'success')
@@ -113,27 +188,28 @@ def admin_dashboard():
         flash('权限不足！', 'danger')
         return redirect(url_for('index'))
 
-    # 统计数据
-    total_books = Publication.query.filter_by(type='book').count()
-    total_magazines = Publication.query.filter_by(type='magazine').count()
-    borrowed_count = Publication.query.filter_by(is_borrowed=True).count()
-    overdue_count = Publication.query.filter(
-        Publication.is_borrowed == True,
-        Publication.due_date < datetime.utcnow()
-    ).count()
-    total_users = User.query.filter_by(role='reader').count()
+    # 统计数据（读取增量维护的计数器，?refresh=1时强制重新统计）
+    stats = get_dashboard_stats(force_refresh=request.args.get('refresh') == '1')
 
     return render_template('admin/dashboard.html',
-                           total_books=total_books,
-                           total_magazines=total_magazines,
-                           borrowed_count=borrowed_count,
-                           overdue_count=overdue_count,
-                           total_users=total_users)
+                           total_books=stats['total_books'],
+                           total_magazines=stats['total_magazines'],
+                           borrowed_count=stats['borrowed_count'],
+                           overdue_count=stats['overdue_count'],
+                           total_users=stats['total_users'])
 
 
 # 管理出版物
+def _publication_page_state():
+    """出版物管理页面的页面状态：本页出版物的(ID, 版本号)和下一页游标（只读取两列）"""
+    page = keyset_paginate(Publication.query.with_entities(Publication.id, Publication.version), [Publication.id],
+                           request.args.get('cursor'))
+    return page.next_cursor, tuple(tuple(row) for row in page.items)
+
+
 @app.route('/admin/publications', methods=['GET', 'POST'])
 @login_required
+@catalogue_page(_publication_page_state)
 def manage_publications():
     if current_user.role != 'admin':
         flash('权限不足！', 'danger')
@@ -148,6 +224,11 @@ def manage_publications():
         category = request.form.get('category', '技术')
         issue = request.form.get('issue', '')
         publisher = request.form.get('publisher', '')
+        copies = request.form.get('copies', 1, type=int)
+
+        if not copies or not 1 <= copies <= MAX_COPIES_PER_ADD:
+            flash(f'副本数量应为1~{MAX_COPIES_PER_ADD}！', 'danger')
+            return redirect(url_for('manage_publications'))
 
         # 检查ISBN是否重复（仅图书）
         if pub_type == 'book' and isbn and Publication.query.filter_by(isbn=isbn).first():
@@ -165,13 +246,26 @@ def manage_publications():
             publisher=publisher
         )
         db.session.add(publication)
+        db.session.flush()
+        publication.add_copies(copies)
+        StatCounter.adjust(publication.type_counter_name, 1)
+        StatCounter.adjust(CATALOGUE_VERSION, 1)
         db.session.commit()
         flash('添加成功！', 'success')
         return redirect(url_for('manage_publications'))
 
-    # 获取所有出版物
-    publications = Publication.query.all()
-    return render_template('admin/manage_publications.html', publications=publications)
+    # 分页获取出版物（按ID倒序，最新添加的在前）
+    if wants_json():
+        page = keyset_paginate(Publication.query, [Publication.id], request.args.get('cursor'))
+        return jsonify(page.to_dict(Publication.to_dict))
+
+    def render_listing():
+        page = keyset_paginate(Publication.query, [Publication.id], request.args.get('cursor'))
+        return render_template('admin/_publication_table.html', publications=page.items, page=page)
+
+    # 列表部分按查询参数、目录版本和本页出版物的版本号缓存
+    return render_template('admin/manage_publications.html',
+                           listing=cached_fragment(render_listing, _publication_page_state))
 
 
 # 删除出版物
@@ -183,12 +277,134 @@ def delete_publication(pub_id):
         return redirect(url_for('index'))
 
     pub = Publication.query.get_or_404(pub_id)
+    # 有副本未归还时不能删除
+    if Copy.query.filter_by(publication_id=pub.id, status='borrowed').first():
+        flash('该出版物有副本尚未归还，不能删除！', 'danger')
+        return redirect(url_for('manage_publications'))
+    # 有借阅历史（含已归档的记录）时不能删除：借阅记录和逾期记录引用该出版物及其副本
+    if BorrowRecord.query.filter_by(publication_id=pub.id).first() or \
+            BorrowRecordArchive.query.filter_by(publication_id=pub.id).first():
+        flash('该出版物有借阅记录，不能删除！', 'danger')
+        return redirect(url_for('manage_publications'))
+
+    StatCounter.adjust(pub.type_counter_name, -1)
+    StatCounter.adjust(CATALOGUE_VERSION, 1)
+    Hold.query.filter_by(publication_id=pub.id).delete(synchronize_session=False)
+    Copy.query.filter_by(publication_id=pub.id).delete(synchronize_session=False)
+    PublicationBorrowCount.query.filter_by(publication_id=pub.id).delete(synchronize_session=False)
     db.session.delete(pub)
     db.session.commit()
     flash('删除成功！', 'success')
     return redirect(url_for('manage_publications'))
 
 
+# 补充副本（有预约排队时新副本先预留给排在最前的预约者）
+@app.route('/admin/publications/<int:pub_id>/copies', methods=['POST'])
+@login_required
+def add_publication_copies(pub_id):
+    if current_user.role != 'admin':
+        flash('权限不足！', 'danger')
+        return redirect(url_for('index'))
+
+    pub = Publication.query.get_or_404(pub_id)
+    count = request.form.get('count', 1, type=int)
+    if not count or not 1 <= count <= MAX_COPIES_PER_ADD:
+        flash(f'副本数量应为1~{MAX_COPIES_PER_ADD}！', 'danger')
+        return redirect(url_for('manage_publications'))
+
+    pub.add_copies(count)
+    StatCounter.adjust(CATALOGUE_VERSION, 1)
+    db.session.commit()
+    flash(f'已为《{pub.title}》新增{count}个副本！', 'success')
+    return redirect(url_for('manage_publications'))
+
+
+# 批量导入出版物（CSV/JSONL）
+@app.route('/admin/publications/import', methods=['POST'])
+@login_required
+def import_publications_upload():
+    if current_user.role != 'admin':
+        flash('权限不足！', 'danger')
+        return redirect(url_for('index'))
+
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        flash('未选择文件！', 'danger')
+        return redirect(url_for('manage_publications'))
+
+    fmt = 'jsonl' if file.filename.lower().endswith(('.jsonl', '.json')) else 'csv'
+    report = import_publications(file.stream, fmt)
+
+    flash(f"导入完成：共{report['total']}行，成功{report['imported']}行，失败{report['error_count']}行",
+          'success' if report['error_count'] == 0 else 'warning')
+    # 只显示前10条错误明细
+    for line_no, message in report['errors'][:10]:
+        flash(f"第{line_no}行：{message}", 'danger')
+    return redirect(url_for('manage_publications'))
+
+
+# 流式导出出版物（CSV/JSONL）
+@app.route('/admin/publications/export')
+@login_required
+def export_publications_download():
+    if current_user.role != 'admin':
+        flash('权限不足！', 'danger')
+        return redirect(url_for('index'))
+
+    fmt = 'jsonl' if request.args.get('format') == 'jsonl' else 'csv'
+    mimetype = 'application/x-ndjson' if fmt == 'jsonl' else 'text/csv'
+    return Response(
+        stream_with_context(export_publications(fmt)),
+        mimetype=f'{mimetype}; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename=publications.{fmt}'}
+    )
+
+
+# 运行指标（连接池状态、各路由耗时、最近的慢查询、文件缓存命中情况）
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.role != 'admin':
+        return jsonify({'error': '权限不足'}), 403
+
+    return jsonify({
+        'pool': pool_stats(db.engine),
+        'routes': route_stats.to_dict(),
+        'slow_queries': list(slow_queries),
+        'caches': {'content': content_cache.stats(), 'translation': chunk_cache.stats()}
+    })
+
+
+# Prometheus指标（文本格式，每个进程各自计数）
+@app.route('/metrics')
+def prometheus_metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# 采集时读取的指标：连接池与解析队列状态
+registry.gauge('db_pool_checked_out', '已借出的数据库连接数', lambda: pool_stats(db.engine).get('checked_out', 0))
+registry.gauge('db_pool_overflow', '溢出的数据库连接数', lambda: pool_stats(db.engine).get('overflow', 0))
+registry.gauge('db_pool_checkouts_total', '获取数据库连接次数',
+               lambda: pool_stats(db.engine).get('checkouts', 0), type='counter')
+registry.gauge('db_pool_timeouts_total', '获取数据库连接超时次数',
+               lambda: pool_stats(db.engine).get('timeouts', 0), type='counter')
+registry.gauge('db_pool_wait_seconds_total', '获取数据库连接的累计等待时间（秒）',
+               lambda: pool_stats(db.engine).get('wait_total_ms', 0) / 1000, type='counter')
+registry.gauge('ingestion_queue_size', '排队/解析中的文档数', lambda: ingestion_queue.queued_count)
+registry.gauge('report_queue_size', '排队/生成中的统计报表数', lambda: report_queue.queued_count)
+
+# 文件缓存：content为解析结果缓存，translation为翻译分块缓存
+# （命中计数只统计本进程的读写，解析进程内的命中见document_jobs_total的cached状态）
+for _cache_name, _cache in (('content', content_cache), ('translation', chunk_cache)):
+    registry.gauge(f'{_cache_name}_cache_hits_total', '文件缓存命中次数', lambda c=_cache: c.hits, type='counter')
+    registry.gauge(f'{_cache_name}_cache_misses_total', '文件缓存未命中次数', lambda c=_cache: c.misses, type='counter')
+    registry.gauge(f'{_cache_name}_cache_evictions_total', '文件缓存淘汰次数', lambda c=_cache: c.evictions,
+                   type='counter')
+    registry.gauge(f'{_cache_name}_cache_bytes', '文件缓存占用字节数', lambda c=_cache: c.stats()['bytes'])
+
+
 # 借阅统计
 @app.route('/admin/statistics')
 @login_required
@@ -197,31 +413,76 @@ def admin_statistics():
         flash('权限不足！', 'danger')
         return redirect(url_for('index'))
 
-    # 按分类统计图书
-    category_stats = db.session.query(
-        Publication.category,
-        db.func.count(Publication.id)
-    ).filter_by(type='book').group_by(Publication.category).all()
-
-    # 借阅次数统计（前10）
-    borrow_stats = db.session.query(
-        Publication.title,
-        db.func.count(BorrowRecord.id)
-    ).join(BorrowRecord).group_by(Publication.id).order_by(db.func.count(BorrowRecord.id).desc()).limit(10).all()
-
-    # 逾期用户统计
-    overdue_users = db.session.query(
-        User.username,
-        db.func.count(Publication.id)
-    ).join(Publication, User.id == Publication.borrower_id).filter(
-        Publication.is_borrowed == True,
-        Publication.due_date < datetime.utcnow()
-    ).group_by(User.id).all()
+    # 统计结果按TTL缓存（?refresh=1时强制重新统计）
+    statistics = get_statistics(force_refresh=request.args.get('refresh') == '1')
 
     return render_template('admin/statistics.html',
-                           category_stats=category_stats,
-                           borrow_stats=borrow_stats,
-                           overdue_users=overdue_users)
+                           category_stats=statistics['category_stats'],
+                           borrow_stats=statistics['borrow_stats'],
+                           overdue_users=statistics['overdue_users'])
+
+
+# 统计报表：申请（按参数复用已有报表）和列表，报表由后台线程生成（见reports.py）
+@app.route('/admin/reports', methods=['GET', 'POST'])
+@login_required
+def admin_reports():
+    if current_user.role != 'admin':
+        flash('权限不足！', 'danger')
+        return redirect(url_for('index'))
+
+    if request.method == 'POST':
+        report, message = request_report(
+            request.form.get('kind'),
+            request.form.get('start_date', ''),
+            request.form.get('end_date', ''),
+            request.form.get('format', 'csv'),
+            current_user.id
+        )
+        if report is None:
+            flash(message, 'danger')
+            return redirect(url_for('admin_reports'))
+        if report.status == 'pending':
+            success, queue_message = report_queue.submit(report.id)
+            if not success:
+                flash(queue_message, 'warning')
+                return redirect(url_for('admin_reports'))
+        flash(message, 'success')
+        return redirect(url_for('admin_reports'))
+
+    reports = Report.query.options(joinedload(Report.requester)).order_by(Report.id.desc()).limit(50).all()
+    today = datetime.utcnow().date()
+    return render_template('admin/reports.html',
+                           reports=reports,
+                           report_kinds=REPORT_KINDS,
+                           formats=available_formats(),
+                           default_start=today - timedelta(days=29),
+                           default_end=today,
+                           max_days=REPORT_MAX_DAYS)
+
+
+# 查询报表生成状态
+@app.route('/admin/reports/<int:report_id>/status')
+@login_required
+def report_status(report_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': '权限不足'}), 403
+    report = Report.query.get_or_404(report_id)
+    return jsonify(report.to_status_dict())
+
+
+# 下载报表文件
+@app.route('/admin/reports/<int:report_id>/download')
+@login_required
+def download_report(report_id):
+    if current_user.role != 'admin':
+        flash('权限不足！', 'danger')
+        return redirect(url_for('index'))
+
+    report = Report.query.get_or_404(report_id)
+    if report.status != 'done' or not report.file_path or not os.path.exists(report.file_path):
+        flash('报表尚未生成或已过期，请重新申请！', 'warning')
+        return redirect(url_for('admin_reports'))
+    return send_file(report.file_path, as_attachment=True, download_name=report.download_name)
 
 
 # ---------------- 读者路由 ----------------
@@ -233,43 +494,97 @@ def reader_dashboard():
         flash('权限不足！', 'danger')
         return redirect(url_for('index'))
 
-    # 我的借阅
+    # 我的借阅（JOIN的同时填充publication关系，模板中访问出版物和副本不再逐条查询）
     my_borrows = BorrowRecord.query.filter_by(
         user_id=current_user.id,
         status='borrowed'
-    ).join(Publication).all()
+    ).join(Publication).options(contains_eager(BorrowRecord.publication), joinedload(BorrowRecord.copy)).all()
+
+    # 我的预约（排队位置由出版物的叫号计数算出，JOIN后无需额外查询）
+    my_holds = Hold.query.filter(
+        Hold.user_id == current_user.id,
+        Hold.status.in_(Hold.ACTIVE_STATUSES)
+    ).join(Publication).options(contains_eager(Hold.publication)).order_by(Hold.created_at).all()
 
-    # 逾期数量
-    overdue_count = sum(1 for br in my_borrows if br.publication.due_date < datetime.utcnow())
+    # 逾期数量和罚款（读取逾期扫描任务的结果）
+    overdue_count, overdue_fine = get_overdue_summary(current_user.id)
 
     return render_template('reader/dashboard.html',
                            my_borrows=my_borrows,
-                           overdue_count=overdue_count)
+                           my_holds=my_holds,
+                           overdue_count=overdue_count,
+                           overdue_fine=overdue_fine)
+
+
+def _borrowable_publications(search, pub_type, available_only=True, entities=None):
+    """
+    可借阅的出版物：有关键词时走全文索引（标题/作者/ISBN/出版商），按相关度分页（页码）；
+    无关键词时按ID游标分页
+    :param available_only: 是否只列出可直接借阅的（否则包含已借出/已预留的，供预约）
+    :param entities: 只查询这些列（供计算页面状态），None表示查询出版物对象
+    :return: 模板参数
+    """
+    if search:
+        page_num = max(request.args.get('page', 1, type=int), 1)
+        per_page = get_page_size()
+        publications, total = search_publications(search, pub_type, available_only=available_only,
+                                                  page=page_num, per_page=per_page, entities=entities)
+        return {'publications': publications, 'total': total, 'page_num': page_num, 'per_page': per_page}
+
+    query = Publication.query
+    if available_only:
+        query = query.filter(Publication.available_copies > 0)
+    if pub_type != 'all':
+        query = query.filter_by(type=pub_type)
+    if entities:
+        query = query.with_entities(*entities)
+    page = keyset_paginate(query, [Publication.id], request.args.get('cursor'))
+    return {'publications': page.items, 'page': page, 'total': None}
+
+
+def _borrow_filters():
+    """借阅页面的筛选条件：(关键词, 类型, 是否只列出可直接借阅的)（availability=all时包含已借出的，可预约）"""
+    return (request.args.get('search', ''), request.args.get('type', 'all'),
+            request.args.get('availability') != 'all')
+
+
+def _borrowable_page_state():
+    """借阅页面的页面状态：本页出版物的(ID, 版本号)、搜索结果总数和下一页游标（只读取两列）"""
+    result = _borrowable_publications(*_borrow_filters(), entities=(Publication.id, Publication.version))
+    page = result.get('page')
+    return (result['total'], page.next_cursor if page else None,
+            tuple(tuple(row) for row in result['publications']))
 
 
 # 借阅图书
 @app.route('/reader/borrow')
 @login_required
+@catalogue_page(_borrowable_page_state)
 def borrow_books():
     if current_user.role != 'reader':
         flash('权限不足！', 'danger')
         return redirect(url_for('index'))
 
-    # 搜索功能
-    search = request.args.get('search', '')
-    pub_type = request.args.get('type', 'all')
+    # 搜索功能（availability=all时包含已借出的出版物，可预约）
+    search, pub_type, available_only = _borrow_filters()
 
-    query = Publication.query.filter_by(is_borrowed=False)
-    if search:
-        query = query.filter(Publication.title.like(f'%{search}%'))
-    if pub_type != 'all':
-        query = query.filter_by(type=pub_type)
+    if wants_json():
+        result = _borrowable_publications(search, pub_type, available_only)
+        if search:
+            return jsonify({
+                'items': [pub.to_dict() for pub in result['publications']],
+                'total': result['total'],
+                'page': result['page_num'],
+                'per_page': result['per_page']
+            })
+        return jsonify(result['page'].to_dict(Publication.to_dict))
 
-    publications = query.all()
-    return render_template('reader/borrow_books.html',
-                           publications=publications,
-                           search=search,
-                           pub_type=pub_type)
+    # 列表部分按查询参数、目录版本和本页出版物的版本号缓存（本页出版物借还、增删出版物后失效）
+    listing = cached_fragment(lambda: render_template(
+        'reader/_publication_list.html', **_borrowable_publications(search, pub_type, available_only)
+    ), _borrowable_page_state)
+    return render_template('reader/borrow_books.html', listing=listing, search=search, pub_type=pub_type,
+                           available_only=available_only)
 
 
 # 执行借阅
@@ -279,50 +594,73 @@ def borrow_books():
 def do_borrow(pub_id):
     pub = Publication.query.get_or_404(pub_id)
 
-    # 检查是否已被借阅
-    if pub.is_borrowed:
-        flash('该出版物已被借出！', 'danger')
+    # 借阅逻辑统一由Publication.borrow完成（条件UPDATE，并发请求只有一个成功）
+    success, message = pub.borrow(current_user)
+    if not success:
+        flash(message, 'danger')
         return redirect(url_for('borrow_books'))
 
-    # 创建借阅记录
-    borrow_time = datetime.utcnow()
-    # 计算到期日期
-    loan_days = MAX_BOOK_LOAN_DAYS if pub.type == 'book' else MAX_MAGAZINE_LOAN_DAYS
-    due_date = borrow_time + timedelta(days=loan_days)
+    flash(message, 'success')
+    return redirect(url_for('my_borrows'))
 
-    record = BorrowRecord(
-        user_id=current_user.id,
-        publication_id=pub.id,
-        borrow_time=borrow_time,
-        due_date=due_date,  # 必须设置到期日期
-        status='borrowed'
-    )
 
-    # 更新出版物状态
-    pub.is_borrowed = True
+# 预约出版物（没有可借副本时排队）
+@app.route('/reader/hold/<int:pub_id>')
+@login_required
+def place_hold(pub_id):
+    if current_user.role != 'reader':
+        flash('权限不足！', 'danger')
+        return redirect(url_for('index'))
 
-    db.session.add(record)
-    db.session.commit()
+    pub = Publication.query.get_or_404(pub_id)
+    success, message = pub.place_hold(current_user)
+    flash(message, 'success' if success else 'danger')
+    return redirect(url_for('reader_dashboard') if success else url_for('borrow_books'))
 
-    flash(f'成功借阅《{pub.title}》！到期时间：{due_date.strftime("%Y-%m-%d")}', 'success')
-    return redirect(url_for('my_borrows'))
+
+# 取消预约
+@app.route('/reader/hold/cancel/<int:hold_id>')
+@login_required
+def cancel_hold(hold_id):
+    hold = Hold.query.get_or_404(hold_id)
+    if hold.user_id != current_user.id:
+        flash('你未预约该出版物！', 'danger')
+        return redirect(url_for('reader_dashboard'))
+
+    success, message = hold.cancel()
+    flash(message, 'success' if success else 'danger')
+    return redirect(url_for('reader_dashboard'))
 
 
 # 我的借阅记录
 @app.route('/reader/my_borrows')
 @login_required
 def my_borrows():
-    # 获取当前用户的所有借阅记录
-    borrow_records = BorrowRecord.query.filter_by(user_id=current_user.id).order_by(
-        BorrowRecord.borrow_time.desc()
-    ).all()
+    # 分页获取当前用户的借阅记录（按借阅时间倒序）；archived=1时翻阅已归档的历史记录
+    archived = request.args.get('archived') == '1'
+    if archived:
+        model = BorrowRecordArchive
+        query = BorrowRecordArchive.query.filter_by(user_id=current_user.id).options(
+            joinedload(BorrowRecordArchive.publication))
+    else:
+        model = BorrowRecord
+        query = BorrowRecord.query.filter_by(user_id=current_user.id).options(
+            joinedload(BorrowRecord.publication), joinedload(BorrowRecord.copy))
+    page = keyset_paginate(query,
+                           [model.borrow_time, model.id],
+                           request.args.get('cursor'))
+    if wants_json():
+        return jsonify(page.to_dict(model.to_dict))
 
     # 传入当前时间到模板（解决datetime未定义问题）
     current_time = datetime.utcnow()
 
     return render_template(
         'reader/my_borrows.html',
-        borrow_records=borrow_records,
+        borrow_records=page.items,
+        page=page,
+        archived=archived,
+        archive_days=BORROW_ARCHIVE_DAYS,
         current_time=current_time  # 新增：传入当前时间
     )
 
@@ -335,12 +673,12 @@ def do_return(pub_id):
         return redirect(url_for('index'))
 
     pub = Publication.query.get_or_404(pub_id)
-    # 检查是否是当前用户借阅的
-    if pub.borrower_id != current_user.id:
+    # 检查当前用户是否借阅了该出版物的副本
+    if not Copy.query.filter_by(publication_id=pub.id, borrower_id=current_user.id, status='borrowed').first():
         flash('你未借阅该出版物！', 'danger')
         return redirect(url_for('my_borrows'))
 
-    success, message = pub.return_book()
+    success, message = pub.return_book(current_user)
     if success:
         flash(message, 'success')
     else:
@@ -365,36 +703,32 @@ def upload_document():
             flash('未选择文件！', 'danger')
             return redirect(request.url)
 
-        # 保存并解析文件
-        result, message = save_uploaded_file(file)
-        if not result:
-            flash(message, 'danger')
+        document, message = create_document(file, current_user.id)
+        if document is None:
+            flash(f'{message}！', 'danger')
             return redirect(request.url)
 
-        # 保存到数据库
-        document = Document(
-            filename=result['filename'],
-            file_path=result['file_path'],
-            file_type=result['file_type'],
-            content=result['content'],
-            translated_content=result['translated_content'],
-            uploader_id=current_user.id
-        )
-        db.session.add(document)
-        db.session.commit()
-
-        flash('文档上传并解析成功！', 'success')
+        flash(f'{message}！', 'success')
         return redirect(url_for('upload_document'))
 
-    # 获取当前用户上传的文档
-    documents = Document.query.filter_by(uploader_id=current_user.id).order_by(
-        Document.upload_time.desc()
-    ).all()
+    # 搜索文档内容（原文/译文全文检索）
+    keyword = request.args.get('q', '').strip()
+    if keyword:
+        documents, _ = search_documents(keyword, uploader_id=current_user.id, per_page=get_page_size())
+        if wants_json():
+            return jsonify({'items': [doc.to_dict() for doc in documents]})
+        return render_template('document/upload.html', documents=documents, keyword=keyword, page=None)
+
+    # 分页获取当前用户上传的文档（文档内容分段保存在document_content_chunks表，列表不会加载）
+    query = Document.query.filter_by(uploader_id=current_user.id)
+    page = keyset_paginate(query, [Document.upload_time, Document.id], request.args.get('cursor'))
+    if wants_json():
+        return jsonify(page.to_dict(Document.to_dict))
 
-    return render_template('document/upload.html', documents=documents)
+    return render_template('document/upload.html', documents=page.items, keyword=keyword, page=page)
 
 
-# 查看文档内容
+# 查看文档内容（按页读取，每页DOCUMENT_PAGE_CHARS个字符）
 @app.route('/document/view/<int:doc_id>')
 @login_required
 def view_document(doc_id):
@@ -404,10 +738,77 @@ def view_document(doc_id):
         flash('无权访问该文档！', 'danger')
         return redirect(url_for('upload_document'))
 
-    return render_template('document/view.html', document=document)
+    page_count = max(1, -(-max(document.content_length, document.translated_length) // DOCUMENT_PAGE_CHARS))
+    page_num = min(max(request.args.get('page', 1, type=int), 1), page_count)
+    content, translated_content = DocumentContentChunk.read_slice(
+        document.id, (page_num - 1) * DOCUMENT_PAGE_CHARS, DOCUMENT_PAGE_CHARS)
+
+    return render_template('document/view.html',
+                           document=document,
+                           content=content,
+                           translated_content=translated_content,
+                           page_num=page_num,
+                           page_count=page_count)
+
+
+# 以纯文本流式输出完整的文档内容（原文或译文）
+@app.route('/document/content/<int:doc_id>')
+@login_required
+def document_content(doc_id):
+    document = Document.query.get_or_404(doc_id)
+    if document.uploader_id != current_user.id and current_user.role != 'admin':
+        flash('无权访问该文档！', 'danger')
+        return redirect(url_for('upload_document'))
+
+    translated = request.args.get('part') == 'translated'
+    return Response(
+        stream_with_context(DocumentContentChunk.iter_text(document.id, translated)),
+        mimetype='text/plain; charset=utf-8'
+    )
+
+
+# 查询文档解析状态
+@app.route('/document/status/<int:doc_id>')
+@login_required
+def document_status(doc_id):
+    document = Document.query.get_or_404(doc_id)
+    if document.uploader_id != current_user.id and current_user.role != 'admin':
+        return jsonify({'error': '无权访问该文档'}), 403
+
+    return jsonify(document.to_status_dict())
+
+
+# ---------------- 命令行 ----------------
+# 批量导入出版物：flask --app app import-publications books.csv
+@app.cli.command('import-publications')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='文件格式（默认按扩展名判断）')
+@click.option('--batch-size', default=1000, help='每批行数（每批一个事务）')
+def import_publications_command(path, fmt, batch_size):
+    fmt = fmt or ('jsonl' if path.lower().endswith(('.jsonl', '.json')) else 'csv')
+    with open(path, 'rb') as f:
+        report = import_publications(f, fmt, batch_size)
+    click.echo(f"共{report['total']}行，成功{report['imported']}行，失败{report['error_count']}行")
+    for line_no, message in report['errors']:
+        click.echo(f"第{line_no}行：{message}")
+
+
+# 导出出版物：flask --app app export-publications books.csv
+@app.cli.command('export-publications')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='文件格式（默认按扩展名判断）')
+def export_publications_command(path, fmt):
+    fmt = fmt or ('jsonl' if path.lower().endswith(('.jsonl', '.json')) else 'csv')
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in export_publications(fmt):
+            f.write(chunk)
+    click.echo(f"已导出到{path}")
 
 
+# 应用初始化耗时（秒）
+app.config['STARTUP_SECONDS'] = time.perf_counter() - _startup_begin
 
 
 if __name__ == '__main__':
+    print(f"应用初始化耗时：{app.config['STARTUP_SECONDS']:.3f}秒")
     app.run(debug=True, host='0.0.0.0', port=6700)
\ No newline at end of file
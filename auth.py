@@ -0,0 +1,150 @@
+"""
+登录与用户加载：
+- bcrypt哈希在有界线程池中计算，登录高峰时最多占用PASSWORD_HASH_WORKERS个CPU核，排队过多时直接提示繁忙
+- 已登录用户的信息在进程内缓存USER_CACHE_TTL秒，每个请求用merge(load=False)挂到当前会话，不再查询数据库
+"""
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session, make_transient_to_detached
+from models import db, User
+from config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, USER_CACHE_TTL, USER_CACHE_MAX_SIZE
+
+
+# ====================== 密码哈希 ======================
+class PasswordHashBusy(Exception):
+    """等待计算的密码哈希超过PASSWORD_HASH_MAX_PENDING"""
+
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def run_password_hash(func, *args):
+    """
+    在哈希线程池中执行func并等待结果（bcrypt计算时释放GIL，不影响其他请求线程）
+    :raises PasswordHashBusy: 排队的哈希计算过多
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashBusy("系统繁忙，请稍后再试")
+    try:
+        return _hash_executor.submit(func, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+def hash_password(password):
+    """在哈希线程池中计算密码哈希（用于注册、修改密码）"""
+    return run_password_hash(User.hash_password, password)
+
+
+def authenticate(username, password):
+    """
+    校验用户名和密码；BCRYPT_ROUNDS修改后，旧哈希在用户登录成功时按新成本重新计算
+    :param username: 用户名
+    :param password: 明文密码
+    :return: (用户对象或None, 提示信息)
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        return None, "用户名或密码错误"
+
+    try:
+        if not run_password_hash(user.check_password, password):
+            return None, "用户名或密码错误"
+        if user.needs_rehash():
+            user.password_hash = hash_password(password)
+            db.session.commit()
+    except PasswordHashBusy as e:
+        return None, str(e)
+    return user, "登录成功"
+
+
+# ====================== 用户缓存 ======================
+def _detached_copy(user):
+    """复制用户的列属性，生成不属于任何会话的副本（缓存中的对象不会被某个请求的会话修改）"""
+    copy = User(**{attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+class UserCache:
+    """用户信息的进程内TTL缓存（多线程安全）"""
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # user_id -> (过期时间, 用户副本)；TTL固定，插入顺序即过期顺序
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[user_id]
+                return None
+            return item[1]
+
+    def put(self, user):
+        if not self.ttl:
+            return
+        copy = _detached_copy(user)
+        with self._lock:
+            self._items.pop(user.id, None)
+            self._items[user.id] = (time.monotonic() + self.ttl, copy)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+user_cache = UserCache()
+
+
+def load_cached_user(user_id):
+    """
+    按ID加载用户（Flask-Login的user_loader）：命中缓存时合并到当前会话，不查询数据库
+    :param user_id: 用户ID
+    :return: 用户对象或None
+    """
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return db.session.merge(cached, load=False)
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.put(user)
+    return user
+
+
+# 用户被修改（角色、密码等）或删除时使缓存失效。flush时立即失效；提交时再失效一次，
+# 避免其他请求在flush与提交之间读到旧数据并重新缓存。其他进程的缓存最多延迟USER_CACHE_TTL秒。
+# 注意：db.update(User)等批量语句不触发这些事件，需自行调用user_cache.invalidate()
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_user_ids', None)
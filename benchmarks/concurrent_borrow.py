@@ -0,0 +1,126 @@
+"""
+并发借阅压测：大量读者同时借阅同一本出版物（有--copies个副本），断言恰好min(副本数, 请求数)个请求成功，
+且每个副本只借给一位读者
+用法：
+    python benchmarks/concurrent_borrow.py [--requests 300] [--threads 50] [--copies 1]
+
+数据库取自环境变量DATABASE_URL（未设置时使用临时SQLite文件并自动建表）。
+压测会创建名为loadtest_*的读者和一本压测用出版物，结束后删除。
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+
+import bcrypt
+from app import app
+from models import db, User, Publication, Copy, BorrowRecord, PublicationBorrowCount, Hold
+
+USER_PREFIX = 'loadtest_'
+
+
+def setup(n_users, n_copies):
+    """创建压测读者和出版物（n_copies个副本），返回(读者ID列表, 出版物ID)"""
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            db.create_all()
+        # 所有压测读者共用一个密码哈希（登录通过会话完成，不走bcrypt）
+        password_hash = bcrypt.hashpw(b'loadtest', bcrypt.gensalt()).decode('utf-8')
+        db.session.execute(db.insert(User), [
+            {'username': f'{USER_PREFIX}{i}', 'password_hash': password_hash, 'role': 'reader'}
+            for i in range(n_users)
+        ])
+        pub = Publication(title=f'{USER_PREFIX}热门图书', type='book')
+        db.session.add(pub)
+        db.session.flush()
+        pub.add_copies(n_copies)
+        db.session.commit()
+        user_ids = [u.id for u in User.query.filter(User.username.like(f'{USER_PREFIX}%')).order_by(User.id)]
+        return user_ids, pub.id
+
+
+def teardown(pub_id):
+    with app.app_context():
+        # 先删除引用出版物/副本的行（MySQL外键约束）
+        BorrowRecord.query.filter_by(publication_id=pub_id).delete()
+        Hold.query.filter_by(publication_id=pub_id).delete()
+        PublicationBorrowCount.query.filter_by(publication_id=pub_id).delete()
+        Copy.query.filter_by(publication_id=pub_id).delete()
+        Publication.query.filter_by(id=pub_id).delete()
+        User.query.filter(User.username.like(f'{USER_PREFIX}%')).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def borrow_once(user_id, pub_id, start_event):
+    """以user_id身份请求借阅，返回(结果, 耗时秒)"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    start_event.wait()
+    begin = time.perf_counter()
+    response = client.get(f'/reader/borrow/{pub_id}')
+    elapsed = time.perf_counter() - begin
+
+    if response.status_code != 302:
+        return f'error:{response.status_code}', elapsed
+    # 成功跳转到“我的借阅”，失败跳回借阅列表
+    return ('won' if response.headers['Location'].endswith('/reader/my_borrows') else 'lost'), elapsed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300, help='并发借阅请求数（每个请求一个读者）')
+    parser.add_argument('--threads', type=int, default=50, help='并发线程数')
+    parser.add_argument('--copies', type=int, default=1, help='出版物的副本数')
+    args = parser.parse_args()
+
+    user_ids, pub_id = setup(args.requests, args.copies)
+    expected = min(args.copies, args.requests)
+    start_event = threading.Event()
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            futures = [executor.submit(borrow_once, user_id, pub_id, start_event) for user_id in user_ids]
+            start_event.set()
+            results = [future.result() for future in futures]
+
+        outcomes = [outcome for outcome, _ in results]
+        latencies = [elapsed for _, elapsed in results]
+        won = outcomes.count('won')
+        errors = [outcome for outcome in outcomes if outcome.startswith('error')]
+        print(f"请求数：{len(outcomes)}，成功：{won}，失败：{outcomes.count('lost')}，错误：{len(errors)}")
+        print(f"单次借阅耗时：p50={percentile(latencies, 0.5) * 1000:.1f}ms "
+              f"p95={percentile(latencies, 0.95) * 1000:.1f}ms max={max(latencies) * 1000:.1f}ms")
+
+        with app.app_context():
+            records = BorrowRecord.query.filter_by(publication_id=pub_id).all()
+            pub = db.session.get(Publication, pub_id)
+            copies = {copy.id: copy for copy in Copy.query.filter_by(publication_id=pub_id)}
+            assert won == expected, f"应当恰好{expected}个请求借阅成功，实际{won}个"
+            assert not errors, f"出现错误响应：{errors[:5]}"
+            assert len(records) == expected, f"应当恰好{expected}条借阅记录，实际{len(records)}条"
+            assert len({record.copy_id for record in records}) == expected, "同一副本被借给了多位读者"
+            assert all(copies[record.copy_id].status == 'borrowed' and
+                       copies[record.copy_id].borrower_id == record.user_id for record in records), \
+                "副本借阅人与借阅记录不一致"
+            assert pub.available_copies == args.copies - expected, \
+                f"可借副本数应为{args.copies - expected}，实际{pub.available_copies}"
+        print(f"通过：恰好{expected}个请求借阅成功")
+    finally:
+        teardown(pub_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+HTTP压测：多个线程（各自登录、保持长连接）按权重随机请求主要路由，统计各路由的吞吐量和延迟分位数，
+结果保存为JSON（见results.py）
+用法：
+    python benchmarks/loadgen.py --url http://127.0.0.1:5000 --duration 30 --threads 16
+    python benchmarks/loadgen.py --serve --duration 30      # 在本进程中启动多线程服务（使用DATABASE_URL）
+
+需先用seed.py生成数据。默认包含借阅/归还写操作（会修改数据），--read-only只发送读请求。
+"""
+import os
+import sys
+import json
+import logging
+import time
+import random
+import argparse
+import threading
+from http.client import HTTPConnection, HTTPException
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, urlencode
+
+from seed import PASSWORD, USER_PREFIX, ADMIN_USERNAME
+from results import save_results
+
+SEARCH_WORDS = ['Python', 'Data', 'System', '算法', '编程', '数据库', '分布式']
+
+
+class HttpClient:
+    """单个虚拟用户的HTTP客户端（长连接，自动保存Cookie，连接断开时重连）"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        发送请求
+        :return: (状态码, 响应体)，网络错误时状态码为0
+        """
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        try:
+            if self.conn is None:
+                self.conn = HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (HTTPException, OSError):
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            return 0, b''
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie(header)
+            for name, morsel in cookie.items():
+                self.cookies[name] = morsel.value
+        return response.status, data
+
+    def post_json(self, path, data):
+        return self.request('POST', path, json.dumps(data), {'Content-Type': 'application/json'})
+
+    def login(self, username):
+        status, _ = self.post_json('/api/v1/session', {'username': username, 'password': PASSWORD})
+        return status == 200
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+# ====================== 场景 ======================
+# 场景函数发送一个或多个请求，返回[(路由名, 状态码, 耗时秒)]；READER/ADMIN_SCENARIOS中为(名称, 权重, 函数)
+def timed(client, name, method, path, **kwargs):
+    start = time.perf_counter()
+    if method == 'POST_JSON':
+        status, _ = client.post_json(path, kwargs['data'])
+    else:
+        status, _ = client.request(method, path)
+    return name, status, time.perf_counter() - start
+
+
+def scenario_borrow_books(client, ctx, rng):
+    params = {} if rng.random() < 0.7 else {'type': rng.choice(['book', 'magazine'])}
+    return [timed(client, 'borrow_books', 'GET', '/reader/borrow?' + urlencode(params))]
+
+
+def scenario_search(client, ctx, rng):
+    query = urlencode({'search': rng.choice(SEARCH_WORDS)})
+    return [timed(client, 'borrow_books_search', 'GET', f'/reader/borrow?{query}')]
+
+
+def scenario_my_borrows(client, ctx, rng):
+    return [timed(client, 'my_borrows', 'GET', '/reader/my_borrows')]
+
+
+def scenario_reader_dashboard(client, ctx, rng):
+    return [timed(client, 'reader_dashboard', 'GET', '/reader/dashboard')]
+
+
+def scenario_api_publication(client, ctx, rng):
+    return [timed(client, 'api_publication', 'GET', f"/api/v1/publications/{rng.randint(1, ctx['max_pub_id'])}")]
+
+
+def scenario_api_availability(client, ctx, rng):
+    ids = ','.join(str(rng.randint(1, ctx['max_pub_id'])) for _ in range(50))
+    return [timed(client, 'api_availability', 'GET', f'/api/v1/publications/availability?ids={ids}')]
+
+
+def scenario_borrow_return(client, ctx, rng):
+    pub_id = rng.randint(1, ctx['max_pub_id'])
+    results = [timed(client, 'api_borrow', 'POST_JSON', f'/api/v1/publications/{pub_id}/borrow', data={})]
+    # 借阅成功后立即归还，保持数据总体不变；409（已被借出）属于正常结果
+    if results[0][1] == 200:
+        results.append(timed(client, 'api_return', 'POST_JSON', f'/api/v1/publications/{pub_id}/return', data={}))
+    return results
+
+
+def scenario_admin_statistics(client, ctx, rng):
+    return [timed(client, 'admin_statistics', 'GET', '/admin/statistics')]
+
+
+def scenario_admin_dashboard(client, ctx, rng):
+    return [timed(client, 'admin_dashboard', 'GET', '/admin/dashboard')]
+
+
+def scenario_manage_publications(client, ctx, rng):
+    return [timed(client, 'manage_publications', 'GET', '/admin/publications')]
+
+
+READER_SCENARIOS = [
+    ('borrow_books', 30, scenario_borrow_books),
+    ('search', 20, scenario_search),
+    ('my_borrows', 15, scenario_my_borrows),
+    ('reader_dashboard', 10, scenario_reader_dashboard),
+    ('api_publication', 10, scenario_api_publication),
+    ('api_availability', 10, scenario_api_availability),
+    ('borrow_return', 5, scenario_borrow_return),
+]
+ADMIN_SCENARIOS = [
+    ('admin_statistics', 40, scenario_admin_statistics),
+    ('admin_dashboard', 30, scenario_admin_dashboard),
+    ('manage_publications', 30, scenario_manage_publications),
+]
+
+
+# ====================== 压测 ======================
+class Recorder:
+    """汇总各路由的请求结果（多线程安全）"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, results):
+        with self._lock:
+            for name, status, elapsed in results:
+                # 2xx/3xx和业务冲突（409）视为正常响应
+                if status and (status < 400 or status == 409):
+                    self.latencies.setdefault(name, []).append(elapsed)
+                else:
+                    self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(recorder, duration):
+    routes = {}
+    all_latencies = []
+    for name in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = sorted(recorder.latencies.get(name, []))
+        all_latencies.extend(values)
+        routes[name] = _stats(values, duration, recorder.errors.get(name, 0))
+    total = _stats(sorted(all_latencies), duration, sum(recorder.errors.values()))
+    return {'total': total, 'routes': routes}
+
+
+def _stats(values, duration, errors):
+    if not values:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / duration, 1),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2),
+        'p50_ms': round(percentile(values, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2)
+    }
+
+
+def worker(index, args, ctx, recorder, stop_at, warmup_until):
+    rng = random.Random(args.seed + index)
+    is_admin = index < args.admin_threads
+    scenarios = ADMIN_SCENARIOS if is_admin else [
+        s for s in READER_SCENARIOS if not (args.read_only and s[0] == 'borrow_return')
+    ]
+    _, weights, funcs = zip(*scenarios)
+
+    client = HttpClient(args.url, args.timeout)
+    username = ADMIN_USERNAME if is_admin else f"{USER_PREFIX}{rng.randint(1, args.users)}"
+    if not client.login(username):
+        print(f"线程{index}登录失败（{username}），请先运行seed.py")
+        return
+    try:
+        while time.monotonic() < stop_at:
+            results = rng.choices(funcs, weights)[0](client, ctx, rng)
+            if time.monotonic() >= warmup_until:
+                recorder.add(results)
+    finally:
+        client.close()
+
+
+def start_server():
+    """在本进程中启动多线程服务（随机端口），返回服务地址"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.serving import make_server
+    from app import app
+    # 不逐条打印访问日志（会拖慢服务并淹没结果）
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='服务地址')
+    parser.add_argument('--serve', action='store_true', help='在本进程中启动服务（忽略--url）')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒，不含预热）')
+    parser.add_argument('--warmup', type=float, default=5, help='预热时长（秒，不计入结果）')
+    parser.add_argument('--threads', type=int, default=16, help='并发虚拟用户数')
+    parser.add_argument('--admin-threads', type=int, default=1, help='其中以管理员身份访问的用户数')
+    parser.add_argument('--users', type=int, default=10000, help='seed.py生成的读者数量（随机选择登录账号）')
+    parser.add_argument('--read-only', action='store_true', help='不发送借阅/归还请求')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求超时（秒）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', default=None, help='结果文件路径（默认benchmarks/results/下自动命名）')
+    args = parser.parse_args()
+
+    if args.serve:
+        args.url = start_server()
+        print(f"服务已启动：{args.url}")
+
+    # 最大出版物ID（列表按ID倒序，第一条即最大ID）
+    probe = HttpClient(args.url, args.timeout)
+    if not probe.login(ADMIN_USERNAME):
+        print("无法以bench_admin登录，请确认服务地址并先运行seed.py")
+        return 1
+    status, body = probe.request('GET', '/api/v1/publications?per_page=1&fields=id')
+    probe.close()
+    items = json.loads(body)['items'] if status == 200 else []
+    ctx = {'max_pub_id': items[0]['id'] if items else 1}
+
+    recorder = Recorder()
+    warmup_until = time.monotonic() + args.warmup
+    stop_at = warmup_until + args.duration
+    threads = [threading.Thread(target=worker, args=(i, args, ctx, recorder, stop_at, warmup_until))
+               for i in range(args.threads)]
+    print(f"压测中：{args.threads}个并发用户，预热{args.warmup}秒，持续{args.duration}秒")
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    metrics = summarize(recorder, args.duration)
+    print(f"{'路由':<22}{'请求数':>8}{'错误':>6}{'RPS':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in list(metrics['routes'].items()) + [('总计', metrics['total'])]:
+        if not stats['requests']:
+            print(f"{name:<22}{0:>8}{stats['errors']:>6}")
+            continue
+        print(f"{name:<22}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>8}"
+              f"{stats['p50_ms']:>8.1f}ms{stats['p95_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms")
+    save_results('loadgen', args, metrics, args.output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
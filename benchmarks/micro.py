@@ -0,0 +1,177 @@
+"""
+微基准：文件哈希（generate_file_hash）、文档解析（parse_document）、长文本翻译（translate_text）
+翻译使用替身引擎bench_stub（不访问网络，可用--translate-latency模拟每次调用的延迟），不限流，
+分段缓存写入临时目录；分别测量无缓存（cold）和全部命中缓存（warm）两种情况。
+用法：
+    python benchmarks/micro.py [--sizes 1 10 100] [--text-kb 64 1024] [--repeat 5]
+    python benchmarks/micro.py --documents sample.pdf      # 另外解析指定文件（类型按扩展名）
+"""
+import os
+import sys
+import time
+import shutil
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translation
+from cache import ContentCache
+from utils import generate_file_hash, parse_document
+from results import save_results
+
+MB = 1024 * 1024
+STUB_TRANSLATOR = 'bench_stub'
+ENGLISH_WORDS = ['the', 'library', 'system', 'book', 'reader', 'borrow', 'return', 'data', 'query', 'index',
+                 'performance', 'cache', 'request', 'response', 'server', 'document', 'parse', 'translate']
+
+
+def measure(func, repeat, setup=None):
+    """
+    重复执行func并计时（setup在每次执行前调用，不计入耗时）
+    :return: {'best_s', 'median_s'}
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best_s': round(min(times), 6), 'median_s': round(statistics.median(times), 6)}
+
+
+def english_text(n_bytes, rng):
+    """生成约n_bytes字节的英文文本（每段若干句，每句若干词）"""
+    paragraphs = []
+    size = 0
+    while size < n_bytes:
+        sentences = [' '.join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(6, 18))).capitalize() + '.'
+                     for _ in range(rng.randint(2, 8))]
+        paragraph = ' '.join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 1
+    return '\n'.join(paragraphs)
+
+
+# ====================== 哈希 ======================
+def bench_hash(args, work_dir):
+    results = {}
+    for size_mb in args.sizes:
+        path = os.path.join(work_dir, f'hash_{size_mb}mb.bin')
+        with open(path, 'wb') as f:
+            block = os.urandom(MB)
+            for _ in range(size_mb):
+                f.write(block)
+
+        by_path = measure(lambda: generate_file_hash(path, is_stream=False), args.repeat)
+        with open(path, 'rb') as stream:
+            by_stream = measure(lambda: generate_file_hash(stream, is_stream=True), args.repeat)
+        os.remove(path)
+
+        results[f'{size_mb}mb'] = {
+            'path': {**by_path, 'mb_per_s': round(size_mb / by_path['best_s'], 1)},
+            'stream': {**by_stream, 'mb_per_s': round(size_mb / by_stream['best_s'], 1)}
+        }
+        print(f"  哈希 {size_mb}MB：路径{results[f'{size_mb}mb']['path']['mb_per_s']}MB/s，"
+              f"文件流{results[f'{size_mb}mb']['stream']['mb_per_s']}MB/s")
+    return results
+
+
+# ====================== 解析 ======================
+def make_documents(args, work_dir, rng):
+    """生成txt/md/docx样本（大小由--text-kb决定），返回[(名称, 路径, 类型)]"""
+    documents = []
+    for kb in args.text_kb:
+        text = english_text(kb * 1024, rng)
+        for file_type in ('txt', 'md'):
+            path = os.path.join(work_dir, f'sample_{kb}kb.{file_type}')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            documents.append((f'{file_type}_{kb}kb', path, file_type))
+
+        from docx import Document
+        doc = Document()
+        for paragraph in text.split('\n'):
+            doc.add_paragraph(paragraph)
+        path = os.path.join(work_dir, f'sample_{kb}kb.docx')
+        doc.save(path)
+        documents.append((f'docx_{kb}kb', path, 'docx'))
+
+    for path in args.documents:
+        file_type = path.rsplit('.', 1)[-1].lower()
+        documents.append((os.path.basename(path), path, file_type))
+    return documents
+
+
+def bench_parse(args, work_dir, rng):
+    results = {}
+    for name, path, file_type in make_documents(args, work_dir, rng):
+        chars = len(parse_document(path, file_type))
+        results[name] = {**measure(lambda: parse_document(path, file_type), args.repeat), 'chars': chars}
+        print(f"  解析 {name}：{results[name]['best_s'] * 1000:.1f}ms（{chars}字符）")
+    return results
+
+
+# ====================== 翻译 ======================
+def setup_stub_translator(latency):
+    """注册替身翻译引擎并关闭限流"""
+    def translate(text):
+        if latency:
+            time.sleep(latency)
+        return text.upper()
+
+    translation.register_translator(STUB_TRANSLATOR, translate)
+    translation._rate_limiter = translation.RateLimiter(0)
+
+
+def bench_translate(args, work_dir, rng):
+    setup_stub_translator(args.translate_latency)
+    cache_dir = os.path.join(work_dir, 'translation_cache')
+
+    def reset_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        translation.chunk_cache = ContentCache(cache_dir, 1024 * MB)
+
+    results = {}
+    for kb in args.text_kb:
+        text = english_text(kb * 1024, rng)
+        chunks = len(translation.split_chunks(text))
+        run = lambda: translation.translate_text(text, STUB_TRANSLATOR)
+        cold = measure(run, args.repeat, setup=reset_cache)
+        warm = measure(run, args.repeat)
+        results[f'{kb}kb'] = {'cold': cold, 'warm': warm, 'chunks': chunks}
+        print(f"  翻译 {kb}KB（{chunks}块）：无缓存{cold['best_s'] * 1000:.1f}ms，"
+              f"命中缓存{warm['best_s'] * 1000:.1f}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100], help='哈希测试的文件大小（MB）')
+    parser.add_argument('--text-kb', type=int, nargs='+', default=[64, 1024], help='解析/翻译测试的文本大小（KB）')
+    parser.add_argument('--documents', nargs='*', default=[], help='额外解析的文件（如PDF）')
+    parser.add_argument('--translate-latency', type=float, default=0, help='替身翻译引擎每次调用的延迟（秒）')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（决定生成的文本）')
+    parser.add_argument('--dir', default=None, help='临时目录（默认系统临时目录）')
+    parser.add_argument('--output', default=None, help='结果文件路径（默认benchmarks/results/下自动命名）')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(dir=args.dir)
+    try:
+        metrics = {
+            'generate_file_hash': bench_hash(args, work_dir),
+            'parse_document': bench_parse(args, work_dir, rng),
+            'translate_text': bench_translate(args, work_dir, rng)
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    save_results('micro', args, metrics, args.output)
+
+
+if __name__ == '__main__':
+    main()
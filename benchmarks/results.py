@@ -0,0 +1,134 @@
+"""
+基准测试结果的保存与对比：每次运行保存为一个JSON文件（记录提交、运行环境、参数和指标），
+不同提交的结果可以直接对比
+用法：
+    python benchmarks/results.py list
+    python benchmarks/results.py compare <旧结果.json> <新结果.json>
+"""
+import os
+import sys
+import json
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+from urllib.parse import urlsplit
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_info():
+    """当前提交（短哈希）及工作区是否有未提交的修改"""
+    def run(*args):
+        return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {'commit': run('rev-parse', '--short', 'HEAD') or 'unknown',
+                'dirty': bool(run('status', '--porcelain', '--untracked-files=no'))}
+    except OSError:
+        return {'commit': 'unknown', 'dirty': False}
+
+
+def environment():
+    """运行环境（数据库地址不含账号密码）"""
+    database_url = os.environ.get('DATABASE_URL', '')
+    parts = urlsplit(database_url)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'database': f"{parts.scheme}://{parts.hostname or ''}{parts.path}" if database_url else 'config.DATABASE_URI'
+    }
+
+
+def save_results(name, args, metrics, output=None):
+    """
+    保存一次运行的结果
+    :param name: 基准名称（如loadgen、micro）
+    :param args: 命令行参数（argparse.Namespace或字典）
+    :param metrics: 指标（可嵌套的字典，数值越小越好的耗时统一以_ms/_s结尾）
+    :param output: 结果文件路径（默认results/<时间>_<提交>_<名称>.json）
+    :return: 结果文件路径
+    """
+    info = git_info()
+    now = datetime.now()
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        suffix = '-dirty' if info['dirty'] else ''
+        output = os.path.join(RESULTS_DIR, f"{now:%Y%m%d-%H%M%S}_{info['commit']}{suffix}_{name}.json")
+    result = {
+        'name': name,
+        'created_at': now.isoformat(timespec='seconds'),
+        **info,
+        'environment': environment(),
+        'args': vars(args) if isinstance(args, argparse.Namespace) else dict(args),
+        'metrics': metrics
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存：{output}")
+    return output
+
+
+def flatten(metrics, prefix=''):
+    """将嵌套指标展开为{'a.b.c': 数值}"""
+    values = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(old_path, new_path):
+    """逐项对比两次结果的数值指标"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"旧：{old['commit']}（{old['created_at']}）  新：{new['commit']}（{new['created_at']}）")
+    if old['name'] != new['name']:
+        print(f"注意：对比的是不同的基准（{old['name']} / {new['name']}）")
+
+    old_values, new_values = flatten(old['metrics']), flatten(new['metrics'])
+    width = max((len(name) for name in new_values), default=10)
+    print(f"{'指标':<{width}}  {'旧':>12}  {'新':>12}  {'变化':>8}")
+    for name in sorted(set(old_values) | set(new_values)):
+        before, after = old_values.get(name), new_values.get(name)
+        if before is None or after is None:
+            change = '新增' if before is None else '删除'
+        elif before == 0:
+            change = '-'
+        else:
+            change = f"{(after - before) / abs(before) * 100:+.1f}%"
+        print(f"{name:<{width}}  {_format(before):>12}  {_format(after):>12}  {change:>8}")
+
+
+def _format(value):
+    if value is None:
+        return '-'
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='列出已保存的结果')
+    compare_parser = sub.add_parser('compare', help='对比两次结果')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        if not os.path.isdir(RESULTS_DIR):
+            return
+        for name in sorted(os.listdir(RESULTS_DIR)):
+            print(os.path.join(RESULTS_DIR, name))
+    else:
+        compare(args.old, args.new)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
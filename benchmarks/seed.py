@@ -0,0 +1,197 @@
+"""
+生成压测数据：向DATABASE_URL指向的数据库批量写入读者、出版物（每个出版物1~--max-copies个副本）和借阅记录
+用法：
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --publications 1000000 --borrow-records 10000000
+    DATABASE_URL=mysql+pymysql://root:pw@127.0.0.1/library_bench python benchmarks/seed.py --publications 100000
+
+SQLite数据库自动建表；MySQL需先执行python migrate.py upgrade。
+读者为bench_reader_<序号>、管理员为bench_admin，密码均为bench（loadgen.py用这些账号登录）。
+数据由--seed确定，相同参数生成的数据相同，便于不同提交之间对比；每个数据库只能生成一次。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from array import array
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert, func, select
+from app import app
+from models import db, User, Publication, Copy, BorrowRecord, StatCounter, CATALOGUE_VERSION
+from stats import rebuild_counters
+from archive import rebuild_borrow_counts
+from overdue import scan_overdue, register_reminder_sink
+
+PASSWORD = 'bench'
+USER_PREFIX = 'bench_reader_'
+ADMIN_USERNAME = 'bench_admin'
+
+WORDS = ['Python', 'Data', 'System', 'Design', 'Network', 'Learning', 'Database', 'Cloud', 'Security', 'Theory',
+         '算法', '编程', '数据', '系统', '网络', '设计', '分布式', '机器学习', '架构', '实践']
+CATEGORIES = ['编程', '算法', '数据库', '网络', '人工智能', '操作系统', '技术', '管理']
+PUBLISHERS = ['科技出版社', '电子工业出版社', '人民邮电出版社', 'O\'Reilly', 'ACM', 'IEEE']
+
+
+def insert_batches(table, rows, batch_size, label):
+    """按批插入（每批一个事务），返回插入行数"""
+    total = 0
+    start = time.perf_counter()
+    batch = []
+
+    def flush():
+        with db.engine.begin() as conn:
+            conn.execute(insert(table), batch)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+            total += len(batch)
+            batch = []
+            if total % (batch_size * 20) == 0:
+                print(f"  {label}：{total}行（{total / (time.perf_counter() - start):.0f}行/秒）")
+    if batch:
+        flush()
+        total += len(batch)
+    print(f"  {label}：共{total}行，耗时{time.perf_counter() - start:.1f}秒")
+    return total
+
+
+def next_id(model):
+    with db.engine.connect() as conn:
+        return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def seed(args):
+    rng = random.Random(args.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    # 所有压测账号共用一个密码哈希（按BCRYPT_ROUNDS计算）
+    password_hash = User.hash_password(PASSWORD)
+
+    # 用户
+    first_user = next_id(User)
+    users = [{'id': first_user, 'username': ADMIN_USERNAME, 'password_hash': password_hash, 'role': 'admin'}]
+    users += [{'id': first_user + i, 'username': f'{USER_PREFIX}{i}', 'password_hash': password_hash,
+               'role': 'reader'} for i in range(1, args.users + 1)]
+    insert_batches(User.__table__, users, args.batch_size, '用户')
+    reader_ids = range(first_user + 1, first_user + args.users + 1)
+
+    # 出版物及副本（约5%的副本已借出，其中一部分已逾期），同时为已借出的副本生成未归还的借阅记录
+    first_pub = next_id(Publication)
+    first_copy = next_id(Copy)
+    # 副本ID按出版物顺序连续分配：copy_starts[i]为第i个出版物第一个副本的序号（最后一项为副本总数）
+    copy_starts = array('L', [0])
+    # 已借出的副本：副本ID -> (出版物ID, 借阅人ID, 到期时间)
+    borrowed = {}
+
+    def publications():
+        for i in range(args.publications):
+            pub_id = first_pub + i
+            is_book = rng.random() < 0.8
+            title = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {pub_id}"
+            n_copies = rng.randint(1, args.max_copies)
+            available = n_copies
+            for copy_id in range(first_copy + copy_starts[-1], first_copy + copy_starts[-1] + n_copies):
+                if rng.random() < args.borrowed_ratio:
+                    # 到期时间在过去20天到未来14天之间，约一半已逾期
+                    borrowed[copy_id] = (pub_id, rng.choice(reader_ids),
+                                         now + timedelta(days=rng.uniform(-20, 14)))
+                    available -= 1
+            copy_starts.append(copy_starts[-1] + n_copies)
+            yield {
+                'id': pub_id, 'title': title, 'type': 'book' if is_book else 'magazine',
+                'author': f"作者{rng.randrange(10000)}" if is_book else None,
+                'isbn': f"978{pub_id:010d}" if is_book else None,
+                'category': rng.choice(CATEGORIES) if is_book else '技术',
+                'issue': None if is_book else f"{2000 + rng.randrange(25)}-{rng.randrange(1, 13):02d}",
+                'publisher': None if is_book else rng.choice(PUBLISHERS),
+                'is_latest': rng.random() < 0.3,
+                'total_copies': n_copies, 'available_copies': available,
+                'created_at': now, 'updated_at': now
+            }
+
+    insert_batches(Publication.__table__, publications(), args.batch_size, '出版物')
+
+    def copies():
+        for i in range(args.publications):
+            for copy_id in range(first_copy + copy_starts[i], first_copy + copy_starts[i + 1]):
+                _, borrower_id, due_date = borrowed.get(copy_id, (None, None, None))
+                yield {'id': copy_id, 'publication_id': first_pub + i,
+                       'status': 'borrowed' if borrower_id else 'available',
+                       'borrower_id': borrower_id, 'due_date': due_date, 'created_at': now, 'updated_at': now}
+
+    insert_batches(Copy.__table__, copies(), args.batch_size, '副本')
+
+    # 借阅记录：未归还的与副本状态一致；已归还的按热度偏斜分布（少数出版物被借阅很多次）
+    n_returned = max(0, args.borrow_records - len(borrowed))
+
+    def borrow_records():
+        for copy_id, (pub_id, user_id, due_date) in borrowed.items():
+            borrow_time = due_date - timedelta(days=14)
+            yield {'publication_id': pub_id, 'copy_id': copy_id, 'user_id': user_id, 'borrow_time': borrow_time,
+                   'return_time': None, 'status': 'borrowed', 'created_at': borrow_time}
+        for _ in range(n_returned):
+            borrow_time = now - timedelta(days=rng.uniform(15, 730))
+            pub_index = int(args.publications * rng.random() ** 3)
+            copy_index = rng.randrange(copy_starts[pub_index], copy_starts[pub_index + 1])
+            yield {
+                'publication_id': first_pub + pub_index,
+                'copy_id': first_copy + copy_index,
+                'user_id': rng.choice(reader_ids),
+                'borrow_time': borrow_time,
+                'return_time': borrow_time + timedelta(days=rng.uniform(1, 30)),
+                'status': 'returned',
+                'created_at': borrow_time
+            }
+
+    insert_batches(BorrowRecord.__table__, borrow_records(), args.batch_size, '借阅记录')
+
+    # 计数器、借阅次数与逾期状态
+    rebuild_counters()
+    rebuild_borrow_counts()
+    if db.session.get(StatCounter, CATALOGUE_VERSION) is None:
+        # 版本号不能与其他数据库中缓存过的版本重复，以时间戳起始
+        db.session.add(StatCounter(name=CATALOGUE_VERSION, value=int(time.time())))
+        db.session.commit()
+    if not args.skip_overdue_scan:
+        register_reminder_sink('discard', lambda reminders: None)
+        print(f"  逾期扫描：{scan_overdue(sink='discard')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--publications', type=int, default=100000, help='出版物数量')
+    parser.add_argument('--users', type=int, default=10000, help='读者数量')
+    parser.add_argument('--borrow-records', type=int, default=1000000, help='借阅记录数量（含未归还的）')
+    parser.add_argument('--max-copies', type=int, default=3, help='每个出版物的最大副本数（1~N随机）')
+    parser.add_argument('--borrowed-ratio', type=float, default=0.05, help='已借出的副本比例')
+    parser.add_argument('--batch-size', type=int, default=10000, help='每批插入行数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--skip-overdue-scan', action='store_true', help='不执行逾期扫描')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            db.create_all()
+
+            # 生成数据时关闭同步写盘，速度提高一个数量级（仅影响本进程的连接）
+            @event.listens_for(db.engine, 'connect')
+            def _fast_sqlite(dbapi_connection, connection_record):
+                dbapi_connection.execute('PRAGMA synchronous=OFF')
+                dbapi_connection.execute('PRAGMA journal_mode=WAL')
+            db.engine.dispose()
+
+        if db.session.query(User.id).filter_by(username=ADMIN_USERNAME).first():
+            print("数据库中已有压测数据，请换用新的数据库")
+            return 1
+
+        start = time.perf_counter()
+        seed(args)
+        print(f"完成，总耗时{time.perf_counter() - start:.1f}秒")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
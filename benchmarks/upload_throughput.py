@@ -0,0 +1,104 @@
+"""
+上传保存吞吐量对比：原实现（先落临时文件，再复制、再按4KB重读计算MD5）与
+边写入边计算哈希的实现（upload_stream.HashingFile，md5/blake2b）
+用法：
+    python benchmarks/upload_throughput.py [--sizes 10 100 1024] [--repeat 3]
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from upload_stream import HashingFile
+
+# werkzeug解析multipart时每次写入的数据块大小
+CHUNK_SIZE = 64 * 1024
+MB = 1024 * 1024
+
+
+def receive_chunks(size):
+    """模拟接收请求体：按CHUNK_SIZE产出共size字节的数据"""
+    block = os.urandom(MB)
+    sent = 0
+    while sent < size:
+        n = min(CHUNK_SIZE, size - sent)
+        offset = sent % MB
+        if offset + n > MB:
+            offset = 0
+        yield block[offset:offset + n]
+        sent += n
+
+
+def legacy_save(size, work_dir):
+    """原实现：werkzeug临时文件 -> 复制到临时路径 -> 按4KB重读计算MD5 -> 重命名"""
+    spool = tempfile.TemporaryFile(dir=work_dir)
+    for chunk in receive_chunks(size):
+        spool.write(chunk)
+    spool.seek(0)
+
+    temp_path = os.path.join(work_dir, 'legacy.part')
+    with open(temp_path, 'wb') as f:
+        shutil.copyfileobj(spool, f)
+    spool.close()
+
+    hash_md5 = hashlib.md5()
+    with open(temp_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4096), b""):
+            hash_md5.update(chunk)
+    final_path = os.path.join(work_dir, f"{hash_md5.hexdigest()}.bin")
+    os.rename(temp_path, final_path)
+    return final_path
+
+
+def streaming_save(size, work_dir, algorithm):
+    """新实现：接收时直接写入HashingFile并计算哈希 -> 原子移动"""
+    container = HashingFile(max_bytes=None, algorithm=algorithm, temp_dir=work_dir)
+    for chunk in receive_chunks(size):
+        container.write(chunk)
+    final_path = os.path.join(work_dir, f"{container.hexdigest()}.bin")
+    container.claim(final_path)
+    container.close()
+    return final_path
+
+
+def measure(func, size, repeat, work_dir):
+    """返回最好一次的吞吐量（MB/s）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path = func(size, work_dir)
+        elapsed = time.perf_counter() - start
+        os.remove(path)
+        best = elapsed if best is None else min(best, elapsed)
+    return size / MB / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1024], help='文件大小（MB）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取最好成绩）')
+    parser.add_argument('--dir', default=None, help='临时目录（默认系统临时目录，应与上传目录在同类磁盘上）')
+    args = parser.parse_args()
+
+    implementations = [
+        ('原实现（复制+重读MD5）', legacy_save),
+        ('边写边算（md5）', lambda size, work_dir: streaming_save(size, work_dir, 'md5')),
+        ('边写边算（blake2b）', lambda size, work_dir: streaming_save(size, work_dir, 'blake2b')),
+    ]
+    work_dir = tempfile.mkdtemp(dir=args.dir)
+    try:
+        print(f"{'大小':>8}  " + '  '.join(f"{name:>20}" for name, _ in implementations))
+        for size_mb in args.sizes:
+            results = [measure(func, size_mb * MB, args.repeat, work_dir) for _, func in implementations]
+            print(f"{size_mb:>6}MB  " + '  '.join(f"{mbps:>16.1f}MB/s" for mbps in results))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
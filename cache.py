@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+import threading
+from config import CONTENT_CACHE_DIR, CONTENT_CACHE_MAX_BYTES, PARSER_VERSION, TRANSLATOR
+
+
+class ContentCache:
+    """
+    基于文件的内容缓存（按内容哈希寻址）
+    每个条目保存为一个JSON文件，总大小超过上限时按最近访问时间淘汰；
+    多个进程可共享同一缓存目录，命中/未命中计数为进程内统计
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """由多个组成部分生成缓存键"""
+        return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """
+        读取缓存
+        :param key: 缓存键
+        :return: 缓存内容（字典）或None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # 更新访问时间，供淘汰策略使用
+            os.utime(path, None)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        写入缓存（先写临时文件再原子替换，避免其他进程读到半截内容）
+        :param key: 缓存键
+        :param value: 可JSON序列化的字典
+        """
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(temp_path)
+            # 覆盖已有条目时只计入大小的差值
+            try:
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"写入缓存失败：{e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            over_limit = self._current_bytes() > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _current_bytes(self):
+        # 首次使用时扫描目录统计总大小，之后在写入时累加
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._scan())
+        return self._total_bytes
+
+    def _scan(self):
+        """扫描缓存目录，返回[(路径, 大小, 最近访问时间)]"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """淘汰最久未访问的条目，直到总大小降到上限的90%以下"""
+        with self._lock:
+            entries = sorted(self._scan(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+            self._total_bytes = total
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self._current_bytes(),
+                'max_bytes': self.max_bytes
+            }
+
+
+# 文档解析/翻译结果缓存
+content_cache = ContentCache(CONTENT_CACHE_DIR, CONTENT_CACHE_MAX_BYTES)
+
+
+def parse_cache_key(file_hash):
+    """解析结果缓存键：文件哈希 + 解析器版本 + 翻译器"""
+    return ContentCache.make_key('parse', file_hash, PARSER_VERSION, TRANSLATOR)
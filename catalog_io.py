@@ -0,0 +1,202 @@
+import io
+import csv
+import json
+from models import db, Publication, Copy, StatCounter, CATALOGUE_VERSION
+from config import MAX_COPIES_PER_ADD
+
+# 导入/导出的出版物字段
+PUBLICATION_FIELDS = ['title', 'type', 'author', 'isbn', 'category', 'issue', 'publisher', 'is_latest',
+                      'total_copies']
+# 各字段最大长度（与models.py一致）
+FIELD_MAX_LENGTHS = {'title': 255, 'author': 100, 'isbn': 20, 'category': 50, 'issue': 20, 'publisher': 100}
+# 报告中最多保留的错误明细条数
+MAX_REPORTED_ERRORS = 1000
+
+
+# ====================== 导入 ======================
+def iter_rows(stream, fmt):
+    """
+    逐行读取导入文件（不一次性读入内存）
+    :param stream: 二进制文件流
+    :param fmt: csv/jsonl
+    :return: 生成器，产出(行号, 字典)
+    """
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text_stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'_error': f"JSON格式错误：{e}"}
+            yield line_no, row if isinstance(row, dict) else {'_error': "每行必须是JSON对象"}
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', '是')
+
+
+def validate_row(row):
+    """
+    校验并规范化一行数据
+    :return: (规范化后的字典/None, 错误信息/None)
+    """
+    if '_error' in row:
+        return None, row['_error']
+
+    values = {}
+    for field in PUBLICATION_FIELDS:
+        value = row.get(field)
+        values[field] = str(value).strip() if value is not None else ''
+
+    if not values['title']:
+        return None, "标题不能为空"
+    if values['type'] not in ('book', 'magazine'):
+        return None, f"类型必须为book或magazine：{values['type']}"
+    for field, max_length in FIELD_MAX_LENGTHS.items():
+        if len(values[field]) > max_length:
+            return None, f"{field}超过最大长度{max_length}"
+
+    # 空值统一存为NULL（ISBN有唯一约束，空字符串会互相冲突）
+    for field in ('author', 'isbn', 'issue', 'publisher'):
+        values[field] = values[field] or None
+    values['category'] = values['category'] or '技术'
+    values['is_latest'] = _parse_bool(row['is_latest']) if row.get('is_latest') not in (None, '') else True
+
+    # 副本数（默认1），导入的新出版物没有预约，副本全部可借
+    copies = values['total_copies'] or '1'
+    if not copies.isdigit() or int(copies) > MAX_COPIES_PER_ADD:
+        return None, f"total_copies应为0~{MAX_COPIES_PER_ADD}的整数：{copies}"
+    values['total_copies'] = values['available_copies'] = int(copies)
+    return values, None
+
+
+def _import_batch(batch, seen_isbns, report):
+    """校验、查重并插入一批数据（一个事务）"""
+    # 一次查询检查本批所有ISBN是否已存在
+    isbns = {values['isbn'] for _, values in batch if values['isbn']}
+    existing = set()
+    if isbns:
+        existing = {isbn for (isbn,) in db.session.query(Publication.isbn).filter(Publication.isbn.in_(isbns))}
+
+    rows = []
+    line_nos = []
+    for line_no, values in batch:
+        isbn = values['isbn']
+        if isbn and (isbn in existing or isbn in seen_isbns):
+            _add_error(report, line_no, f"ISBN已存在：{isbn}")
+            continue
+        if isbn:
+            seen_isbns.add(isbn)
+        rows.append(values)
+        line_nos.append(line_no)
+
+    if not rows:
+        return
+
+    try:
+        # executemany批量插入（插入前记录最大ID，插入后据此找出本批出版物并生成副本）
+        max_id = db.session.query(db.func.max(Publication.id)).scalar() or 0
+        db.session.execute(db.insert(Publication), rows)
+        _insert_copies(max_id)
+        StatCounter.adjust('total_books', sum(1 for row in rows if row['type'] == 'book'))
+        StatCounter.adjust('total_magazines', sum(1 for row in rows if row['type'] == 'magazine'))
+        StatCounter.adjust(CATALOGUE_VERSION, 1)
+        db.session.commit()
+        report['imported'] += len(rows)
+    except Exception as e:
+        db.session.rollback()
+        # 整批回滚：每一行都计一条错误，保证 total == imported + error_count
+        for line_no in line_nos:
+            _add_error(report, line_no, f"批量写入失败（第{line_nos[0]}行起的{len(rows)}行未导入）：{e}")
+
+
+def _insert_copies(max_id):
+    """
+    为ID大于max_id且还没有副本的出版物批量插入副本（数量为total_copies）
+    加锁读取：其他事务同时新增的出版物会等其提交后再判断，已有副本的不会重复生成
+    """
+    new_pubs = db.session.query(Publication.id, Publication.total_copies).filter(
+        Publication.id > max_id,
+        ~db.session.query(Copy.id).filter(Copy.publication_id == Publication.id).exists()
+    ).with_for_update().all()
+    copies = [{'publication_id': pub_id, 'status': 'available'}
+              for pub_id, total_copies in new_pubs for _ in range(total_copies)]
+    if copies:
+        db.session.execute(db.insert(Copy), copies)
+
+
+def _add_error(report, line_no, message):
+    report['error_count'] += 1
+    if len(report['errors']) < MAX_REPORTED_ERRORS:
+        report['errors'].append((line_no, message))
+
+
+def import_publications(stream, fmt='csv', batch_size=1000):
+    """
+    流式批量导入出版物：按批校验、按批查重、按批插入并提交
+    :param stream: 二进制文件流
+    :param fmt: csv/jsonl
+    :param batch_size: 每批行数（每批一个事务）
+    :return: 导入报告 {'total', 'imported', 'error_count', 'errors': [(行号, 错误信息)]}
+    """
+    report = {'total': 0, 'imported': 0, 'error_count': 0, 'errors': []}
+    seen_isbns = set()
+    batch = []
+    for line_no, row in iter_rows(stream, fmt):
+        report['total'] += 1
+        values, error = validate_row(row)
+        if error:
+            _add_error(report, line_no, error)
+            continue
+        batch.append((line_no, values))
+        if len(batch) >= batch_size:
+            _import_batch(batch, seen_isbns, report)
+            batch = []
+    if batch:
+        _import_batch(batch, seen_isbns, report)
+    return report
+
+
+# ====================== 导出 ======================
+def iter_publications(batch_size=1000):
+    """按ID游标分批读取全部出版物（不一次性加载整张表）"""
+    last_id = 0
+    while True:
+        batch = Publication.query.filter(Publication.id > last_id).order_by(Publication.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for pub in batch:
+            yield pub
+            # 释放已导出的对象，避免会话中累积整张表
+            db.session.expunge(pub)
+
+
+def export_publications(fmt='csv', batch_size=1000):
+    """
+    流式导出出版物
+    :param fmt: csv/jsonl
+    :return: 生成器，逐行产出文本
+    """
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(PUBLICATION_FIELDS)
+        for pub in iter_publications(batch_size):
+            writer.writerow([getattr(pub, field) if getattr(pub, field) is not None else ''
+                             for field in PUBLICATION_FIELDS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+    else:
+        for pub in iter_publications(batch_size):
+            yield json.dumps({field: getattr(pub, field) for field in PUBLICATION_FIELDS}, ensure_ascii=False) + '\n'
@@ -10,18 +10,125 @@ DB_CONFIG = {
     'charset': 'utf8mb4',
     'cursorclass': pymysql.cursors.DictCursor
 }
+# 数据库连接地址（可通过环境变量DATABASE_URL覆盖，如本地测试使用SQLite）
+DATABASE_URI = os.environ.get('DATABASE_URL') or \
+    f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['db']}?charset=utf8mb4"
 
 # Flask配置
 SECRET_KEY = os.urandom(24)  # 生产环境请固定密钥
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads/documents')
 ALLOWED_EXTENSIONS = {'txt', 'md', 'doc', 'docx', 'pdf'}
 
+# 上传配置
+MAX_UPLOAD_BYTES = 1024 * 1024 * 1024  # 单次上传大小上限（同时作为Flask的MAX_CONTENT_LENGTH）
+UPLOAD_TEMP_FOLDER = os.path.join(UPLOAD_FOLDER, 'tmp')  # 接收中的文件（与UPLOAD_FOLDER同一文件系统，便于原子移动）
+UPLOAD_BUFFER_SIZE = 1024 * 1024  # 上传文件写盘/哈希的缓冲区大小
+UPLOAD_HASH_ALGORITHM = 'md5'  # 文件哈希算法：md5/blake2b/sha256（blake2b在64位CPU上通常更快，修改后已有解析缓存会失效）
+
 # Marker PDF解析配置
 MARKER_CONFIG = { "output_format": "markdown", "use_llm": False, "force_ocr": False }
+MARKER_WARMUP = False  # 解析进程启动时是否预加载Marker模型（默认首次解析PDF时加载）
+PARSER_VERSION = '2'  # 解析逻辑变更时递增，使旧的解析缓存失效
+
+# 文档分段解析配置（解析进程边解析边翻译边写入，内存占用与文档大小无关）
+PARSE_SEGMENT_CHARS = 16000  # 文本/Word文档每段字符数
+PARSE_FLUSH_CHARS = 64000  # 累积该字符数后翻译一次并追加写入数据库、更新进度
+PARSE_CACHE_MAX_CHARS = 4 * 1024 * 1024  # 超过该字符数的文档不写入解析缓存（避免在内存中保留全文）
+PDF_PAGE_BATCH = 10  # PDF每批解析的页数
+PDF_TEXT_MIN_CHARS = 100  # 一批页平均每页文本层字符数不少于该值时直接使用PyPDF2提取，否则使用Marker
+
+# 翻译配置
+TRANSLATOR = os.environ.get('TRANSLATOR', 'youdao')  # 翻译引擎（translators库的引擎名），离线/测试环境可设为'local'
+TRANSLATION_CHUNK_CHARS = 2000  # 单次翻译请求的最大字符数（长段落按句子切分）
+TRANSLATION_WORKERS = 4  # 并发翻译线程数
+TRANSLATION_RATE_LIMIT = 5  # 每秒最多翻译请求数（0表示不限流）
+TRANSLATION_MAX_FAILURES = 3  # 同一任务中翻译连续失败该次数后不再调用翻译引擎（剩余内容保留原文）
+TRANSLATION_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'uploads/cache/chunks')
+TRANSLATION_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# 解析/翻译结果缓存配置（按文件内容哈希寻址）
+CONTENT_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'uploads/cache')
+CONTENT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 缓存总大小上限（超出后淘汰最久未访问的条目）
+
+# 文档解析任务队列配置
+INGESTION_WORKERS = 2  # 后台解析进程数
+INGESTION_MAX_QUEUED = 20  # 最大排队任务数（超出后拒绝新的上传）
+INGESTION_JOB_TIMEOUT = 3600  # 解析中任务超过该秒数视为中断，可被重新认领
+
+# 列表分页配置
+PAGE_SIZE = 20  # 每页默认条数（可通过请求参数per_page调整）
+MAX_PAGE_SIZE = 100  # 每页最大条数
+
+# JSON API配置
+API_BATCH_MAX_IDS = 200  # 批量接口（如可借状态）单次最多查询的ID数
+
+# HTTP缓存与压缩配置
+PAGE_CACHE_MAX_ENTRIES = 500  # 目录页面列表片段的进程内缓存条数
+COMPRESS_MIN_BYTES = 1024  # 响应小于该字节数时不压缩
+COMPRESS_LEVEL = 6  # gzip压缩级别（1~9）
+STATIC_MAX_AGE = 365 * 24 * 3600  # 带内容指纹的静态文件缓存时间（秒）
+
+# 文档查看配置
+DOCUMENT_PAGE_CHARS = 20000  # 查看文档时每页显示的字符数（原文和译文分别计算）
+
+# 统计配置
+STATS_CACHE_TTL = 60  # 逾期数量、借阅统计等随时间变化的数据缓存秒数
+
+# 数据库连接池配置（多进程部署时每个Web进程各自一个连接池，总连接数 = 进程数 × (DB_POOL_SIZE + DB_MAX_OVERFLOW)）
+DB_POOL_SIZE = 10  # 常驻连接数
+DB_MAX_OVERFLOW = 20  # 高峰时允许额外创建的连接数
+DB_POOL_TIMEOUT = 30  # 连接池耗尽时等待可用连接的秒数，超时报错
+DB_POOL_RECYCLE = 1800  # 连接使用超过该秒数后重建（应小于MySQL的wait_timeout，避免使用已被服务端断开的连接）
+DB_POOL_PRE_PING = True  # 取出连接时先检测是否可用（自动替换失效连接）
+
+# 性能日志配置
+SLOW_QUERY_SECONDS = 0.5  # 单条SQL超过该秒数时记录为慢查询（0表示不记录）
+SLOW_REQUEST_SECONDS = 1.0  # 请求处理超过该秒数时打印警告（0表示不检查）
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # /metrics接口的Bearer令牌（为空时不校验，应仅在内网开放）
+
+# 调试配置
+QUERY_COUNT_WARNING = 20  # 单个请求执行的SQL超过该数量时打印警告（0表示不检查）
 
 # 借阅配置
 MAX_BOOK_LOAN_DAYS = 14
 MAX_MAGAZINE_LOAN_DAYS = 7
 
+# 预约配置
+HOLD_PICKUP_DAYS = 3  # 出版物归还后为排在最前的预约者保留的天数（超时由定时扫描取消并顺延给下一位）
+HOLD_MAX_ACTIVE = 5  # 每位读者同时有效的预约数上限
+
+# 副本配置
+MAX_COPIES_PER_ADD = 100  # 添加出版物/补充副本时一次最多新增的副本数
+
+# 逾期/预约扫描配置（由cron等定时执行：python overdue.py）
+DUE_SOON_DAYS = 2  # 距到期不足该天数时发送到期提醒
+OVERDUE_FINE_PER_DAY = 0.5  # 每逾期一天的罚款（元）
+OVERDUE_REMIND_INTERVAL_HOURS = 24  # 同一借阅两次提醒的最小间隔
+OVERDUE_SCAN_BATCH_SIZE = 1000  # 每批扫描的借阅数（每批一个事务）
+REMINDER_SINK = 'stdout'  # 提醒发送方式：stdout/file
+REMINDER_FILE = os.path.join(os.path.dirname(__file__), 'uploads/reminders.jsonl')
+
+# 借阅记录归档配置（由cron等定时执行：python archive.py）
+BORROW_ARCHIVE_DAYS = 365  # 归还超过该天数的借阅记录移入归档表（我的借阅中的“历史记录”）
+BORROW_ARCHIVE_BATCH_SIZE = 5000  # 每批归档的记录数（每批一个事务）
+
+# 统计报表配置（管理员在借阅统计页申请，后台线程流式查询并写入CSV/XLSX文件）
+REPORT_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads/reports')  # 报表文件目录
+REPORT_WORKERS = 2  # 生成报表的后台线程数
+REPORT_MAX_QUEUED = 10  # 最大排队报表数（超出后拒绝新的申请）
+REPORT_JOB_TIMEOUT = 3600  # 生成中的报表超过该秒数视为中断，可被重新认领
+REPORT_MAX_DAYS = 366  # 单个报表的最大日期跨度（天）
+REPORT_CACHE_TTL = 3600  # 相同参数的报表生成后该秒数内直接复用，不重新生成
+REPORT_RETENTION_DAYS = 7  # 报表文件及记录的保留天数
+REPORT_FETCH_SIZE = 1000  # 流式查询每次从数据库读取的行数
+
+# 登录配置
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))  # bcrypt计算成本（每+1耗时翻倍；修改后用户下次登录时自动重新哈希）
+PASSWORD_HASH_WORKERS = 4  # 计算密码哈希的线程数（限制同时占用的CPU核数）
+PASSWORD_HASH_MAX_PENDING = 32  # 最多同时等待/计算的哈希数（超出时提示系统繁忙）
+USER_CACHE_TTL = 30  # 已登录用户信息的进程内缓存时间（秒，0表示不缓存）
+USER_CACHE_MAX_SIZE = 10000  # 缓存的最大用户数
+
 # 创建上传目录
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
\ No newline at end of file
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(REPORT_FOLDER, exist_ok=True)
\ No newline at end of file
@@ -3,7 +3,17 @@ CREATE DATABASE IF NOT EXISTS book_db DEFAULT CHARACTER SET utf8mb4 COLLATE utf8
 USE book_db;
 
 -- 手动创建表（如果ORM创建失败）
+-- 已有数据库请使用 python migrate.py upgrade 增量升级，不要重复执行本脚本
+DROP TABLE IF EXISTS schema_migrations;
+DROP TABLE IF EXISTS reports;
+DROP TABLE IF EXISTS stat_counters;
+DROP TABLE IF EXISTS publication_borrow_counts;
+DROP TABLE IF EXISTS borrow_records_archive;
+DROP TABLE IF EXISTS holds;
+DROP TABLE IF EXISTS overdue_loans;
 DROP TABLE IF EXISTS borrow_records;
+DROP TABLE IF EXISTS copies;
+DROP TABLE IF EXISTS document_content_chunks;
 DROP TABLE IF EXISTS documents;
 DROP TABLE IF EXISTS publications;
 DROP TABLE IF EXISTS users;
@@ -15,7 +25,8 @@ CREATE TABLE users (
     password_hash VARCHAR(255) NOT NULL,
     role VARCHAR(10) NOT NULL DEFAULT 'reader',
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX ix_users_role (role)
 );
 
 -- 出版物表
@@ -29,25 +40,83 @@ CREATE TABLE publications (
     issue VARCHAR(20),
     publisher VARCHAR(100),
     is_latest BOOLEAN DEFAULT TRUE,
-    is_borrowed BOOLEAN DEFAULT FALSE,
+    total_copies INT NOT NULL DEFAULT 0,
+    available_copies INT NOT NULL DEFAULT 0,
+    hold_head INT NOT NULL DEFAULT 0,
+    hold_tail INT NOT NULL DEFAULT 0,
+    version INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FULLTEXT INDEX ft_publications_text (title, author, isbn, publisher) WITH PARSER ngram,
+    INDEX ix_publications_type_category (type, category)
+);
+
+-- 副本表（借阅、归还、预留以副本为单位）
+CREATE TABLE copies (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    barcode VARCHAR(50) UNIQUE,
+    status VARCHAR(10) NOT NULL DEFAULT 'available',
     borrower_id INT,
     due_date DATETIME,
+    reserved_for_id INT,
+    reserved_until DATETIME,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (borrower_id) REFERENCES users(id)
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (borrower_id) REFERENCES users(id),
+    FOREIGN KEY (reserved_for_id) REFERENCES users(id),
+    INDEX ix_copies_pub_status (publication_id, status),
+    INDEX ix_copies_status_due (status, due_date),
+    INDEX ix_copies_borrower (borrower_id)
 );
 
 -- 借阅记录表
 CREATE TABLE borrow_records (
     id INT AUTO_INCREMENT PRIMARY KEY,
     publication_id INT NOT NULL,
+    copy_id INT,
     user_id INT NOT NULL,
     borrow_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     return_time DATETIME,
     status VARCHAR(10) DEFAULT 'borrowed',
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (publication_id) REFERENCES publications(id),
-    FOREIGN KEY (user_id) REFERENCES users(id)
+    CONSTRAINT fk_borrow_records_copy FOREIGN KEY (copy_id) REFERENCES copies(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_borrow_records_user_status (user_id, status),
+    INDEX ix_borrow_records_user_time (user_id, borrow_time),
+    INDEX ix_borrow_records_pub_status_time (publication_id, status, borrow_time),
+    INDEX ix_borrow_records_status_return (status, return_time),
+    INDEX ix_borrow_records_borrow_time (borrow_time)
+);
+
+-- 借阅记录归档表（归还已久的记录由python archive.py移入，保留原ID）
+CREATE TABLE borrow_records_archive (
+    id INT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    copy_id INT,
+    user_id INT NOT NULL,
+    borrow_time DATETIME,
+    return_time DATETIME,
+    status VARCHAR(10) DEFAULT 'returned',
+    created_at DATETIME,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_borrow_records_archive_user_time (user_id, borrow_time),
+    INDEX ix_borrow_records_archive_pub_time (publication_id, borrow_time),
+    INDEX ix_borrow_records_archive_borrow_time (borrow_time),
+    INDEX ix_borrow_records_archive_status_return (status, return_time)
+);
+
+-- 出版物借阅次数表（借阅时增量维护，供借阅排行使用）
+CREATE TABLE publication_borrow_counts (
+    publication_id INT PRIMARY KEY,
+    borrow_count BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    INDEX ix_publication_borrow_counts_count (borrow_count)
 );
 
 -- 文档表
@@ -56,13 +125,114 @@ CREATE TABLE documents (
     filename VARCHAR(255) NOT NULL,
     file_path VARCHAR(500) NOT NULL,
     file_type VARCHAR(10) NOT NULL,
-    content TEXT,
-    translated_content TEXT,
+    file_hash VARCHAR(64),
+    content_length INT NOT NULL DEFAULT 0,
+    translated_length INT NOT NULL DEFAULT 0,
     uploader_id INT NOT NULL,
     upload_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (uploader_id) REFERENCES users(id)
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    progress INT NOT NULL DEFAULT 0,
+    error VARCHAR(500),
+    started_at DATETIME,
+    finished_at DATETIME,
+    FOREIGN KEY (uploader_id) REFERENCES users(id),
+    INDEX ix_documents_uploader_time (uploader_id, upload_time)
+);
+
+-- 文档内容分块表（与documents表分离，列表查询不读取大字段；解析时按批追加插入）
+CREATE TABLE document_content_chunks (
+    document_id INT NOT NULL,
+    seq INT NOT NULL,
+    content_offset INT NOT NULL DEFAULT 0,
+    translated_offset INT NOT NULL DEFAULT 0,
+    content LONGTEXT,
+    translated LONGTEXT,
+    PRIMARY KEY (document_id, seq),
+    FOREIGN KEY (document_id) REFERENCES documents(id),
+    FULLTEXT INDEX ft_document_content_chunks (content, translated) WITH PARSER ngram
+);
+
+-- 仪表盘计数器表（首次访问仪表盘时自动全量统计）
+CREATE TABLE stat_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 逾期状态表（由python overdue.py定时扫描维护）
+CREATE TABLE overdue_loans (
+    copy_id INT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    user_id INT NOT NULL,
+    due_date DATETIME NOT NULL,
+    state VARCHAR(10) NOT NULL,
+    overdue_days INT NOT NULL DEFAULT 0,
+    fine DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    reminded_at DATETIME,
+    scanned_at DATETIME NOT NULL,
+    CONSTRAINT fk_overdue_loans_copy FOREIGN KEY (copy_id) REFERENCES copies(id),
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_overdue_loans_user_state (user_id, state),
+    INDEX ix_overdue_loans_state (state),
+    INDEX ix_overdue_loans_scanned_at (scanned_at)
+);
+
+-- 预约表（每本出版物一个先进先出队列，ticket为取号顺序）
+CREATE TABLE holds (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    user_id INT NOT NULL,
+    ticket INT NOT NULL,
+    copy_id INT,
+    status VARCHAR(10) NOT NULL DEFAULT 'waiting',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ready_at DATETIME,
+    expires_at DATETIME,
+    notified_at DATETIME,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    CONSTRAINT fk_holds_copy FOREIGN KEY (copy_id) REFERENCES copies(id),
+    UNIQUE KEY uq_holds_pub_ticket (publication_id, ticket),
+    INDEX ix_holds_pub_status_ticket (publication_id, status, ticket),
+    INDEX ix_holds_user_status (user_id, status),
+    INDEX ix_holds_status_expires (status, expires_at)
 );
 
+-- 统计报表表（后台生成的CSV/XLSX报表，见reports.py）
+CREATE TABLE reports (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(30) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    params_hash VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    row_count INT NOT NULL DEFAULT 0,
+    file_path VARCHAR(500),
+    file_size BIGINT,
+    error VARCHAR(500),
+    requested_by INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    FOREIGN KEY (requested_by) REFERENCES users(id),
+    INDEX ix_reports_params_status (params_hash, status),
+    INDEX ix_reports_status_started (status, started_at),
+    INDEX ix_reports_finished (finished_at)
+);
+
+-- 数据库迁移版本表（本脚本已包含以下全部迁移，见migrations目录）
+CREATE TABLE schema_migrations (
+    version VARCHAR(20) PRIMARY KEY,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO schema_migrations (version) VALUES ('0001'), ('0002'), ('0003'), ('0004'), ('0005'), ('0006'), ('0007'),
+    ('0008'), ('0009'), ('0010'), ('0011'), ('0012'), ('0013'), ('0014');
+
+-- 目录版本号（管理员增删出版物时+1，用于页面缓存失效；借还、预约只改变所涉及出版物的版本号，不写这一行）
+INSERT INTO stat_counters (name, value) VALUES ('catalogue_version', 1);
+
 -- 测试数据
 -- 1. 管理员用户（密码：admin123）
 INSERT INTO users (username, password_hash, role) VALUES 
@@ -91,13 +261,18 @@ INSERT INTO publications (title, type, issue, publisher, is_latest) VALUES
 ('网络安全技术与应用 2024年第1期', 'magazine', '2024-01', '网络安全杂志社', TRUE),
 ('大数据时代 2024年第2期', 'magazine', '2024-02', '大数据杂志社', TRUE);
 
--- 4. 借阅记录（测试）
-INSERT INTO borrow_records (publication_id, user_id, borrow_time, status) VALUES
-(1, 2, '2025-11-01 10:00:00', 'borrowed'),
-(2, 3, '2025-11-10 14:00:00', 'returned'),
-(3, 2, '2025-10-15 09:00:00', 'returned');
+-- 4. 副本（每个出版物2个副本，副本ID 1~15为第一个副本）
+INSERT INTO copies (publication_id) SELECT id FROM publications ORDER BY id;
+INSERT INTO copies (publication_id) SELECT id FROM publications ORDER BY id;
+UPDATE publications SET total_copies = 2, available_copies = 2;
+
+-- 5. 借阅记录（测试）
+INSERT INTO borrow_records (publication_id, copy_id, user_id, borrow_time, status) VALUES
+(1, 1, 2, '2025-11-01 10:00:00', 'borrowed'),
+(2, 2, 3, '2025-11-10 14:00:00', 'returned'),
+(3, 3, 2, '2025-10-15 09:00:00', 'returned');
 
--- 更新出版物借阅状态
-UPDATE publications SET is_borrowed = TRUE, borrower_id = 2, due_date = '2025-11-15 10:00:00' WHERE id = 1;
-UPDATE publications SET is_borrowed = FALSE, borrower_id = NULL, due_date = NULL WHERE id = 2;
-UPDATE publications SET is_borrowed = FALSE, borrower_id = NULL, due_date = NULL WHERE id = 3;
+-- 更新副本借阅状态
+UPDATE copies SET status = 'borrowed', borrower_id = 2, due_date = '2025-11-15 10:00:00' WHERE id = 1;
+UPDATE publications SET available_copies = 1 WHERE id = 1;
+INSERT INTO publication_borrow_counts (publication_id, borrow_count) VALUES (1, 1), (2, 1), (3, 1);
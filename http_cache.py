@@ -0,0 +1,236 @@
+"""
+HTTP缓存与压缩：
+- 目录版本号（stat_counters中的catalogue_version）：管理员增删出版物时在同一事务中+1
+- 页面状态：页面上出版物的(ID, 版本号)，由只读取这两列的查询得到；借还、预约只改变所涉及出版物的版本号，
+  不写全局计数器，也不会让其他页面的缓存失效
+- 目录页面中与用户无关的列表片段按（路由, 查询参数, 目录版本, 页面状态）缓存在进程内，变化后自然失效
+- 目录页面返回ETag（私有缓存，每次向服务器确认），未变化时直接返回304
+- 文本类响应gzip压缩（安装brotli时优先使用br）
+- 静态文件URL带内容指纹（?v=xxx），带正确指纹的请求可被浏览器长期缓存
+"""
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import g, request, session, make_response, Response, current_app
+from flask_login import current_user
+from markupsafe import Markup
+from models import db, StatCounter, CATALOGUE_VERSION
+from pagination import wants_json
+from config import PAGE_CACHE_MAX_ENTRIES, COMPRESS_MIN_BYTES, COMPRESS_LEVEL, STATIC_MAX_AGE
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+class LRUCache:
+    """进程内LRU缓存（多线程安全）"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+page_cache = LRUCache(PAGE_CACHE_MAX_ENTRIES)
+_compressed_static = LRUCache(64)
+
+
+# ====================== 目录版本 ======================
+def get_catalogue_state():
+    """
+    读取目录版本（一次主键查询，同一请求内只读一次）
+    :return: 版本号；计数器未初始化（未执行迁移0008）时返回None，此时不做缓存
+    """
+    if 'catalogue_state' not in g:
+        counter = db.session.get(StatCounter, CATALOGUE_VERSION)
+        g.catalogue_state = counter.value if counter else None
+    return g.catalogue_state
+
+
+def get_page_state(page_state):
+    """
+    计算页面状态（同一请求内只计算一次）
+    :param page_state: 返回页面上出版物的(ID, 版本号)等可哈希值的函数
+    """
+    if 'page_state' not in g:
+        g.page_state = page_state()
+    return g.page_state
+
+
+def cached_fragment(render, page_state):
+    """
+    按（路由, 查询参数, 目录版本, 页面状态）缓存render()渲染的页面片段；片段中不能包含与当前用户有关的内容
+    :param render: 执行查询并渲染片段的函数
+    :param page_state: 计算页面状态的函数（见get_page_state）
+    :return: 片段HTML（Markup）
+    """
+    version = get_catalogue_state()
+    if version is None:
+        return Markup(render())
+    key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), version, get_page_state(page_state))
+    html = page_cache.get(key)
+    if html is None:
+        html = Markup(render())
+        page_cache.put(key, html)
+    return html
+
+
+def catalogue_page(page_state):
+    """
+    目录页面的条件请求：ETag由（目录版本、页面状态、当前用户、URL、静态文件版本）生成，
+    与If-None-Match一致时不执行视图直接返回304；有待显示的提示消息时不参与缓存
+    :param page_state: 计算页面状态的函数（见get_page_state），视图中的cached_fragment应使用同一函数
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = get_catalogue_state()
+            if version is None or request.method != 'GET' or wants_json() or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            etag = hashlib.sha1('|'.join(str(part) for part in (
+                version, get_page_state(page_state), current_user.get_id(), current_user.role, request.full_path,
+                static_version()
+            )).encode('utf-8')).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+# ====================== 静态文件指纹 ======================
+_fingerprints = {}
+_static_version = None
+
+
+def static_fingerprint(filename):
+    """静态文件内容的MD5前12位（按修改时间缓存，文件修改后自动更新）"""
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _fingerprints.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.md5(f.read()).hexdigest()[:12])
+        _fingerprints[filename] = cached
+    return cached[1]
+
+
+def static_version():
+    """全部静态文件的版本（路径、大小、修改时间的哈希，同一次部署的多个进程结果一致）"""
+    global _static_version
+    if _static_version is None:
+        digest = hashlib.md5()
+        for root, _, files in sorted(os.walk(current_app.static_folder)):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f"{os.path.join(root, name)}|{stat.st_size}|{stat.st_mtime}".encode('utf-8'))
+        _static_version = digest.hexdigest()[:12]
+    return _static_version
+
+
+# ====================== 压缩 ======================
+def _choose_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+def compress_response(response):
+    """压缩文本类响应（流式响应不压缩；静态文件的压缩结果按ETag缓存）"""
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or not response.mimetype.startswith(COMPRESSIBLE_TYPES)):
+        return response
+    is_static = request.endpoint == 'static'
+    if response.direct_passthrough:
+        if not is_static:
+            return response
+        # 静态文件（css/js）较小，读入内存后压缩
+        response.direct_passthrough = False
+    elif response.is_streamed:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    encoding = _choose_encoding()
+    if encoding is None or (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+
+    etag, weak = response.get_etag()
+    cache_key = (request.path, etag, encoding) if is_static and etag else None
+    data = _compressed_static.get(cache_key) if cache_key else None
+    if data is None:
+        data = _compress(response.get_data(), encoding)
+        if cache_key:
+            _compressed_static.put(cache_key, data)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后内容与未压缩时不同，改为弱ETag（If-None-Match按弱比较，条件请求仍然有效）
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_http_cache(app):
+    """注册静态文件指纹和响应压缩"""
+
+    @app.url_defaults
+    def _add_static_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            fingerprint = static_fingerprint(values['filename'])
+            if fingerprint:
+                values['v'] = fingerprint
+
+    @app.after_request
+    def _cache_and_compress(response):
+        # 带正确指纹的静态文件内容不会改变，允许长期缓存
+        if request.endpoint == 'static' and response.status_code == 200 and request.args.get('v') and \
+                request.args.get('v') == static_fingerprint(request.view_args['filename']):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return compress_response(response)
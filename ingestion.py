@@ -0,0 +1,316 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, select, insert, update, delete, or_, and_
+from models import db, Document, DocumentContentChunk
+from utils import iter_document_segments, translate_text, warm_up_pdf_converter, save_uploaded_file
+from config import PARSE_FLUSH_CHARS, PARSE_CACHE_MAX_CHARS, DB_POOL_RECYCLE
+from cache import content_cache, parse_cache_key
+from metrics import record_ingestion_job, UPLOADS, UPLOAD_BYTES
+from translation import TranslationBreaker
+from job_queue import JobQueue
+
+# ====================== 工作进程部分 ======================
+# 每个解析进程独立创建数据库引擎（不与Web进程共享连接）
+_worker_engine = None
+_job_timeout = 3600
+
+
+def _init_worker(database_uri, job_timeout, warm_up_marker):
+    """解析进程初始化：创建独立的数据库引擎，按需预热Marker模型"""
+    global _worker_engine, _job_timeout
+    # 解析进程单线程执行任务，使用默认连接池大小即可
+    _worker_engine = create_engine(database_uri, pool_pre_ping=True, pool_recycle=DB_POOL_RECYCLE)
+    _job_timeout = job_timeout
+    if warm_up_marker:
+        warm_up_pdf_converter()
+
+
+def _update_document(doc_id, **values):
+    """在工作进程中更新文档记录"""
+    documents = Document.__table__
+    with _worker_engine.begin() as conn:
+        conn.execute(update(documents).where(documents.c.id == doc_id).values(**values))
+
+
+def _save_document_content(doc_id, content, translated_content):
+    """在同一事务中分块写入文档内容（document_content_chunks表）并标记解析完成"""
+    documents = Document.__table__
+    chunks = DocumentContentChunk.__table__
+    with _worker_engine.begin() as conn:
+        # 重新解析时覆盖旧内容
+        conn.execute(delete(chunks).where(chunks.c.document_id == doc_id))
+        rows = DocumentContentChunk.split(content, translated_content)
+        if rows:
+            conn.execute(insert(chunks), [dict(row, document_id=doc_id) for row in rows])
+        conn.execute(update(documents).where(documents.c.id == doc_id).values(
+            status='done',
+            progress=100,
+            content_length=len(content or ''),
+            translated_length=len(translated_content or ''),
+            finished_at=datetime.utcnow()
+        ))
+
+
+def _claim_document(doc_id):
+    """
+    认领解析任务（条件更新，避免多个进程重复解析同一文档）
+    :return: 文档行（file_path, file_type, file_hash）或None
+    """
+    documents = Document.__table__
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=_job_timeout)
+    with _worker_engine.begin() as conn:
+        result = conn.execute(
+            update(documents).where(
+                documents.c.id == doc_id,
+                or_(documents.c.status == 'pending',
+                    and_(documents.c.status == 'processing', documents.c.started_at < stale_before))
+            ).values(status='processing', progress=10, started_at=now, error=None)
+        )
+        if result.rowcount == 0:
+            return None
+        return conn.execute(
+            select(documents.c.file_path, documents.c.file_type, documents.c.file_hash)
+            .where(documents.c.id == doc_id)
+        ).first()
+
+
+def _start_document_content(doc_id):
+    """清空文档内容（重新解析时覆盖旧内容），准备追加写入"""
+    documents = Document.__table__
+    chunks = DocumentContentChunk.__table__
+    with _worker_engine.begin() as conn:
+        conn.execute(delete(chunks).where(chunks.c.document_id == doc_id))
+        conn.execute(update(documents).where(documents.c.id == doc_id).values(content_length=0, translated_length=0))
+
+
+def _append_document_content(doc_id, seq, offsets, content, translated_content, progress):
+    """
+    追加一块原文和译文（插入新行，不重写已写入的内容），并更新长度和进度（一个事务）
+    :param seq: 块序号
+    :param offsets: 已写入的(原文字符数, 译文字符数)
+    """
+    documents = Document.__table__
+    chunks = DocumentContentChunk.__table__
+    with _worker_engine.begin() as conn:
+        conn.execute(insert(chunks).values(
+            document_id=doc_id, seq=seq, content_offset=offsets[0], translated_offset=offsets[1],
+            content=content, translated=translated_content
+        ))
+        conn.execute(update(documents).where(documents.c.id == doc_id).values(
+            content_length=offsets[0] + len(content),
+            translated_length=offsets[1] + len(translated_content),
+            progress=progress
+        ))
+
+
+class _IncrementalWriter:
+    """
+    边解析边写入：累积PARSE_FLUSH_CHARS个字符后翻译并追加到数据库，
+    同时在不超过PARSE_CACHE_MAX_CHARS时保留全文用于写入解析缓存
+    """
+
+    def __init__(self, doc_id):
+        self.doc_id = doc_id
+        self.translate_seconds = 0.0
+        # 整个任务共用一个熔断器：翻译引擎不可用时剩余内容不再逐块等待、失败
+        self.breaker = TranslationBreaker()
+        self.buffer = []
+        self.buffered = 0
+        # 已写入的块数和(原文, 译文)字符数
+        self.seq = 0
+        self.offsets = (0, 0)
+        # 用于解析缓存的全文（超过上限后置为None，不再保留）
+        self.parts = ([], [])
+        self.total = 0
+        _start_document_content(doc_id)
+
+    def add(self, segment, fraction):
+        self.buffer.append(segment)
+        self.buffered += len(segment)
+        if self.buffered >= PARSE_FLUSH_CHARS:
+            self.flush(fraction)
+
+    def flush(self, fraction):
+        if not self.buffer:
+            return
+        content = '\n'.join(self.buffer)
+        start = time.perf_counter()
+        translated_content = translate_text(content, self.breaker)
+        self.translate_seconds += time.perf_counter() - start
+        separator = '\n' if self.seq else ''
+        content_chunk, translated_chunk = separator + content, separator + translated_content
+        # 解析和翻译占10%~95%的进度
+        _append_document_content(self.doc_id, self.seq, self.offsets, content_chunk, translated_chunk,
+                                 10 + int(fraction * 85))
+        self.seq += 1
+        self.offsets = (self.offsets[0] + len(content_chunk), self.offsets[1] + len(translated_chunk))
+        self.buffer = []
+        self.buffered = 0
+
+        self.total += len(content)
+        if self.parts is not None and self.total <= PARSE_CACHE_MAX_CHARS:
+            self.parts[0].append(content)
+            self.parts[1].append(translated_content)
+        else:
+            self.parts = None
+
+    def result(self):
+        """全文（原文, 译文），超过缓存上限时返回None"""
+        if self.parts is None:
+            return None
+        return '\n'.join(self.parts[0]), '\n'.join(self.parts[1])
+
+
+def _timed_iter(iterable, timings, key):
+    """迭代iterable，并把每次取下一个元素的耗时累加到timings[key]"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings[key] += time.perf_counter() - start
+            return
+        timings[key] += time.perf_counter() - start
+        yield item
+
+
+def run_ingestion_job(doc_id):
+    """
+    解析任务入口（在解析进程中执行）：逐段解析、翻译并追加写回数据库
+    :param doc_id: 文档ID
+    :return: 任务结果{file_type, status(done/cached/failed), parse_seconds, translate_seconds}，
+             未认领到任务（已被其他进程处理）时返回None
+    """
+    row = _claim_document(doc_id)
+    if row is None:
+        return None
+
+    result = {'file_type': row.file_type, 'status': 'done', 'parse_seconds': 0.0, 'translate_seconds': 0.0}
+    try:
+        # 相同内容的文件可能已被其他任务解析过
+        cache_key = parse_cache_key(row.file_hash) if row.file_hash else None
+        cached = content_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            _save_document_content(doc_id, cached['content'], cached['translated_content'])
+            result['status'] = 'cached'
+            return result
+
+        writer = _IncrementalWriter(doc_id)
+        # 解析耗时只统计取下一段文本的时间，翻译和写库的耗时不计入
+        segments = iter_document_segments(row.file_path, row.file_type)
+        for segment, fraction in _timed_iter(segments, result, 'parse_seconds'):
+            if segment:
+                writer.add(segment, fraction)
+        writer.flush(1.0)
+        result['translate_seconds'] = writer.translate_seconds
+
+        # 有内容未能翻译时不写入解析缓存，相同文件再次上传时重新翻译
+        full_text = writer.result()
+        if cache_key and full_text is not None and not writer.breaker.failures:
+            content_cache.put(cache_key, {'content': full_text[0], 'translated_content': full_text[1]})
+        _update_document(doc_id, status='done', progress=100, finished_at=datetime.utcnow())
+    except Exception as e:
+        print(f"文档{doc_id}解析失败：{e}")
+        _update_document(doc_id, status='failed', error=str(e)[:500], finished_at=datetime.utcnow())
+        result['status'] = 'failed'
+    return result
+
+
+# ====================== Web进程部分 ======================
+class IngestionQueue(JobQueue):
+    """
+    文档解析任务队列：上传请求只负责保存文件和创建pending状态的文档，
+    解析与翻译由后台进程池完成
+    """
+    model = Document
+    config_prefix = 'INGESTION'
+    extension_name = 'ingestion'
+    messages = {
+        'queued': "文档已在解析队列中",
+        'full': "解析队列已满，请稍后再试",
+        'submitted': "文档已加入解析队列",
+        'error': "文档{}解析任务异常"
+    }
+    warm_up_marker = False
+
+    def init_app(self, app):
+        self.warm_up_marker = app.config.get('MARKER_WARMUP', False)
+        super().init_app(app)
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.app.config['SQLALCHEMY_DATABASE_URI'], self.job_timeout, self.warm_up_marker)
+        )
+
+    def _submit_job(self, executor, doc_id):
+        return executor.submit(run_ingestion_job, doc_id)
+
+    def _on_job_result(self, result):
+        # 未认领到任务（已被其他进程处理）时结果为None
+        if result is not None:
+            record_ingestion_job(result)
+
+
+# 全局任务队列（在app.py中初始化）
+ingestion_queue = IngestionQueue()
+
+
+def create_document(file, uploader_id):
+    """
+    保存上传的文件并创建文档：相同内容已解析过时直接使用缓存结果，否则加入后台解析队列
+    :param file: 上传的文件对象
+    :param uploader_id: 上传用户ID
+    :return: (文档对象或None, 提示信息)
+    """
+    # 保存文件（解析与翻译由后台任务完成）
+    result, message = save_uploaded_file(file)
+    if not result:
+        return None, message
+    UPLOADS.inc(file_type=result['file_type'])
+    UPLOAD_BYTES.inc(result['file_size'], file_type=result['file_type'])
+
+    document = Document(
+        filename=result['filename'],
+        file_path=result['file_path'],
+        file_type=result['file_type'],
+        file_hash=result['file_hash'],
+        uploader_id=uploader_id
+    )
+
+    # 相同内容的文件已解析过：直接使用缓存结果，无需进入解析队列
+    cached = content_cache.get(parse_cache_key(result['file_hash']))
+    if cached is not None:
+        document.set_content(cached['content'], cached['translated_content'])
+        document.status = 'done'
+        document.progress = 100
+        document.finished_at = datetime.utcnow()
+        db.session.add(document)
+        db.session.commit()
+        return document, "文档上传并解析成功"
+
+    # 队列已满时直接拒绝（背压），避免堆积大量待解析文件
+    if ingestion_queue.queued_count >= ingestion_queue.max_queued:
+        # 文件未被其他文档引用时删除，避免残留
+        if not Document.query.filter_by(file_path=result['file_path']).first():
+            os.remove(result['file_path'])
+        return None, "解析队列已满，请稍后再试"
+
+    # 保存到数据库（pending状态）
+    document.status = 'pending'
+    db.session.add(document)
+    db.session.commit()
+
+    # 加入后台解析队列
+    success, _ = ingestion_queue.submit(document.id)
+    if not success:
+        # 文档保持pending状态，队列空闲后会被重新认领
+        return document, "文档上传成功，解析队列繁忙，稍后将自动解析"
+    return document, "文档上传成功，正在后台解析"
@@ -0,0 +1,225 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from flask import g, request, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from models import db
+from config import SLOW_QUERY_SECONDS, SLOW_REQUEST_SECONDS
+from metrics import REQUEST_DURATION, REQUESTS, REQUEST_QUERIES, REQUEST_QUERY_SECONDS
+
+# 当前线程中由count_queries()开启的计数器
+_local = threading.local()
+# 最近的慢查询（只保留最新的若干条）
+slow_queries = deque(maxlen=50)
+
+
+class QueryStats:
+    """SQL执行统计：语句数量、总耗时（秒）及执行过的语句"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.statements = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements.append(statement)
+
+
+def _active_stats():
+    """当前需要记录的统计对象（本次请求 + 当前线程开启的计数器）"""
+    stats = list(getattr(_local, 'counters', ()))
+    if has_app_context() and 'query_stats' in g:
+        stats.append(g.query_stats)
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    for stats in _active_stats():
+        stats.record(statement, elapsed)
+    if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+        _record_slow_query(statement, elapsed)
+
+
+def _record_slow_query(statement, elapsed):
+    route = request.endpoint if has_request_context() else None
+    slow_queries.append({
+        'time': datetime.utcnow().isoformat(),
+        'route': route,
+        'seconds': round(elapsed, 4),
+        'statement': statement[:1000]
+    })
+    print(f"慢查询（{elapsed * 1000:.0f}ms，{route or '非请求'}）：{' '.join(statement.split())[:300]}")
+
+
+# ====================== 连接池 ======================
+class TimedQueuePool(QueuePool):
+    """记录获取连接等待时间和超时次数的连接池（通过SQLALCHEMY_ENGINE_OPTIONS的poolclass启用）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._wait_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_total += elapsed
+                self.wait_max = max(self.wait_max, elapsed)
+
+
+def pool_stats(engine):
+    """连接池状态：常驻连接数、已借出/空闲连接数、溢出连接数及获取连接的等待时间"""
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow()
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._wait_lock:
+            stats.update({
+                'checkouts': pool.checkouts,
+                'timeouts': pool.timeouts,
+                'wait_total_ms': round(pool.wait_total * 1000, 3),
+                'wait_avg_ms': round(pool.wait_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+                'wait_max_ms': round(pool.wait_max * 1000, 3)
+            })
+    return stats
+
+
+# ====================== 路由耗时 ======================
+class RouteStats:
+    """按路由汇总请求次数、耗时和SQL数量（进程内，多线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, elapsed, query_count, query_time):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                               'queries': 0, 'query_time': 0.0}
+            entry['count'] += 1
+            entry['total'] += elapsed
+            entry['max'] = max(entry['max'], elapsed)
+            entry['queries'] += query_count
+            entry['query_time'] += query_time
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                route: {
+                    'count': entry['count'],
+                    'avg_ms': round(entry['total'] / entry['count'] * 1000, 2),
+                    'max_ms': round(entry['max'] * 1000, 2),
+                    'avg_queries': round(entry['queries'] / entry['count'], 2),
+                    'avg_query_ms': round(entry['query_time'] / entry['count'] * 1000, 2)
+                }
+                for route, entry in sorted(self._routes.items())
+            }
+
+
+route_stats = RouteStats()
+
+
+@contextmanager
+def count_queries():
+    """
+    统计代码块内执行的SQL数量，用法：
+        with count_queries() as stats:
+            ...
+        print(stats.count)
+    """
+    stats = QueryStats()
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    counters.append(stats)
+    try:
+        yield stats
+    finally:
+        counters.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """
+    断言代码块内执行的SQL不超过limit条（用于在测试中发现N+1查询）
+    :param limit: 允许的最大SQL数量
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        statements = '\n'.join(stats.statements)
+        raise AssertionError(f"执行了{stats.count}条SQL，超过上限{limit}条：\n{statements}")
+
+
+def init_query_tracking(app):
+    """
+    注册SQL统计和路由耗时统计：每个请求单独计数，调试模式下通过响应头
+    X-Query-Count/X-Query-Time/X-Response-Time返回，超过QUERY_COUNT_WARNING条SQL
+    或处理时间超过SLOW_REQUEST_SECONDS时打印警告，慢查询记录到slow_queries
+    """
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def _start_query_stats():
+        g.request_start_time = time.perf_counter()
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - g.request_start_time
+        route = request.endpoint or '<unmatched>'
+        route_stats.record(route, elapsed, stats.count, stats.total_time)
+        REQUEST_DURATION.observe(elapsed, route=route, method=request.method)
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(stats.count, route=route)
+        REQUEST_QUERY_SECONDS.observe(stats.total_time, route=route)
+
+        if app.debug:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time'] = f"{stats.total_time * 1000:.1f}ms"
+            response.headers['X-Response-Time'] = f"{elapsed * 1000:.1f}ms"
+        warning = app.config.get('QUERY_COUNT_WARNING')
+        if warning and stats.count > warning:
+            print(f"警告：{request.method} {request.path} 执行了{stats.count}条SQL，可能存在N+1查询")
+        if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+            print(f"慢请求：{request.method} {request.path} 耗时{elapsed * 1000:.0f}ms"
+                  f"（SQL {stats.count}条，{stats.total_time * 1000:.0f}ms）")
+        return response
@@ -0,0 +1,135 @@
+"""
+后台任务队列：文档解析（ingestion.py，进程池）和统计报表（reports.py，线程池）共用。
+请求只创建pending状态的记录并提交记录ID，由执行器在后台处理；任务开始时用条件UPDATE认领记录，
+pending或超过job_timeout仍在processing的记录（服务重启、进程崩溃）会在队列有空位时重新加入队列
+"""
+import threading
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import or_, and_
+from models import db
+
+
+class JobQueue:
+    """
+    后台任务队列基类，子类需指定：
+    - model：任务记录的模型（含id、status、started_at、error、finished_at列）
+    - config_prefix：配置项前缀（从app.config读取{prefix}_WORKERS、{prefix}_MAX_QUEUED、{prefix}_JOB_TIMEOUT）
+    - extension_name：注册到app.extensions的名称
+    - messages：提示信息（queued：已在队列中，full：队列已满，submitted：已加入队列，error：任务异常的日志前缀）
+    - _create_executor()：创建执行器
+    - _submit_job(executor, record_id)：把任务提交到执行器，返回Future
+    """
+    model = None
+    config_prefix = None
+    extension_name = None
+    messages = {}
+    # 默认配置（app.config中有对应配置项时以配置为准）
+    max_workers = 2
+    max_queued = 20
+    job_timeout = 3600
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._recovered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get(f'{self.config_prefix}_WORKERS', self.max_workers)
+        self.max_queued = app.config.get(f'{self.config_prefix}_MAX_QUEUED', self.max_queued)
+        self.job_timeout = app.config.get(f'{self.config_prefix}_JOB_TIMEOUT', self.job_timeout)
+        app.extensions[self.extension_name] = self
+
+        # 服务启动后首次请求时恢复未完成的任务（避免导入app的脚本也启动执行器）
+        @app.before_request
+        def _recover_unfinished_jobs():
+            if not self._recovered:
+                self._recovered = True
+                self.requeue_unfinished()
+
+    def _create_executor(self):
+        raise NotImplementedError
+
+    def _submit_job(self, executor, record_id):
+        raise NotImplementedError
+
+    def _on_job_result(self, result):
+        """任务正常结束后的处理（默认不处理）"""
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self._executor
+
+    @property
+    def queued_count(self):
+        """当前排队/执行中的任务数"""
+        with self._lock:
+            return len(self._inflight)
+
+    def submit(self, record_id):
+        """
+        提交任务
+        :param record_id: 任务记录ID
+        :return: (是否成功, 提示信息)
+        """
+        with self._lock:
+            if record_id in self._inflight:
+                return True, self.messages['queued']
+            if len(self._inflight) >= self.max_queued:
+                return False, self.messages['full']
+            future = self._submit_job(self._get_executor(), record_id)
+            self._inflight[record_id] = future
+        future.add_done_callback(partial(self._on_job_done, record_id))
+        return True, self.messages['submitted']
+
+    def _on_job_done(self, record_id, future):
+        with self._lock:
+            self._inflight.pop(record_id, None)
+
+        # 执行器中的任务异常退出时（如解析进程崩溃），由Web进程标记失败
+        error = future.exception()
+        if error is not None:
+            print(f"{self.messages['error'].format(record_id)}：{error}")
+            model = self.model
+            with self.app.app_context():
+                model.query.filter(model.id == record_id, model.status.in_(('pending', 'processing'))).update({
+                    'status': 'failed',
+                    'error': str(error)[:500],
+                    'finished_at': datetime.utcnow()
+                }, synchronize_session=False)
+                db.session.commit()
+        else:
+            self._on_job_result(future.result())
+
+        # 队列有空位时继续处理数据库中等待的任务
+        self.requeue_unfinished()
+
+    def requeue_unfinished(self):
+        """将数据库中未完成的任务重新加入队列（服务重启/队列空闲时调用）"""
+        free_slots = self.max_queued - self.queued_count
+        if free_slots <= 0:
+            return
+
+        model = self.model
+        stale_before = datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        with self.app.app_context():
+            record_ids = [row.id for row in db.session.query(model.id).filter(
+                or_(model.status == 'pending',
+                    and_(model.status == 'processing', model.started_at < stale_before))
+            ).order_by(model.id).limit(free_slots + self.queued_count)]
+
+        for record_id in record_ids:
+            success, _ = self.submit(record_id)
+            if not success:
+                break
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
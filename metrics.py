@@ -0,0 +1,180 @@
+"""
+Prometheus格式的运行指标（进程内注册表，/metrics接口按文本格式输出）
+多进程部署时每个进程各自计数，由Prometheus按实例汇总
+"""
+import bisect
+import threading
+
+# 耗时直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """采集时通过回调函数读取当前值的指标（如连接池占用数）；由其他模块累计的计数用type='counter'"""
+
+    def __init__(self, name, documentation, func, type='gauge'):
+        super().__init__(name, documentation)
+        self.func = func
+        self.type = type
+
+    def _samples(self):
+        try:
+            value = self.func()
+        except Exception as e:
+            print(f"采集指标{self.name}失败：{e}")
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """分桶直方图（记录分布、总和与次数）"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（非累计，最后一个为+Inf）, 总和, 次数]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, func, type='gauge'):
+        return self.register(Gauge(name, documentation, func, type))
+
+    def render(self):
+        """按Prometheus文本格式输出所有指标"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# ====================== 指标定义 ======================
+# 请求
+REQUEST_DURATION = registry.histogram('http_request_duration_seconds', 'HTTP请求处理耗时（秒）', ['route', 'method'])
+REQUESTS = registry.counter('http_requests_total', 'HTTP请求数', ['route', 'method', 'status'])
+REQUEST_QUERIES = registry.histogram('db_queries_per_request', '每个请求执行的SQL数量', ['route'],
+                                     buckets=(0, 1, 2, 5, 10, 20, 50, 100))
+REQUEST_QUERY_SECONDS = registry.histogram('db_query_seconds_per_request', '每个请求的SQL总耗时（秒）', ['route'])
+
+# 文档上传与解析（解析耗时由解析进程随任务结果返回，在Web进程中记录）
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+UPLOAD_BYTES = registry.counter('upload_bytes_total', '上传文件字节数', ['file_type'])
+UPLOADS = registry.counter('uploads_total', '上传文件数', ['file_type'])
+DOCUMENT_JOBS = registry.counter('document_jobs_total', '文档解析任务数（status：done/cached/failed）',
+                                 ['file_type', 'status'])
+DOCUMENT_PARSE_SECONDS = registry.histogram('document_parse_seconds', '文档解析耗时（秒）', ['file_type'],
+                                            buckets=JOB_BUCKETS)
+DOCUMENT_TRANSLATE_SECONDS = registry.histogram('document_translate_seconds', '文档翻译耗时（秒）', ['file_type'],
+                                                buckets=JOB_BUCKETS)
+
+# 借阅（result：success/conflict/error；conflict为并发借阅时被他人抢先）
+BORROWS = registry.counter('borrow_total', '借阅请求数', ['result'])
+RETURNS = registry.counter('return_total', '归还请求数（result：success/not_borrowed/error）', ['result'])
+
+
+def record_ingestion_job(result):
+    """记录解析进程返回的任务结果（见ingestion.run_ingestion_job）"""
+    file_type = result['file_type']
+    DOCUMENT_JOBS.inc(file_type=file_type, status=result['status'])
+    if result['status'] == 'done':
+        DOCUMENT_PARSE_SECONDS.observe(result['parse_seconds'], file_type=file_type)
+        DOCUMENT_TRANSLATE_SECONDS.observe(result['translate_seconds'], file_type=file_type)
@@ -0,0 +1,247 @@
+"""
+数据库迁移工具
+用法：
+    python migrate.py status            查看迁移状态
+    python migrate.py upgrade           执行所有未执行的迁移
+    python migrate.py stamp <版本号>     将某版本及之前的迁移标记为已执行（用于已按旧版db.sql建库的数据库）
+    python migrate.py explain           用EXPLAIN检查各路由的查询是否命中索引
+"""
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.sql.expression import Executable, ClauseElement
+from sqlalchemy.ext.compiler import compiles
+from config import DATABASE_URI
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+# 迁移文件名格式：0001_说明.sql
+MIGRATION_FILE = re.compile(r'^(\d{4})_.+\.sql$')
+
+
+# ====================== 迁移 ======================
+def list_migrations():
+    """按版本号返回[(版本号, 文件路径)]"""
+    migrations = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        matched = MIGRATION_FILE.match(name)
+        if matched:
+            migrations.append((matched.group(1), os.path.join(MIGRATIONS_DIR, name)))
+    return migrations
+
+
+def split_statements(sql):
+    """按行尾分号拆分SQL语句（忽略--注释行）"""
+    statements = []
+    current = []
+    for line in sql.splitlines():
+        if line.strip().startswith('--'):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statement = '\n'.join(current).strip().rstrip(';')
+            if statement:
+                statements.append(statement)
+            current = []
+    remaining = '\n'.join(current).strip()
+    if remaining:
+        statements.append(remaining)
+    return statements
+
+
+def ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR(20) PRIMARY KEY, "
+        "applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+
+def applied_versions(conn):
+    ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def upgrade(engine):
+    """依次执行未执行的迁移（每个迁移执行完成后立即记录版本）"""
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+
+    pending = [(version, path) for version, path in list_migrations() if version not in applied]
+    if not pending:
+        print("数据库已是最新版本")
+        return
+
+    for version, path in pending:
+        with open(path, 'r', encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        print(f"执行迁移 {os.path.basename(path)}（{len(statements)}条语句）")
+        # MySQL的DDL会隐式提交，迁移中途失败时需根据提示手动处理后再重试
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {'version': version})
+    print("迁移完成")
+
+
+def stamp(engine, target):
+    """将target及之前的迁移标记为已执行（不实际执行SQL）"""
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+        for version, _ in list_migrations():
+            if version <= target and version not in applied:
+                conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {'version': version})
+                print(f"已标记 {version}")
+
+
+def status(engine):
+    with engine.begin() as conn:
+        applied = applied_versions(conn)
+    for version, path in list_migrations():
+        state = '已执行' if version in applied else '未执行'
+        print(f"{version}  {state}  {os.path.basename(path)}")
+
+
+# ====================== 索引检查 ======================
+class Explain(Executable, ClauseElement):
+    """EXPLAIN语句（MySQL为EXPLAIN，SQLite为EXPLAIN QUERY PLAN）"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN ' + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, 'sqlite')
+def _compile_explain_sqlite(element, compiler, **kw):
+    return 'EXPLAIN QUERY PLAN ' + compiler.process(element.statement, **kw)
+
+
+def route_queries():
+    """各路由中的代表性查询：[(说明, 查询语句)]，分页查询使用带游标条件的翻页形式"""
+    from models import db, User, Publication, Copy, BorrowRecord, BorrowRecordArchive, PublicationBorrowCount, \
+        Document, OverdueLoan, Hold, Report
+
+    now = datetime.utcnow()
+    return [
+        ('login: 按用户名查找用户', User.query.filter_by(username='admin').limit(1)),
+        ('admin_dashboard: 按类型统计出版物', Publication.query.filter_by(type='book')),
+        ('admin_dashboard: 已借出副本', Copy.query.filter_by(status='borrowed')),
+        ('admin_dashboard: 读者数量', User.query.filter_by(role='reader')),
+        ('manage_publications: ISBN查重', Publication.query.filter_by(isbn='9787115428028').limit(1)),
+        ('manage_publications: 出版物翻页', Publication.query.filter(Publication.id < 1000)
+            .order_by(Publication.id.desc()).limit(21)),
+        ('admin_statistics: 分类统计', db.session.query(Publication.category, db.func.count(Publication.id))
+            .filter_by(type='book').group_by(Publication.category)),
+        ('admin_statistics: 借阅排行', db.session.query(Publication.title, PublicationBorrowCount.borrow_count)
+            .join(Publication, Publication.id == PublicationBorrowCount.publication_id)
+            .order_by(PublicationBorrowCount.borrow_count.desc()).limit(10)),
+        ('admin_dashboard: 逾期数量', OverdueLoan.query.filter_by(state='overdue')),
+        ('admin_statistics: 逾期用户', db.session.query(User.username, db.func.count(OverdueLoan.copy_id))
+            .join(OverdueLoan, User.id == OverdueLoan.user_id)
+            .filter(OverdueLoan.state == 'overdue').group_by(User.id, User.username)),
+        ('reader_dashboard: 当前借阅', BorrowRecord.query.filter_by(user_id=2, status='borrowed').join(Publication)),
+        ('reader_dashboard: 逾期汇总', OverdueLoan.query.filter_by(user_id=2, state='overdue')),
+        ('scan_overdue: 即将到期/逾期借阅', Copy.query.filter(
+            Copy.status == 'borrowed', Copy.due_date < now)
+            .order_by(Copy.due_date, Copy.id).limit(1000)),
+        ('borrow_books: 可借阅分页', Publication.query.filter(Publication.available_copies > 0,
+                                                        Publication.type == 'book')
+            .order_by(Publication.id.desc()).limit(21)),
+        ('borrow: 认领空闲副本', Copy.query.filter_by(publication_id=1, status='available').limit(1)),
+        ('return_book: 查找借出的副本', Copy.query.filter_by(publication_id=1, status='borrowed', borrower_id=2)
+            .limit(1)),
+        ('my_borrows: 借阅记录分页', BorrowRecord.query.filter_by(user_id=2)
+            .order_by(BorrowRecord.borrow_time.desc(), BorrowRecord.id.desc()).limit(21)),
+        ('my_borrows: 历史记录分页', BorrowRecordArchive.query.filter_by(user_id=2)
+            .order_by(BorrowRecordArchive.borrow_time.desc(), BorrowRecordArchive.id.desc()).limit(21)),
+        ('archive: 待归档的借阅记录', BorrowRecord.query.filter(
+            BorrowRecord.status == 'returned', BorrowRecord.return_time < now)
+            .order_by(BorrowRecord.return_time, BorrowRecord.id).limit(1000)),
+        ('reports: 范围内借出的记录', BorrowRecord.query.filter(
+            BorrowRecord.borrow_time >= now - timedelta(days=30), BorrowRecord.borrow_time < now)),
+        ('reports: 范围内借出的归档记录', BorrowRecordArchive.query.filter(
+            BorrowRecordArchive.borrow_time >= now - timedelta(days=30), BorrowRecordArchive.borrow_time < now)),
+        ('reports: 范围内归还的归档记录', BorrowRecordArchive.query.filter(
+            BorrowRecordArchive.status == 'returned', BorrowRecordArchive.return_time >= now - timedelta(days=30))),
+        ('request_report: 相同参数的报表', Report.query.filter(Report.params_hash == '0' * 64,
+                                                          Report.status == 'done').limit(1)),
+        ('return_book: 查找借阅记录', BorrowRecord.query.filter_by(publication_id=1, user_id=2, status='borrowed')
+            .order_by(BorrowRecord.borrow_time.desc()).limit(1)),
+        ('return_book: 下一位预约者', Hold.query.filter_by(publication_id=1, status='waiting')
+            .order_by(Hold.ticket).limit(1)),
+        ('reader_dashboard: 我的预约', Hold.query.filter(Hold.user_id == 2, Hold.status.in_(Hold.ACTIVE_STATUSES))),
+        ('scan_holds: 预留超时的预约', Hold.query.filter(Hold.status == 'ready', Hold.expires_at < now)
+            .order_by(Hold.expires_at, Hold.id).limit(1000)),
+        ('upload_document: 文档分页', Document.query.filter_by(uploader_id=2)
+            .order_by(Document.upload_time.desc(), Document.id.desc()).limit(21)),
+    ]
+
+
+def _full_scans(dialect, rows):
+    """从EXPLAIN结果中找出全表扫描的表"""
+    scans = []
+    for row in rows:
+        row = row._mapping
+        if dialect == 'sqlite':
+            # SQLite：SCAN且未使用索引即为全表扫描
+            detail = row['detail']
+            if detail.startswith('SCAN') and 'INDEX' not in detail:
+                scans.append(detail)
+        elif row['type'] == 'ALL':
+            scans.append(row['table'])
+    return scans
+
+
+def explain(app):
+    """
+    对各路由的查询执行EXPLAIN，报告全表扫描
+    :return: 是否所有查询都命中索引
+    """
+    from models import db
+
+    all_indexed = True
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        for name, query in route_queries():
+            statement = getattr(query, 'statement', query)
+            rows = db.session.execute(Explain(statement)).fetchall()
+            scans = _full_scans(dialect, rows)
+            if scans:
+                all_indexed = False
+                print(f"[全表扫描] {name}：{', '.join(scans)}")
+            else:
+                print(f"[命中索引] {name}")
+    return all_indexed
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in ('status', 'upgrade', 'stamp', 'explain'):
+        print(__doc__)
+        return 1
+
+    command = argv[1]
+    if command == 'explain':
+        from app import app
+        return 0 if explain(app) else 1
+
+    engine = create_engine(DATABASE_URI)
+    if command == 'status':
+        status(engine)
+    elif command == 'upgrade':
+        upgrade(engine)
+    elif command == 'stamp':
+        if len(argv) < 3:
+            print("请指定版本号，如：python migrate.py stamp 0001")
+            return 1
+        stamp(engine, argv[2])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
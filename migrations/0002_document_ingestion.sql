@@ -0,0 +1,11 @@
+-- 文档后台解析状态与内容哈希
+ALTER TABLE documents
+    ADD COLUMN file_hash VARCHAR(64) AFTER file_type,
+    ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    ADD COLUMN progress INT NOT NULL DEFAULT 0,
+    ADD COLUMN error VARCHAR(500),
+    ADD COLUMN started_at DATETIME,
+    ADD COLUMN finished_at DATETIME;
+
+-- 已有文档在上传时已同步解析完成
+UPDATE documents SET status = 'done', progress = 100, finished_at = upload_time;
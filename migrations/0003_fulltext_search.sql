@@ -0,0 +1,3 @@
+-- 全文索引（ngram分词支持中文）
+ALTER TABLE publications ADD FULLTEXT INDEX ft_publications_text (title, author, isbn, publisher) WITH PARSER ngram;
+ALTER TABLE documents ADD FULLTEXT INDEX ft_documents_content (content, translated_content) WITH PARSER ngram;
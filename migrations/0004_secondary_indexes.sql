@@ -0,0 +1,15 @@
+-- 按查询条件/排序字段补充二级索引
+-- 读者仪表盘、归还：按用户和状态筛选借阅记录
+CREATE INDEX ix_borrow_records_user_status ON borrow_records (user_id, status);
+-- 我的借阅：按用户筛选并按借阅时间倒序分页
+CREATE INDEX ix_borrow_records_user_time ON borrow_records (user_id, borrow_time);
+-- 归还：按出版物和状态查找最近一次借阅
+CREATE INDEX ix_borrow_records_pub_status_time ON borrow_records (publication_id, status, borrow_time);
+-- 仪表盘/统计：已借出和逾期出版物
+CREATE INDEX ix_publications_borrowed_due ON publications (is_borrowed, due_date);
+-- 仪表盘/统计：按类型和分类计数
+CREATE INDEX ix_publications_type_category ON publications (type, category);
+-- 文档列表：按上传人筛选并按上传时间倒序分页
+CREATE INDEX ix_documents_uploader_time ON documents (uploader_id, upload_time);
+-- 仪表盘：按角色统计用户
+CREATE INDEX ix_users_role ON users (role);
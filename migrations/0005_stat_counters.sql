@@ -0,0 +1,6 @@
+-- 仪表盘计数器（首次访问仪表盘时自动全量统计）
+CREATE TABLE stat_counters (
+    name VARCHAR(50) PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,16 @@
+-- 逾期状态表（由python overdue.py定时扫描维护）
+CREATE TABLE overdue_loans (
+    publication_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    due_date DATETIME NOT NULL,
+    state VARCHAR(10) NOT NULL,
+    overdue_days INT NOT NULL DEFAULT 0,
+    fine DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    reminded_at DATETIME,
+    scanned_at DATETIME NOT NULL,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_overdue_loans_user_state (user_id, state),
+    INDEX ix_overdue_loans_state (state),
+    INDEX ix_overdue_loans_scanned_at (scanned_at)
+);
@@ -0,0 +1,26 @@
+-- 文档内容移到单独的表（列表查询不再读取大字段），全文索引随之迁移
+CREATE TABLE document_contents (
+    document_id INT PRIMARY KEY,
+    content LONGTEXT,
+    translated_content LONGTEXT,
+    FOREIGN KEY (document_id) REFERENCES documents(id)
+);
+
+INSERT INTO document_contents (document_id, content, translated_content)
+SELECT id, content, translated_content FROM documents
+WHERE content IS NOT NULL OR translated_content IS NOT NULL;
+
+ALTER TABLE documents
+    ADD COLUMN content_length INT NOT NULL DEFAULT 0 AFTER file_hash,
+    ADD COLUMN translated_length INT NOT NULL DEFAULT 0 AFTER content_length;
+
+UPDATE documents
+SET content_length = COALESCE(CHAR_LENGTH(content), 0),
+    translated_length = COALESCE(CHAR_LENGTH(translated_content), 0);
+
+ALTER TABLE documents
+    DROP INDEX ft_documents_content,
+    DROP COLUMN content,
+    DROP COLUMN translated_content;
+
+ALTER TABLE document_contents ADD FULLTEXT INDEX ft_document_contents (content, translated_content) WITH PARSER ngram;
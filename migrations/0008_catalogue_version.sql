@@ -0,0 +1,2 @@
+-- 目录版本号（出版物增删、借还时+1，用于页面缓存失效；不参与计数器全量重建）
+INSERT INTO stat_counters (name, value) VALUES ('catalogue_version', 1);
@@ -0,0 +1,25 @@
+-- 预约队列：出版物上的取号/叫号计数（排队位置O(1)计算）和预留状态，预约表
+ALTER TABLE publications
+    ADD COLUMN reserved_for_id INT NULL AFTER due_date,
+    ADD COLUMN reserved_until DATETIME NULL AFTER reserved_for_id,
+    ADD COLUMN hold_head INT NOT NULL DEFAULT 0 AFTER reserved_until,
+    ADD COLUMN hold_tail INT NOT NULL DEFAULT 0 AFTER hold_head,
+    ADD CONSTRAINT fk_publications_reserved_for FOREIGN KEY (reserved_for_id) REFERENCES users(id);
+
+CREATE TABLE holds (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    user_id INT NOT NULL,
+    ticket INT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'waiting',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ready_at DATETIME,
+    expires_at DATETIME,
+    notified_at DATETIME,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    UNIQUE KEY uq_holds_pub_ticket (publication_id, ticket),
+    INDEX ix_holds_pub_status_ticket (publication_id, status, ticket),
+    INDEX ix_holds_user_status (user_id, status),
+    INDEX ix_holds_status_expires (status, expires_at)
+);
@@ -0,0 +1,76 @@
+-- 副本级库存：一个出版物可以有多个副本，借阅/归还/预留状态改为记录在副本上，
+-- 出版物只维护副本数量（total_copies/available_copies）
+-- 已有的每个出版物生成一个副本（副本ID与出版物ID相同），借阅记录、已预留的预约和逾期状态指向该副本
+CREATE TABLE copies (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    barcode VARCHAR(50) UNIQUE,
+    status VARCHAR(10) NOT NULL DEFAULT 'available',
+    borrower_id INT,
+    due_date DATETIME,
+    reserved_for_id INT,
+    reserved_until DATETIME,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (borrower_id) REFERENCES users(id),
+    FOREIGN KEY (reserved_for_id) REFERENCES users(id),
+    INDEX ix_copies_pub_status (publication_id, status),
+    INDEX ix_copies_status_due (status, due_date),
+    INDEX ix_copies_borrower (borrower_id)
+);
+
+INSERT INTO copies (id, publication_id, status, borrower_id, due_date, reserved_for_id, reserved_until,
+                    created_at, updated_at)
+SELECT id, id,
+       CASE WHEN is_borrowed THEN 'borrowed' WHEN reserved_for_id IS NOT NULL THEN 'reserved' ELSE 'available' END,
+       CASE WHEN is_borrowed THEN borrower_id END,
+       CASE WHEN is_borrowed THEN due_date END,
+       CASE WHEN NOT is_borrowed THEN reserved_for_id END,
+       CASE WHEN NOT is_borrowed THEN reserved_until END,
+       created_at, updated_at
+FROM publications;
+
+ALTER TABLE publications
+    ADD COLUMN total_copies INT NOT NULL DEFAULT 0 AFTER is_latest,
+    ADD COLUMN available_copies INT NOT NULL DEFAULT 0 AFTER total_copies;
+
+UPDATE publications
+SET total_copies = 1,
+    available_copies = CASE WHEN is_borrowed OR reserved_for_id IS NOT NULL THEN 0 ELSE 1 END;
+
+ALTER TABLE borrow_records
+    ADD COLUMN copy_id INT NULL AFTER publication_id,
+    ADD CONSTRAINT fk_borrow_records_copy FOREIGN KEY (copy_id) REFERENCES copies(id);
+
+UPDATE borrow_records SET copy_id = publication_id;
+
+ALTER TABLE holds
+    ADD COLUMN copy_id INT NULL AFTER ticket,
+    ADD CONSTRAINT fk_holds_copy FOREIGN KEY (copy_id) REFERENCES copies(id);
+
+UPDATE holds SET copy_id = publication_id WHERE status = 'ready';
+
+-- 逾期状态改为按副本记录（保留已有的提醒时间）
+ALTER TABLE overdue_loans ADD COLUMN copy_id INT NULL FIRST;
+
+UPDATE overdue_loans SET copy_id = publication_id;
+
+ALTER TABLE overdue_loans ADD INDEX ix_overdue_loans_publication (publication_id);
+
+ALTER TABLE overdue_loans
+    DROP PRIMARY KEY,
+    MODIFY copy_id INT NOT NULL,
+    ADD PRIMARY KEY (copy_id),
+    ADD CONSTRAINT fk_overdue_loans_copy FOREIGN KEY (copy_id) REFERENCES copies(id);
+
+-- publications_ibfk_1为0001中borrower_id的外键（未命名，MySQL自动生成的名称）
+ALTER TABLE publications
+    DROP FOREIGN KEY publications_ibfk_1,
+    DROP FOREIGN KEY fk_publications_reserved_for,
+    DROP INDEX ix_publications_borrowed_due,
+    DROP COLUMN is_borrowed,
+    DROP COLUMN borrower_id,
+    DROP COLUMN due_date,
+    DROP COLUMN reserved_for_id,
+    DROP COLUMN reserved_until;
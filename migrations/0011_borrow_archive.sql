@@ -0,0 +1,30 @@
+-- 借阅记录归档：归还已久的记录由python archive.py移入归档表，热表只保留未归还和近期的记录
+-- 出版物借阅次数表：借阅时增量维护，借阅排行不再对全部借阅记录分组统计
+ALTER TABLE borrow_records ADD INDEX ix_borrow_records_status_return (status, return_time);
+
+CREATE TABLE borrow_records_archive (
+    id INT PRIMARY KEY,
+    publication_id INT NOT NULL,
+    copy_id INT,
+    user_id INT NOT NULL,
+    borrow_time DATETIME,
+    return_time DATETIME,
+    status VARCHAR(10) DEFAULT 'returned',
+    created_at DATETIME,
+    archived_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    INDEX ix_borrow_records_archive_user_time (user_id, borrow_time),
+    INDEX ix_borrow_records_archive_pub_time (publication_id, borrow_time)
+);
+
+CREATE TABLE publication_borrow_counts (
+    publication_id INT PRIMARY KEY,
+    borrow_count BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (publication_id) REFERENCES publications(id),
+    INDEX ix_publication_borrow_counts_count (borrow_count)
+);
+
+INSERT INTO publication_borrow_counts (publication_id, borrow_count)
+SELECT publication_id, COUNT(*) FROM borrow_records GROUP BY publication_id;
@@ -0,0 +1,27 @@
+-- 统计报表：管理员申请的报表由后台线程生成CSV/XLSX文件（见reports.py），相同参数的报表在有效期内复用
+-- 报表按借阅时间/归还时间范围读取借阅记录和归档记录，补充对应的索引
+ALTER TABLE borrow_records ADD INDEX ix_borrow_records_borrow_time (borrow_time);
+ALTER TABLE borrow_records_archive ADD INDEX ix_borrow_records_archive_borrow_time (borrow_time),
+    ADD INDEX ix_borrow_records_archive_status_return (status, return_time);
+
+CREATE TABLE reports (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(30) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    params_hash VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    row_count INT NOT NULL DEFAULT 0,
+    file_path VARCHAR(500),
+    file_size BIGINT,
+    error VARCHAR(500),
+    requested_by INT NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    FOREIGN KEY (requested_by) REFERENCES users(id),
+    INDEX ix_reports_params_status (params_hash, status),
+    INDEX ix_reports_status_started (status, started_at),
+    INDEX ix_reports_finished (finished_at)
+);
@@ -0,0 +1,19 @@
+-- 文档内容按块存储：解析时每批内容插入一行，不再对整篇内容反复追加（content = content || 新内容）
+-- 已有内容迁移为每个文档一块（seq = 0），重新解析后按批分块；全文索引随之迁移
+CREATE TABLE document_content_chunks (
+    document_id INT NOT NULL,
+    seq INT NOT NULL,
+    content_offset INT NOT NULL DEFAULT 0,
+    translated_offset INT NOT NULL DEFAULT 0,
+    content LONGTEXT,
+    translated LONGTEXT,
+    PRIMARY KEY (document_id, seq),
+    FOREIGN KEY (document_id) REFERENCES documents(id)
+);
+
+INSERT INTO document_content_chunks (document_id, seq, content_offset, translated_offset, content, translated)
+SELECT document_id, 0, 0, 0, content, translated_content FROM document_contents;
+
+DROP TABLE document_contents;
+
+ALTER TABLE document_content_chunks ADD FULLTEXT INDEX ft_document_content_chunks (content, translated) WITH PARSER ngram;
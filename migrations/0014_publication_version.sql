@@ -0,0 +1,3 @@
+-- 出版物版本号：借还、预约改变列表显示的状态时在同一UPDATE中+1，目录页面按页面上出版物的版本号缓存，
+-- 借还不再写stat_counters中的catalogue_version（该行只在管理员增删出版物时更新）
+ALTER TABLE publications ADD COLUMN version INT NOT NULL DEFAULT 0 AFTER hold_tail;
@@ -1,8 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy import or_
+from sqlalchemy.dialects.mysql import LONGTEXT
 from datetime import datetime, timedelta
 import bcrypt
-from config import MAX_BOOK_LOAN_DAYS, MAX_MAGAZINE_LOAN_DAYS
+from config import MAX_BOOK_LOAN_DAYS, MAX_MAGAZINE_LOAN_DAYS, BCRYPT_ROUNDS, HOLD_PICKUP_DAYS, HOLD_MAX_ACTIVE, \
+    PARSE_FLUSH_CHARS
+from metrics import BORROWS, RETURNS
 
 # 初始化SQLAlchemy
 db = SQLAlchemy()
@@ -11,6 +15,9 @@ db = SQLAlchemy()
 # ====================== 用户表（管理员/读者） ======================
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role', 'role'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -27,8 +34,13 @@ class User(UserMixin, db.Model):
     # 设置密码（bcrypt哈希）
     def set_password(self, password):
         """将明文密码加密后存储"""
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        self.password_hash = User.hash_password(password)
+
+    @staticmethod
+    def hash_password(password):
+        """计算明文密码的bcrypt哈希（成本由BCRYPT_ROUNDS配置）"""
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
     # 验证密码
     def check_password(self, password):
@@ -38,10 +50,24 @@ class User(UserMixin, db.Model):
         except Exception:
             return False
 
+    def needs_rehash(self):
+        """密码哈希的计算成本与BCRYPT_ROUNDS不一致时需要重新哈希（哈希格式：$2b$<成本>$...）"""
+        try:
+            return int(self.password_hash.split('$')[2]) != BCRYPT_ROUNDS
+        except (IndexError, ValueError):
+            return False
+
 
 # ====================== 出版物表（图书/杂志） ======================
 class Publication(db.Model):
+    """出版物（书目）：一个标题可以有多个副本（见Copy），借阅状态记录在副本上，这里只维护副本数量"""
     __tablename__ = 'publications'
+    __table_args__ = (
+        # 全文索引（ngram分词支持中文），供search.py按标题/作者/ISBN/出版商检索
+        db.Index('ft_publications_text', 'title', 'author', 'isbn', 'publisher',
+                 mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        db.Index('ix_publications_type_category', 'type', 'category'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False, comment='出版物标题')
     type = db.Column(db.String(10), nullable=False, comment='类型：book/magazine')  # book/magazine
@@ -51,122 +77,874 @@ class Publication(db.Model):
     issue = db.Column(db.String(20), comment='杂志期号')  # 杂志专属
     publisher = db.Column(db.String(100), comment='杂志出版商')  # 杂志专属
     is_latest = db.Column(db.Boolean, default=True, comment='杂志是否最新')  # 杂志专属
-    is_borrowed = db.Column(db.Boolean, default=False, comment='是否已借出')
-    borrower_id = db.Column(db.Integer, db.ForeignKey('users.id'), comment='借阅人ID')
-    due_date = db.Column(db.DateTime, comment='到期归还日期')
+    # 副本数量（借还时在同一事务中增减，列表和可借状态查询不需要扫描副本表）
+    total_copies = db.Column(db.Integer, nullable=False, default=0, comment='副本总数')
+    available_copies = db.Column(db.Integer, nullable=False, default=0, comment='可借副本数（不含已预留的）')
+    # 预约排队：hold_tail为最近发出的预约号，hold_head为最近叫到的预约号，
+    # 排队位置 = 预约号 - hold_head（O(1)，无需统计排在前面的预约）
+    hold_head = db.Column(db.Integer, nullable=False, default=0, comment='最近叫到的预约号')
+    hold_tail = db.Column(db.Integer, nullable=False, default=0, comment='最近发出的预约号')
+    # 列表显示的状态（副本数量、排队人数）变化时在同一UPDATE中+1，目录页面按页面上出版物的版本号缓存（见http_cache.py）
+    version = db.Column(db.Integer, nullable=False, default=0, comment='版本号')
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
 
     # 关联关系：出版物 -> 借阅记录（一对多）
     borrow_records = db.relationship('BorrowRecord', backref='publication', lazy=True)
+    # 关联关系：出版物 -> 副本（一对多）
+    copies = db.relationship('Copy', backref='publication', lazy=True)
+
+    def to_dict(self):
+        """序列化为字典（供JSON列表接口使用）"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'type': self.type,
+            'author': self.author,
+            'isbn': self.isbn,
+            'category': self.category,
+            'issue': self.issue,
+            'publisher': self.publisher,
+            'is_latest': self.is_latest,
+            'is_borrowed': self.is_borrowed,
+            'total_copies': self.total_copies,
+            'available_copies': self.available_copies,
+            'hold_queue_length': self.hold_queue_length
+        }
+
+    @property
+    def is_available(self):
+        """是否有可直接借阅的副本"""
+        return self.available_copies > 0
+
+    @property
+    def is_borrowed(self):
+        """是否没有可直接借阅的副本（全部借出或已预留给预约者）"""
+        return not self.is_available
+
+    @property
+    def hold_queue_length(self):
+        """排队人数（排在中间的预约被取消时，轮到该号才跳过，此前仍计入）"""
+        return self.hold_tail - self.hold_head
 
     # 获取最大借阅天数
     def get_max_loan_days(self):
         """根据类型返回最大借阅天数（图书14天，杂志7天）"""
         return MAX_BOOK_LOAN_DAYS if self.type == 'book' else MAX_MAGAZINE_LOAN_DAYS
 
-    # 检查是否逾期（核心修复：移到Publication模型，因为只有它有due_date）
     @property
-    def is_overdue(self):
-        """判断当前出版物是否逾期未归还"""
-        if not self.is_borrowed or not self.due_date:
-            return False
-        return datetime.utcnow() > self.due_date
+    def type_counter_name(self):
+        """该出版物对应的类型计数器名称（未知类型返回None）"""
+        return {'book': 'total_books', 'magazine': 'total_magazines'}.get(self.type)
+
+    def next_due_date(self):
+        """已借出副本中最早的到期时间（没有借出的副本时返回None）"""
+        return db.session.query(db.func.min(Copy.due_date)).filter(
+            Copy.publication_id == self.id, Copy.status == 'borrowed').scalar()
+
+    @staticmethod
+    def _lock(pub_id):
+        """
+        锁定出版物行（SELECT ... FOR UPDATE）：借阅、归还、预约对同一出版物的操作都先锁定该行，
+        加锁顺序一致（出版物 -> 读者 -> 副本 -> 预约），同一出版物的操作依次执行
+        """
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite忽略FOR UPDATE：用不改变数据的UPDATE取得数据库写锁（测试环境中同样依次执行）
+            db.session.execute(db.text("UPDATE publications SET id = id WHERE id = :id"), {'id': pub_id})
+            return
+        db.session.execute(db.select(Publication.id).where(Publication.id == pub_id).with_for_update())
+
+    # 副本管理
+    def add_copies(self, count=1):
+        """
+        新增副本（在当前事务中执行，由调用方提交；出版物须已写入数据库）
+        新副本优先预留给排队的预约者，其余计入可借数量
+        :param count: 新增数量
+        """
+        Publication._lock(self.id)
+        now = datetime.utcnow()
+        copies = [Copy(publication_id=self.id, status='available') for _ in range(count)]
+        db.session.add_all(copies)
+        db.session.flush()
+        db.session.execute(
+            db.update(Publication).where(Publication.id == self.id)
+            .values(total_copies=Publication.total_copies + count, version=Publication.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        for copy in copies:
+            Publication._shelve_copy(self.id, copy.id, now)
 
     # 借阅操作
     def borrow(self, user):
         """
-        借阅出版物
+        借阅出版物：有预留给本人的副本时借阅该副本；否则条件UPDATE扣减可借数量（available_copies > 0），
+        再用条件UPDATE认领任意一个空闲副本（并发安全：可借数量为0时只有一个请求能扣减成功）
         :param user: 借阅用户对象
         :return: (是否成功, 提示信息)
         """
-        # 检查是否已被借出
-        if self.is_borrowed:
-            due_date_str = self.due_date.strftime('%Y-%m-%d') if self.due_date else '未知时间'
-            return False, f"《{self.title}》已被借出，预计{due_date_str}归还"
-
+        title = self.title
+        now = datetime.utcnow()
+        due_date = now + timedelta(days=self.get_max_loan_days())
         try:
-            # 更新出版物状态
-            self.is_borrowed = True
-            self.borrower_id = user.id
-            self.due_date = datetime.utcnow() + timedelta(days=self.get_max_loan_days())
+            Publication._lock(self.id)
+            # 每位读者同一出版物只借一个副本（已锁定出版物行，检查与借阅之间不会插入其他借阅）
+            if Copy.query.filter_by(publication_id=self.id, borrower_id=user.id, status='borrowed') \
+                    .populate_existing().first():
+                db.session.rollback()
+                BORROWS.inc(result='conflict')
+                return False, f"你已借阅《{title}》，请勿重复借阅"
+            ready_hold = Hold.query.filter_by(publication_id=self.id, user_id=user.id, status='ready') \
+                .populate_existing().first()
+            if ready_hold is not None:
+                # 借阅预留给本人的副本，预约完成
+                copy_id = ready_hold.copy_id
+                claimed = db.session.execute(
+                    db.update(Copy)
+                    .where(Copy.id == copy_id, Copy.status == 'reserved', Copy.reserved_for_id == user.id)
+                    .values(status='borrowed', borrower_id=user.id, due_date=due_date,
+                            reserved_for_id=None, reserved_until=None)
+                    .execution_options(synchronize_session=False)
+                ).rowcount == 1
+                ready_hold.status = 'fulfilled'
+            else:
+                # 原子扣减：UPDATE ... WHERE id = ? AND available_copies > 0
+                result = db.session.execute(
+                    db.update(Publication)
+                    .where(Publication.id == self.id, Publication.available_copies > 0)
+                    .values(available_copies=Publication.available_copies - 1, version=Publication.version + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    # 没有可借副本：读取最早的到期时间用于提示
+                    db.session.rollback()
+                    BORROWS.inc(result='conflict')
+                    next_due = self.next_due_date()
+                    if next_due is None:
+                        return False, f"《{title}》的副本已全部预留给预约者，可预约排队"
+                    return False, f"《{title}》已全部借出，预计{next_due.strftime('%Y-%m-%d')}归还，可预约排队"
+                copy_id, claimed = Copy.claim_available(self.id, user.id, due_date)
+
+            if not claimed:
+                db.session.rollback()
+                BORROWS.inc(result='error')
+                return False, f"借阅失败：《{title}》的副本状态已变化，请重试"
 
-            # 创建借阅记录
-            record = BorrowRecord(
+            # 创建借阅记录（与状态更新在同一事务中提交）
+            db.session.add(BorrowRecord(
                 publication_id=self.id,
+                copy_id=copy_id,
                 user_id=user.id,
-                borrow_time=datetime.utcnow(),
+                borrow_time=now,
                 status='borrowed'
-            )
-            db.session.add(record)
+            ))
+            PublicationBorrowCount.increment(self.id)
             db.session.commit()
-
-            due_date_str = self.due_date.strftime('%Y-%m-%d')
-            return True, f"成功借阅《{self.title}》，请于{due_date_str}前归还"
+            BORROWS.inc(result='success')
+            return True, f"成功借阅《{title}》，请于{due_date.strftime('%Y-%m-%d')}前归还"
         except Exception as e:
             db.session.rollback()
+            BORROWS.inc(result='error')
             return False, f"借阅失败：{str(e)}"
 
     # 归还操作
-    def return_book(self):
+    def return_book(self, user=None, copy_id=None):
         """
-        归还出版物
+        归还出版物（并发安全：加锁读取借出的副本，重复归还只有一次生效）
+        有预约时在同一事务中把副本预留给排在最前的预约者，否则计入可借数量
+        :param user: 归还用户对象（None表示不校验借阅人，供管理员使用，此时须指定copy_id）
+        :param copy_id: 归还的副本ID（None表示该用户借阅的任意一个副本）
         :return: (是否成功, 提示信息)
         """
-        # 检查是否未被借出
-        if not self.is_borrowed:
-            return False, "该出版物未被借出，无需归还"
-
+        title = self.title
+        now = datetime.utcnow()
         try:
+            Publication._lock(self.id)
+            query = db.select(Copy.id, Copy.borrower_id).where(
+                Copy.publication_id == self.id, Copy.status == 'borrowed')
+            if user is not None:
+                query = query.where(Copy.borrower_id == user.id)
+            if copy_id is not None:
+                query = query.where(Copy.id == copy_id)
+            copy = db.session.execute(query.limit(1).with_for_update()).first()
+            if copy is None:
+                db.session.rollback()
+                RETURNS.inc(result='not_borrowed')
+                return False, "该出版物未被借出，无需归还"
+
             # 更新借阅记录（标记归还时间和状态）
-            record = BorrowRecord.query.filter_by(
-                publication_id=self.id,
-                user_id=self.borrower_id,
-                status='borrowed'
-            ).order_by(BorrowRecord.borrow_time.desc()).first()
+            db.session.execute(
+                db.update(BorrowRecord)
+                .where(BorrowRecord.publication_id == self.id,
+                       BorrowRecord.user_id == copy.borrower_id,
+                       BorrowRecord.status == 'borrowed',
+                       or_(BorrowRecord.copy_id == copy.id, BorrowRecord.copy_id.is_(None)))
+                .values(return_time=now, status='returned')
+                .execution_options(synchronize_session=False)
+            )
+            # 已归还的借阅不再显示逾期状态（无需等待下次扫描）
+            db.session.execute(db.delete(OverdueLoan).where(OverdueLoan.copy_id == copy.id))
+            Publication._shelve_copy(self.id, copy.id, now)
+            db.session.commit()
+            RETURNS.inc(result='success')
+            return True, f"成功归还《{title}》"
+        except Exception as e:
+            db.session.rollback()
+            RETURNS.inc(result='error')
+            return False, f"归还失败：{str(e)}"
 
-            if record:
-                record.return_time = datetime.utcnow()
-                record.status = 'returned'
+    # 预约操作
+    def place_hold(self, user):
+        """
+        预约没有可借副本的出版物：条件UPDATE取号（hold_tail + 1），按号排队
+        先锁定出版物行和读者行再检查（同一读者同时提交的预约依次执行，不会重复预约或超过上限）
+        :param user: 预约用户对象
+        :return: (是否成功, 提示信息)
+        """
+        title = self.title
+        try:
+            Publication._lock(self.id)
+            db.session.execute(db.select(User.id).where(User.id == user.id).with_for_update())
+            active = Hold.query.filter(Hold.user_id == user.id, Hold.status.in_(Hold.ACTIVE_STATUSES))
+            if active.filter(Hold.publication_id == self.id).populate_existing().first():
+                db.session.rollback()
+                return False, f"你已预约《{title}》"
+            if Copy.query.filter_by(publication_id=self.id, borrower_id=user.id, status='borrowed') \
+                    .populate_existing().first():
+                db.session.rollback()
+                return False, f"你已借阅《{title}》"
+            if active.count() >= HOLD_MAX_ACTIVE:
+                db.session.rollback()
+                return False, f"最多同时预约{HOLD_MAX_ACTIVE}本出版物"
 
-            # 重置出版物状态
-            self.is_borrowed = False
-            self.borrower_id = None
-            self.due_date = None
+            # 原子取号：UPDATE ... WHERE id = ? AND available_copies = 0
+            result = db.session.execute(
+                db.update(Publication)
+                .where(Publication.id == self.id, Publication.available_copies == 0)
+                .values(hold_tail=Publication.hold_tail + 1, version=Publication.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                return False, f"《{title}》当前可直接借阅，无需预约"
 
+            # 本事务已锁定该行，读到的hold_tail即为自己的号
+            head, ticket = db.session.execute(
+                db.select(Publication.hold_head, Publication.hold_tail).where(Publication.id == self.id)
+            ).one()
+            db.session.add(Hold(publication_id=self.id, user_id=user.id, ticket=ticket, status='waiting'))
             db.session.commit()
-            return True, f"成功归还《{self.title}》"
+            return True, f"成功预约《{title}》，当前排在第{ticket - head}位"
         except Exception as e:
             db.session.rollback()
-            return False, f"归还失败：{str(e)}"
+            return False, f"预约失败：{str(e)}"
+
+    @staticmethod
+    def _shelve_copy(pub_id, copy_id, now):
+        """
+        处理空出的副本（归还、新增、预留被取消或超时）：预留给排在最前的等待预约，无人等待时计入可借数量
+        在当前事务中执行（由调用方提交），调用方须已锁定出版物行
+        :return: 被预留的预约，计入可借数量时返回None
+        """
+        last_ticket = 0
+        while True:
+            # 加锁读取（读到其他事务已提交的最新预约，而不是本事务开始时的快照）
+            hold = Hold.query.filter(Hold.publication_id == pub_id, Hold.status == 'waiting',
+                                     Hold.ticket > last_ticket) \
+                .order_by(Hold.ticket).with_for_update().populate_existing().first()
+            if hold is None:
+                break
+            last_ticket = hold.ticket
+            # 预约可能在此期间被取消：条件UPDATE，失败则顺延到下一位
+            reserved_until = now + timedelta(days=HOLD_PICKUP_DAYS)
+            result = db.session.execute(
+                db.update(Hold)
+                .where(Hold.id == hold.id, Hold.status == 'waiting')
+                .values(status='ready', copy_id=copy_id, ready_at=now, expires_at=reserved_until)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                continue
+            db.session.execute(
+                db.update(Copy).where(Copy.id == copy_id)
+                .values(status='reserved', borrower_id=None, due_date=None,
+                        reserved_for_id=hold.user_id, reserved_until=reserved_until)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                db.update(Publication).where(Publication.id == pub_id)
+                .values(hold_head=hold.ticket, version=Publication.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            return hold
+
+        # 无人等待：副本放回可借库存，叫号到队尾（跳过已取消的号）
+        db.session.execute(
+            db.update(Copy).where(Copy.id == copy_id)
+            .values(status='available', borrower_id=None, due_date=None, reserved_for_id=None, reserved_until=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            db.update(Publication).where(Publication.id == pub_id)
+            .values(available_copies=Publication.available_copies + 1, hold_head=Publication.hold_tail,
+                    version=Publication.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return None
+
+
+# ====================== 副本表 ======================
+class Copy(db.Model):
+    """出版物的一个实体副本（借阅、归还、预留都以副本为单位）"""
+    __tablename__ = 'copies'
+    __table_args__ = (
+        db.Index('ix_copies_pub_status', 'publication_id', 'status'),
+        db.Index('ix_copies_status_due', 'status', 'due_date'),
+        db.Index('ix_copies_borrower', 'borrower_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    publication_id = db.Column(db.Integer, db.ForeignKey('publications.id'), nullable=False, comment='出版物ID')
+    barcode = db.Column(db.String(50), unique=True, comment='条码（馆藏登记号）')
+    # 状态：available（可借）/borrowed（已借出）/reserved（已预留给预约者）
+    status = db.Column(db.String(10), nullable=False, default='available', comment='副本状态')
+    borrower_id = db.Column(db.Integer, db.ForeignKey('users.id'), comment='借阅人ID')
+    due_date = db.Column(db.DateTime, comment='到期归还日期')
+    reserved_for_id = db.Column(db.Integer, db.ForeignKey('users.id'), comment='预留给的预约者ID')
+    reserved_until = db.Column(db.DateTime, comment='预留截止时间')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='创建时间')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    # 检查是否逾期
+    @property
+    def is_overdue(self):
+        """判断副本是否逾期未归还"""
+        if self.status != 'borrowed' or not self.due_date:
+            return False
+        return datetime.utcnow() > self.due_date
+
+    @staticmethod
+    def claim_available(pub_id, user_id, due_date, retries=3):
+        """
+        认领出版物的任意一个空闲副本（在当前事务中执行，调用方须已扣减可借数量）：
+        加锁选取（MySQL跳过被其他事务锁定的副本），再用条件UPDATE认领，失败时重试
+        :return: (副本ID, 是否成功)
+        """
+        for _ in range(retries):
+            copy_id = db.session.execute(
+                db.select(Copy.id).where(Copy.publication_id == pub_id, Copy.status == 'available')
+                .limit(1).with_for_update(skip_locked=True)
+            ).scalar()
+            if copy_id is None:
+                break
+            result = db.session.execute(
+                db.update(Copy)
+                .where(Copy.id == copy_id, Copy.status == 'available')
+                .values(status='borrowed', borrower_id=user_id, due_date=due_date)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                return copy_id, True
+        return None, False
 
 
 # ====================== 借阅记录表 ======================
 class BorrowRecord(db.Model):
     __tablename__ = 'borrow_records'
+    __table_args__ = (
+        db.Index('ix_borrow_records_user_status', 'user_id', 'status'),
+        db.Index('ix_borrow_records_user_time', 'user_id', 'borrow_time'),
+        db.Index('ix_borrow_records_pub_status_time', 'publication_id', 'status', 'borrow_time'),
+        db.Index('ix_borrow_records_status_return', 'status', 'return_time'),
+        db.Index('ix_borrow_records_borrow_time', 'borrow_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     publication_id = db.Column(db.Integer, db.ForeignKey('publications.id'), nullable=False, comment='出版物ID')
+    copy_id = db.Column(db.Integer, db.ForeignKey('copies.id'), comment='副本ID')
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='借阅人ID')
     borrow_time = db.Column(db.DateTime, default=datetime.utcnow, comment='借阅时间')
     return_time = db.Column(db.DateTime, comment='归还时间')
     status = db.Column(db.String(10), default='borrowed', comment='状态：borrowed/returned')  # borrowed/returned
     created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='记录创建时间')
 
+    copy = db.relationship('Copy')
+
+    def to_dict(self):
+        """序列化为字典（供JSON列表接口使用）"""
+        return {
+            'id': self.id,
+            'publication_id': self.publication_id,
+            'copy_id': self.copy_id,
+            'title': self.publication.title if self.publication else None,
+            'borrow_time': self.borrow_time.isoformat() if self.borrow_time else None,
+            'return_time': self.return_time.isoformat() if self.return_time else None,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'status': self.status,
+            'is_overdue': self.is_overdue
+        }
+
+    @property
+    def due_date(self):
+        """未归还时为借阅副本的到期时间，已归还为None"""
+        if self.status != 'borrowed' or self.copy is None or self.copy.borrower_id != self.user_id:
+            return None
+        return self.copy.due_date
+
     # 补充：通过借阅记录获取是否逾期（兼容模板逻辑）
     @property
     def is_overdue(self):
-        """通过关联的出版物判断是否逾期"""
-        return self.publication.is_overdue if self.publication else False
+        """通过借阅的副本判断是否逾期（已归还的记录不算逾期）"""
+        return self.due_date is not None and datetime.utcnow() > self.due_date
+
+
+# ====================== 借阅记录归档表 ======================
+class BorrowRecordArchive(db.Model):
+    """归还已久的借阅记录（由archive.py从borrow_records批量移入，保留原ID），热表大小不随历史增长"""
+    __tablename__ = 'borrow_records_archive'
+    __table_args__ = (
+        db.Index('ix_borrow_records_archive_user_time', 'user_id', 'borrow_time'),
+        db.Index('ix_borrow_records_archive_pub_time', 'publication_id', 'borrow_time'),
+        db.Index('ix_borrow_records_archive_borrow_time', 'borrow_time'),
+        db.Index('ix_borrow_records_archive_status_return', 'status', 'return_time'),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False, comment='原借阅记录ID')
+    publication_id = db.Column(db.Integer, db.ForeignKey('publications.id'), nullable=False, comment='出版物ID')
+    copy_id = db.Column(db.Integer, comment='副本ID')
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='借阅人ID')
+    borrow_time = db.Column(db.DateTime, comment='借阅时间')
+    return_time = db.Column(db.DateTime, comment='归还时间')
+    status = db.Column(db.String(10), default='returned', comment='状态（归档的均为returned）')
+    created_at = db.Column(db.DateTime, comment='记录创建时间')
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, comment='归档时间')
+
+    publication = db.relationship('Publication')
+
+    # 归档的记录均已归还（与BorrowRecord的属性一致，模板可共用）
+    due_date = None
+    is_overdue = False
+
+    def to_dict(self):
+        """序列化为字典（与BorrowRecord.to_dict字段一致）"""
+        return {
+            'id': self.id,
+            'publication_id': self.publication_id,
+            'copy_id': self.copy_id,
+            'title': self.publication.title if self.publication else None,
+            'borrow_time': self.borrow_time.isoformat() if self.borrow_time else None,
+            'return_time': self.return_time.isoformat() if self.return_time else None,
+            'due_date': None,
+            'status': self.status,
+            'is_overdue': False
+        }
+
+
+# ====================== 出版物借阅次数表 ======================
+class PublicationBorrowCount(db.Model):
+    """每个出版物的累计借阅次数（借阅时增量维护，含已归档的记录），借阅排行直接按索引读取前N名"""
+    __tablename__ = 'publication_borrow_counts'
+    __table_args__ = (
+        db.Index('ix_publication_borrow_counts_count', 'borrow_count'),
+    )
+    publication_id = db.Column(db.Integer, db.ForeignKey('publications.id'), primary_key=True, comment='出版物ID')
+    borrow_count = db.Column(db.BigInteger, nullable=False, default=0, comment='累计借阅次数')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    publication = db.relationship('Publication')
+
+    @staticmethod
+    def increment(pub_id):
+        """
+        在当前事务中借阅次数+1（由调用方提交）；调用方须已锁定出版物行，首次借阅时插入不会并发冲突
+        :param pub_id: 出版物ID
+        """
+        result = db.session.execute(
+            db.update(PublicationBorrowCount).where(PublicationBorrowCount.publication_id == pub_id).values(
+                borrow_count=PublicationBorrowCount.borrow_count + 1,
+                updated_at=datetime.utcnow()
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(db.insert(PublicationBorrowCount).values(
+                publication_id=pub_id, borrow_count=1, updated_at=datetime.utcnow()))
+
+
+# ====================== 预约表 ======================
+class Hold(db.Model):
+    """出版物预约：每本出版物一个先进先出队列，ticket为取号顺序（见Publication.place_hold）"""
+    __tablename__ = 'holds'
+    __table_args__ = (
+        db.UniqueConstraint('publication_id', 'ticket', name='uq_holds_pub_ticket'),
+        db.Index('ix_holds_pub_status_ticket', 'publication_id', 'status', 'ticket'),
+        db.Index('ix_holds_user_status', 'user_id', 'status'),
+        db.Index('ix_holds_status_expires', 'status', 'expires_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    publication_id = db.Column(db.Integer, db.ForeignKey('publications.id'), nullable=False, comment='出版物ID')
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='预约人ID')
+    ticket = db.Column(db.Integer, nullable=False, comment='预约号（同一出版物内递增）')
+    copy_id = db.Column(db.Integer, db.ForeignKey('copies.id'), comment='预留的副本ID')
+    # 状态：waiting（排队中）/ready（已预留，待借阅）/fulfilled（已借阅）/cancelled（已取消）/expired（预留超时）
+    status = db.Column(db.String(10), nullable=False, default='waiting', comment='预约状态')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='预约时间')
+    ready_at = db.Column(db.DateTime, comment='开始预留时间')
+    expires_at = db.Column(db.DateTime, comment='预留截止时间')
+    notified_at = db.Column(db.DateTime, comment='发送可借阅通知的时间')
+
+    user = db.relationship('User')
+    publication = db.relationship('Publication')
+
+    # 有效（仍在队列中）的状态
+    ACTIVE_STATUSES = ('waiting', 'ready')
+
+    STATUS_LABELS = {
+        'waiting': '排队中',
+        'ready': '待借阅',
+        'fulfilled': '已借阅',
+        'cancelled': '已取消',
+        'expired': '已过期'
+    }
+
+    @property
+    def status_label(self):
+        return self.STATUS_LABELS.get(self.status, self.status)
+
+    @property
+    def position(self):
+        """排队位置（已预留为0，已结束为None；排在前面的预约被取消时可能偏大）"""
+        if self.status == 'ready':
+            return 0
+        if self.status == 'waiting':
+            return self.ticket - self.publication.hold_head
+        return None
+
+    def to_dict(self):
+        """序列化为字典（供JSON接口使用）"""
+        return {
+            'id': self.id,
+            'publication_id': self.publication_id,
+            'title': self.publication.title if self.publication else None,
+            'status': self.status,
+            'status_label': self.status_label,
+            'position': self.position,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+    def cancel(self, status='cancelled', now=None):
+        """
+        结束预约（读者取消，或预留超时由定时扫描调用）；已预留的副本在同一事务中顺延给下一位
+        :param status: cancelled（取消）/expired（超时）
+        :param now: 当前时间（默认当前时间）
+        :return: (是否成功, 提示信息)
+        """
+        now = now or datetime.utcnow()
+        title = self.publication.title
+        current_status = self.status
+        if current_status not in Hold.ACTIVE_STATUSES:
+            return False, "该预约已失效"
+        try:
+            if current_status == 'ready':
+                # 先锁定出版物（与借阅、归还的加锁顺序一致）
+                Publication._lock(self.publication_id)
+
+            result = db.session.execute(
+                db.update(Hold)
+                .where(Hold.id == self.id, Hold.status == current_status)
+                .values(status=status)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                return False, "该预约已失效"
+
+            # 副本仍预留给本人时顺延给下一位（无人等待则放回可借库存）
+            if current_status == 'ready' and self.copy_id is not None and db.session.execute(
+                db.select(Copy.id).where(Copy.id == self.copy_id, Copy.status == 'reserved',
+                                         Copy.reserved_for_id == self.user_id).with_for_update()
+            ).first():
+                Publication._shelve_copy(self.publication_id, self.copy_id, now)
+            db.session.commit()
+            return True, f"已取消对《{title}》的预约"
+        except Exception as e:
+            db.session.rollback()
+            return False, f"取消预约失败：{str(e)}"
 
 
 # ====================== 导入文档表 ======================
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_documents_uploader_time', 'uploader_id', 'upload_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False, comment='文件名')
     file_path = db.Column(db.String(500), nullable=False, comment='文件存储路径')
     file_type = db.Column(db.String(10), nullable=False, comment='文件类型：txt/md/doc/docx/pdf')
-    content = db.Column(db.Text, comment='文档原始内容')
-    translated_content = db.Column(db.Text, comment='文档翻译后内容')
+    file_hash = db.Column(db.String(64), comment='文件内容哈希（用于解析结果缓存）')
+    # 文档内容分块存放在document_content_chunks表，列表查询不会加载；这里只保存长度（字符数）
+    content_length = db.Column(db.Integer, nullable=False, default=0, comment='原始内容长度')
+    translated_length = db.Column(db.Integer, nullable=False, default=0, comment='翻译内容长度')
     uploader_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='上传人ID')
-    upload_time = db.Column(db.DateTime, default=datetime.utcnow, comment='上传时间')
\ No newline at end of file
+    upload_time = db.Column(db.DateTime, default=datetime.utcnow, comment='上传时间')
+    # 后台解析状态：pending（排队中）/processing（解析中）/done（完成）/failed（失败）
+    status = db.Column(db.String(20), nullable=False, default='pending', comment='解析状态')
+    progress = db.Column(db.Integer, nullable=False, default=0, comment='解析进度（0-100）')
+    error = db.Column(db.String(500), comment='解析失败原因')
+    started_at = db.Column(db.DateTime, comment='开始解析时间')
+    finished_at = db.Column(db.DateTime, comment='解析完成时间')
+
+    # 文档内容分块（按顺序，仅在需要时加载）
+    chunks = db.relationship('DocumentContentChunk', lazy='select', order_by='DocumentContentChunk.seq',
+                             cascade='all, delete-orphan')
+
+    # 状态中文名称（供模板显示）
+    STATUS_LABELS = {
+        'pending': '排队中',
+        'processing': '解析中',
+        'done': '已完成',
+        'failed': '解析失败'
+    }
+
+    @property
+    def status_label(self):
+        return self.STATUS_LABELS.get(self.status, self.status)
+
+    @property
+    def is_finished(self):
+        """解析任务是否已结束（完成或失败）"""
+        return self.status in ('done', 'failed')
+
+    def set_content(self, content, translated_content):
+        """设置文档内容（分块写入document_content_chunks表，替换旧内容）并记录长度"""
+        self.chunks = [DocumentContentChunk(**row) for row in DocumentContentChunk.split(content, translated_content)]
+        self.content_length = len(content or '')
+        self.translated_length = len(translated_content or '')
+
+    def to_dict(self):
+        """序列化为字典（不含文档内容，供JSON列表接口使用）"""
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'file_type': self.file_type,
+            'upload_time': self.upload_time.isoformat() if self.upload_time else None,
+            'status': self.status,
+            'progress': self.progress,
+            'content_length': self.content_length,
+            'translated_length': self.translated_length
+        }
+
+    def to_status_dict(self):
+        """返回解析状态（供状态查询接口使用）"""
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'status_label': self.status_label,
+            'progress': self.progress,
+            'error': self.error
+        }
+
+
+# ====================== 文档内容表 ======================
+class DocumentContentChunk(db.Model):
+    """
+    文档解析后的原文和译文，按顺序分块存储（与documents表分离，避免列表查询读取大字段）
+    解析时每批内容插入一行，不重写已写入的内容；每块记录之前内容的字符数，按页读取时只加载涉及的块
+    """
+    __tablename__ = 'document_content_chunks'
+    __table_args__ = (
+        # 全文索引（ngram分词支持中文），供search.py检索文档原文和译文
+        db.Index('ft_document_content_chunks', 'content', 'translated',
+                 mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+    )
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), primary_key=True, comment='文档ID')
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False, comment='块序号（从0开始）')
+    content_offset = db.Column(db.Integer, nullable=False, default=0, comment='本块之前的原文字符数')
+    translated_offset = db.Column(db.Integer, nullable=False, default=0, comment='本块之前的译文字符数')
+    content = db.Column(db.Text().with_variant(LONGTEXT, 'mysql'), comment='原文')
+    translated = db.Column(db.Text().with_variant(LONGTEXT, 'mysql'), comment='译文')
+
+    @staticmethod
+    def split(content, translated_content, chunk_chars=PARSE_FLUSH_CHARS):
+        """
+        把完整的原文和译文切分为块（每块最多chunk_chars个字符）
+        :return: 块的字段字典列表（不含document_id）
+        """
+        content = content or ''
+        translated_content = translated_content or ''
+        count = -(-max(len(content), len(translated_content)) // chunk_chars)
+        rows = []
+        for seq in range(count):
+            start = seq * chunk_chars
+            rows.append({
+                'seq': seq,
+                'content_offset': min(start, len(content)),
+                'translated_offset': min(start, len(translated_content)),
+                'content': content[start:start + chunk_chars],
+                'translated': translated_content[start:start + chunk_chars]
+            })
+        return rows
+
+    @staticmethod
+    def _read_range(document_id, translated, start, length):
+        """读取原文或译文[start, start + length)的字符：只加载与该范围重叠的块"""
+        chunks = DocumentContentChunk
+        offset = chunks.translated_offset if translated else chunks.content_offset
+        column = chunks.translated if translated else chunks.content
+        first = db.session.query(db.func.max(offset)).filter(
+            chunks.document_id == document_id, offset <= start).scalar()
+        if first is None:
+            return None
+        parts = db.session.query(column).filter(
+            chunks.document_id == document_id, offset >= first, offset < start + length
+        ).order_by(chunks.seq)
+        text = ''.join(part or '' for (part,) in parts)
+        return text[start - first:start - first + length]
+
+    @staticmethod
+    def read_slice(document_id, start, length):
+        """
+        读取原文和译文的一段
+        :param start: 起始位置（从0开始，按字符计）
+        :param length: 字符数
+        :return: (原文片段, 译文片段)，文档无内容时为(None, None)
+        """
+        return (DocumentContentChunk._read_range(document_id, False, start, length),
+                DocumentContentChunk._read_range(document_id, True, start, length))
+
+    @staticmethod
+    def iter_text(document_id, translated=False):
+        """按顺序逐块读取原文或译文（生成器，每次查询一块，供流式响应使用）"""
+        chunks = DocumentContentChunk
+        column = chunks.translated if translated else chunks.content
+        seq = -1
+        while True:
+            row = db.session.query(chunks.seq, column).filter(
+                chunks.document_id == document_id, chunks.seq > seq).order_by(chunks.seq).first()
+            if row is None:
+                break
+            seq, text = row
+            if text:
+                yield text
+
+
+# ====================== 统计报表表 ======================
+class Report(db.Model):
+    """管理员导出的统计报表（由reports.py的后台线程生成CSV/XLSX文件，相同参数的报表在有效期内直接复用）"""
+    __tablename__ = 'reports'
+    __table_args__ = (
+        db.Index('ix_reports_params_status', 'params_hash', 'status'),
+        db.Index('ix_reports_status_started', 'status', 'started_at'),
+        db.Index('ix_reports_finished', 'finished_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False, comment='报表类型（见reports.REPORT_KINDS）')
+    start_date = db.Column(db.Date, nullable=False, comment='统计开始日期（含）')
+    end_date = db.Column(db.Date, nullable=False, comment='统计结束日期（含）')
+    format = db.Column(db.String(10), nullable=False, comment='文件格式：csv/xlsx')
+    params_hash = db.Column(db.String(64), nullable=False, comment='报表参数哈希（类型、日期范围、格式）')
+    # 生成状态：pending（排队中）/processing（生成中）/done（完成）/failed（失败）
+    status = db.Column(db.String(20), nullable=False, default='pending', comment='生成状态')
+    row_count = db.Column(db.Integer, nullable=False, default=0, comment='已写入的数据行数')
+    file_path = db.Column(db.String(500), comment='报表文件路径')
+    file_size = db.Column(db.BigInteger, comment='报表文件大小（字节）')
+    error = db.Column(db.String(500), comment='生成失败原因')
+    requested_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='申请人ID')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, comment='申请时间')
+    started_at = db.Column(db.DateTime, comment='开始生成时间')
+    finished_at = db.Column(db.DateTime, comment='生成完成时间')
+
+    requester = db.relationship('User')
+
+    # 状态中文名称（供模板显示）
+    STATUS_LABELS = {
+        'pending': '排队中',
+        'processing': '生成中',
+        'done': '已完成',
+        'failed': '生成失败'
+    }
+
+    @property
+    def status_label(self):
+        return self.STATUS_LABELS.get(self.status, self.status)
+
+    @property
+    def is_finished(self):
+        """生成任务是否已结束（完成或失败）"""
+        return self.status in ('done', 'failed')
+
+    @property
+    def download_name(self):
+        """下载时的文件名，如loans_by_day_20250101_20250131.csv"""
+        return f"{self.kind}_{self.start_date:%Y%m%d}_{self.end_date:%Y%m%d}.{self.format}"
+
+    def to_status_dict(self):
+        """返回生成状态（供状态查询接口使用）"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'status_label': self.status_label,
+            'row_count': self.row_count,
+            'file_size': self.file_size,
+            'error': self.error
+        }
+
+
+# ====================== 统计计数表 ======================
+# 目录版本号：管理员增删出版物、批量导入时+1，用于页面缓存失效（见http_cache.py）；
+# 借还、预约只改变所涉及出版物的版本号（Publication.version），不写这一行。
+# 不在stats.COUNTER_QUERIES中，不会被全量重建重置；由迁移0008创建
+CATALOGUE_VERSION = 'catalogue_version'
+
+
+class StatCounter(db.Model):
+    """仪表盘计数器（注册、增删出版物时增量维护，见stats.py；已借出数量不在此表，避免借还时争用同一行）"""
+    __tablename__ = 'stat_counters'
+    name = db.Column(db.String(50), primary_key=True, comment='计数器名称')
+    value = db.Column(db.BigInteger, nullable=False, default=0, comment='计数值')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='更新时间')
+
+    @staticmethod
+    def adjust(name, delta=1):
+        """
+        在当前事务中增减计数（由调用方提交）；计数器尚未初始化时忽略，首次读取时会全量重建
+        :param name: 计数器名称（为None时忽略）
+        :param delta: 增量（可为负数）
+        """
+        if name is None:
+            return
+        db.session.execute(
+            db.update(StatCounter).where(StatCounter.name == name).values(
+                value=StatCounter.value + delta,
+                updated_at=datetime.utcnow()
+            )
+        )
+
+
+# ====================== 逾期状态表 ======================
+class OverdueLoan(db.Model):
+    """即将到期/已逾期的借阅（由overdue.py的扫描任务批量维护，请求中只读取）"""
+    __tablename__ = 'overdue_loans'
+    __table_args__ = (
+        db.Index('ix_overdue_loans_user_state', 'user_id', 'state'),
+        db.Index('ix_overdue_loans_state', 'state'),
+        db.Index('ix_overdue_loans_scanned_at', 'scanned_at'),
+    )
+    # 每个副本同一时间只有一条未归还的借阅
+    copy_id = db.Column(db.Integer, db.ForeignKey('copies.id'), primary_key=True, comment='副本ID')
+    publication_id = db.Column(db.Integer, db.ForeignKey('publications.id'), nullable=False, comment='出版物ID')
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, comment='借阅人ID')
+    due_date = db.Column(db.DateTime, nullable=False, comment='到期归还日期')
+    state = db.Column(db.String(10), nullable=False, comment='状态：due_soon/overdue')
+    overdue_days = db.Column(db.Integer, nullable=False, default=0, comment='逾期天数')
+    fine = db.Column(db.Numeric(10, 2), nullable=False, default=0, comment='罚款金额')
+    reminded_at = db.Column(db.DateTime, comment='最近一次提醒时间')
+    scanned_at = db.Column(db.DateTime, nullable=False, comment='最近一次扫描时间')
+
+    user = db.relationship('User')
+    publication = db.relationship('Publication')
+
+    STATE_LABELS = {'due_soon': '即将到期', 'overdue': '已逾期'}
+
+    @property
+    def state_label(self):
+        return self.STATE_LABELS.get(self.state, self.state)
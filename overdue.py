@@ -0,0 +1,259 @@
+"""
+逾期扫描任务：批量找出即将到期/已逾期的借阅，写入overdue_loans表并发送提醒；
+同时取消预留超时的预约（顺延给下一位），并通知预约者出版物已可借阅
+用法（由cron等定时执行，如每小时一次）：
+    python overdue.py
+"""
+import os
+import sys
+import json
+import math
+from decimal import Decimal
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
+from models import db, User, Publication, Copy, OverdueLoan, Hold
+from config import DUE_SOON_DAYS, OVERDUE_FINE_PER_DAY, OVERDUE_REMIND_INTERVAL_HOURS, \
+    OVERDUE_SCAN_BATCH_SIZE, REMINDER_SINK, REMINDER_FILE
+
+
+# ====================== 提醒发送方式 ======================
+def stdout_sink(reminders):
+    """输出到标准输出（开发环境使用）"""
+    for reminder in reminders:
+        print(json.dumps(reminder, ensure_ascii=False))
+
+
+def file_sink(reminders):
+    """追加写入REMINDER_FILE（每行一条JSON，可由其他程序投递邮件/短信）"""
+    os.makedirs(os.path.dirname(REMINDER_FILE), exist_ok=True)
+    with open(REMINDER_FILE, 'a', encoding='utf-8') as f:
+        f.writelines(json.dumps(reminder, ensure_ascii=False) + '\n' for reminder in reminders)
+
+
+REMINDER_SINKS = {
+    'stdout': stdout_sink,
+    'file': file_sink
+}
+
+
+def register_reminder_sink(name, func):
+    """
+    注册提醒发送方式
+    :param name: 名称（对应config.REMINDER_SINK）
+    :param func: 发送函数，接收一批提醒（字典列表）
+    """
+    REMINDER_SINKS[name] = func
+
+
+def get_reminder_sink(name):
+    if name not in REMINDER_SINKS:
+        raise ValueError(f"未知的提醒发送方式：{name}")
+    return REMINDER_SINKS[name]
+
+
+# ====================== 扫描 ======================
+def _reminder(row, loan):
+    if loan.state == 'overdue':
+        message = f"《{row.title}》已逾期{loan.overdue_days}天，当前罚款{loan.fine}元，请尽快归还"
+    else:
+        message = f"《{row.title}》将于{row.due_date.strftime('%Y-%m-%d')}到期，请按时归还"
+    return {
+        'user_id': row.borrower_id,
+        'username': row.username,
+        'publication_id': row.publication_id,
+        'copy_id': row.id,
+        'title': row.title,
+        'due_date': row.due_date.isoformat(),
+        'state': loan.state,
+        'overdue_days': loan.overdue_days,
+        'fine': float(loan.fine),
+        'message': message
+    }
+
+
+def _apply_batch(rows, now, report):
+    """更新一批借阅的逾期状态，返回需要发送的提醒"""
+    # 一次查询取出本批已有的状态
+    existing = {
+        loan.copy_id: loan
+        for loan in OverdueLoan.query.filter(OverdueLoan.copy_id.in_([row.id for row in rows]))
+    }
+    remind_before = now - timedelta(hours=OVERDUE_REMIND_INTERVAL_HOURS)
+    fine_per_day = Decimal(str(OVERDUE_FINE_PER_DAY))
+
+    reminders = []
+    for row in rows:
+        loan = existing.get(row.id)
+        if loan is None:
+            loan = OverdueLoan(copy_id=row.id)
+            db.session.add(loan)
+        elif loan.user_id != row.borrower_id or loan.due_date != row.due_date:
+            # 已归还后被重新借出（或续借），按新的借阅重新提醒
+            loan.reminded_at = None
+
+        if row.due_date < now:
+            state = 'overdue'
+            overdue_days = math.ceil((now - row.due_date).total_seconds() / 86400)
+        else:
+            state = 'due_soon'
+            overdue_days = 0
+
+        # 状态变化（即将到期 -> 已逾期）立即提醒，否则按间隔重复提醒
+        remind = loan.state != state or loan.reminded_at is None or loan.reminded_at <= remind_before
+        loan.publication_id = row.publication_id
+        loan.user_id = row.borrower_id
+        loan.due_date = row.due_date
+        loan.state = state
+        loan.overdue_days = overdue_days
+        loan.fine = fine_per_day * overdue_days
+        loan.scanned_at = now
+        if remind:
+            loan.reminded_at = now
+            reminders.append(_reminder(row, loan))
+        report[state] += 1
+    return reminders
+
+
+def scan_overdue(now=None, batch_size=OVERDUE_SCAN_BATCH_SIZE, sink=None):
+    """
+    扫描即将到期和已逾期的借阅：按副本的(due_date, id)游标分批范围查询（走status, due_date索引），
+    每批一个事务写入overdue_loans并发送提醒，最后清除已归还借阅的状态
+    :param now: 扫描时间（默认当前时间）
+    :param batch_size: 每批借阅数
+    :param sink: 提醒发送方式名称（默认config.REMINDER_SINK）
+    :return: 扫描报告 {'due_soon', 'overdue', 'reminded', 'cleared'}
+    """
+    now = now or datetime.utcnow()
+    send = get_reminder_sink(sink or REMINDER_SINK)
+    horizon = now + timedelta(days=DUE_SOON_DAYS)
+    report = {'due_soon': 0, 'overdue': 0, 'reminded': 0, 'cleared': 0}
+
+    last = None
+    while True:
+        query = db.session.query(
+            Copy.id, Copy.publication_id, Copy.borrower_id, Copy.due_date, Publication.title, User.username
+        ).join(Publication, Publication.id == Copy.publication_id).join(User, User.id == Copy.borrower_id).filter(
+            Copy.status == 'borrowed',
+            Copy.due_date < horizon
+        )
+        if last is not None:
+            last_due, last_id = last
+            query = query.filter(or_(
+                Copy.due_date > last_due,
+                and_(Copy.due_date == last_due, Copy.id > last_id)
+            ))
+        rows = query.order_by(Copy.due_date, Copy.id).limit(batch_size).all()
+        if not rows:
+            break
+        last = (rows[-1].due_date, rows[-1].id)
+
+        try:
+            reminders = _apply_batch(rows, now, report)
+            # 先发送再提交：提交失败时下次扫描会重发（至少发送一次）
+            if reminders:
+                send(reminders)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report['reminded'] += len(reminders)
+
+    # 本次未扫描到的条目对应的借阅已归还或已续借
+    report['cleared'] = db.session.execute(
+        db.delete(OverdueLoan).where(OverdueLoan.scanned_at < now)
+    ).rowcount
+    db.session.commit()
+    return report
+
+
+# ====================== 预约扫描 ======================
+def _hold_ready_reminder(hold):
+    return {
+        'user_id': hold.user_id,
+        'username': hold.user.username,
+        'publication_id': hold.publication_id,
+        'title': hold.publication.title,
+        'state': 'hold_ready',
+        'expires_at': hold.expires_at.isoformat(),
+        'message': f"你预约的《{hold.publication.title}》已可借阅，"
+                   f"请于{hold.expires_at.strftime('%Y-%m-%d %H:%M')}前借阅，逾期将顺延给下一位预约者"
+    }
+
+
+def scan_holds(now=None, batch_size=OVERDUE_SCAN_BATCH_SIZE, sink=None):
+    """
+    扫描预约：预留超时的预约改为expired并顺延给下一位（每个预约一个短事务，按(expires_at, id)游标分批），
+    再为新预留的预约发送可借阅通知
+    :param now: 扫描时间（默认当前时间）
+    :param batch_size: 每批预约数
+    :param sink: 提醒发送方式名称（默认config.REMINDER_SINK）
+    :return: 扫描报告 {'expired', 'notified'}
+    """
+    now = now or datetime.utcnow()
+    send = get_reminder_sink(sink or REMINDER_SINK)
+    report = {'expired': 0, 'notified': 0}
+
+    last = None
+    while True:
+        query = Hold.query.filter(Hold.status == 'ready', Hold.expires_at < now)
+        if last is not None:
+            last_expires, last_id = last
+            query = query.filter(or_(
+                Hold.expires_at > last_expires,
+                and_(Hold.expires_at == last_expires, Hold.id > last_id)
+            ))
+        holds = query.order_by(Hold.expires_at, Hold.id).limit(batch_size).all()
+        if not holds:
+            break
+        last = (holds[-1].expires_at, holds[-1].id)
+        for hold in holds:
+            success, _ = hold.cancel('expired', now)
+            report['expired'] += success
+
+    # 新预留（含上面顺延产生的）的预约：发送通知后记录时间，每批一个事务
+    while True:
+        holds = Hold.query.filter(Hold.status == 'ready', Hold.notified_at.is_(None)) \
+            .options(joinedload(Hold.user), joinedload(Hold.publication)) \
+            .order_by(Hold.id).limit(batch_size).all()
+        if not holds:
+            break
+        try:
+            send([_hold_ready_reminder(hold) for hold in holds])
+            for hold in holds:
+                hold.notified_at = now
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report['notified'] += len(holds)
+    return report
+
+
+# ====================== 查询（供请求使用） ======================
+def get_overdue_summary(user_id):
+    """
+    读者的逾期汇总（读取扫描结果，一次聚合查询）
+    :return: (逾期数量, 罚款合计)
+    """
+    count, fine = db.session.query(
+        db.func.count(OverdueLoan.copy_id),
+        db.func.coalesce(db.func.sum(OverdueLoan.fine), 0)
+    ).filter(OverdueLoan.user_id == user_id, OverdueLoan.state == 'overdue').one()
+    return count, fine
+
+
+def main():
+    from app import app
+
+    with app.app_context():
+        report = scan_overdue()
+        hold_report = scan_holds()
+    print(f"即将到期：{report['due_soon']}，已逾期：{report['overdue']}，"
+          f"发送提醒：{report['reminded']}，清除已归还：{report['cleared']}")
+    print(f"预约超时：{hold_report['expired']}，可借阅通知：{hold_report['notified']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import json
+import base64
+from datetime import datetime
+from flask import request, url_for
+from sqlalchemy import and_, or_
+from config import PAGE_SIZE, MAX_PAGE_SIZE
+
+
+class KeysetPage:
+    """游标分页结果：items为当前页数据，next_cursor用于获取下一页（无下一页时为None）"""
+
+    def __init__(self, items, next_cursor, per_page, cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+    def to_dict(self, serializer):
+        """转换为JSON结构（serializer将单条数据转换为字典）"""
+        return {
+            'items': [serializer(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'per_page': self.per_page
+        }
+
+
+def encode_cursor(values):
+    """将排序键的值编码为URL安全的游标字符串"""
+    data = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    """
+    解析游标字符串
+    :param cursor: 游标字符串
+    :param columns: 排序列（用于还原日期等类型）
+    :return: 排序键的值列表，游标无效时返回None
+    """
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if len(data) != len(columns):
+            return None
+        values = []
+        for column, value in zip(columns, data):
+            if value is not None and column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def _after(columns, values, descending):
+    """
+    构造“排在游标之后”的条件：(a, b) < (x, y) 展开为 a < x OR (a = x AND b < y)，
+    展开形式能被MySQL的复合索引范围扫描使用
+    """
+    conditions = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        compare = column < value if descending else column > value
+        conditions.append(and_(*equal_prefix, compare))
+    return or_(*conditions)
+
+
+def get_page_size():
+    """从请求参数per_page获取每页数量（限制在1到MAX_PAGE_SIZE之间）"""
+    per_page = request.args.get('per_page', PAGE_SIZE, type=int)
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def wants_json():
+    """请求是否需要JSON格式的列表（?format=json）"""
+    return request.args.get('format') == 'json'
+
+
+def pager_url(cursor=None, **overrides):
+    """生成当前页面的翻页链接（保留其他查询参数，替换游标）"""
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    args.update(overrides)
+    if cursor:
+        args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=None, descending=True):
+    """
+    游标（keyset）分页：按排序键定位下一页，不使用OFFSET，翻页成本与页码无关
+    :param query: SQLAlchemy查询（不要包含order_by）
+    :param columns: 排序列，最后一列必须唯一（通常为主键），如[Document.upload_time, Document.id]
+    :param cursor: 上一页返回的游标（None表示第一页）
+    :param per_page: 每页数量（默认取请求参数）
+    :param descending: 是否降序
+    :return: KeysetPage
+    """
+    per_page = per_page or get_page_size()
+    values = decode_cursor(cursor, columns)
+    if values is not None:
+        query = query.filter(_after(columns, values, descending))
+
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order_by).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return KeysetPage(rows, next_cursor, per_page, cursor)
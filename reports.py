@@ -0,0 +1,401 @@
+"""
+统计报表：管理员按日期范围申请报表（每日借阅、分类借阅、读者借阅、副本利用率、逾期趋势），
+由后台线程流式读取借阅记录和归档记录（服务端游标，不把结果集整个读入内存），边读边写入CSV/XLSX文件供下载。
+相同参数（类型、日期范围、格式）的报表在REPORT_CACHE_TTL秒内直接复用已生成或正在生成的报表。
+"""
+import os
+import csv
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from sqlalchemy import or_, and_
+from models import db, User, Publication, BorrowRecord, BorrowRecordArchive, Report
+from job_queue import JobQueue
+from config import REPORT_FOLDER, REPORT_WORKERS, REPORT_MAX_QUEUED, REPORT_JOB_TIMEOUT, REPORT_MAX_DAYS, \
+    REPORT_CACHE_TTL, REPORT_RETENTION_DAYS, REPORT_FETCH_SIZE, MAX_BOOK_LOAN_DAYS, MAX_MAGAZINE_LOAN_DAYS
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# 借阅记录表和归档表（归档表中是归还已久的记录，统计历史时两者都要读取）
+LOAN_TABLES = (BorrowRecord.__table__, BorrowRecordArchive.__table__)
+TYPE_LABELS = {'book': '图书', 'magazine': '杂志'}
+# XLSX单个工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048576
+
+
+class ReportError(Exception):
+    """报表无法生成（错误信息显示给管理员）"""
+
+
+# ====================== 查询 ======================
+def _select_loans(table, *conditions):
+    return db.select(table.c.id, table.c.publication_id, table.c.user_id, table.c.borrow_time,
+                     table.c.return_time).where(*conditions)
+
+
+def _loans_between(start, end, column='borrow_time'):
+    """
+    [start, end)内借出（column='return_time'时为归还）的借阅，借阅记录表与归档表的并集
+    :return: 子查询（列：id/publication_id/user_id/borrow_time/return_time）
+    """
+    selects = []
+    for table in LOAN_TABLES:
+        conditions = [table.c[column] >= start, table.c[column] < end]
+        if column == 'return_time':
+            # 按(status, return_time)索引查找
+            conditions.append(table.c.status == 'returned')
+        selects.append(_select_loans(table, *conditions))
+    return db.union_all(*selects).subquery('loans')
+
+
+def _loans_overlapping(start, end):
+    """与[start, end)有重叠的借阅：范围内借出的，加上范围开始前借出、开始时尚未归还的（子查询，列同上）"""
+    selects = []
+    for table in LOAN_TABLES:
+        selects.append(_select_loans(table, table.c.borrow_time >= start, table.c.borrow_time < end))
+        selects.append(_select_loans(
+            table, table.c.borrow_time < start,
+            or_(table.c.status == 'borrowed', and_(table.c.status == 'returned', table.c.return_time >= start))
+        ))
+    return db.union_all(*selects).subquery('loans')
+
+
+def _stream(query):
+    """流式执行查询（服务端游标，每次读取REPORT_FETCH_SIZE行）；应在with中使用，提前结束时关闭游标"""
+    return db.session.execute(query.execution_options(yield_per=REPORT_FETCH_SIZE))
+
+
+def _day_key(value):
+    # MySQL的DATE()返回date，SQLite的date()返回字符串
+    return str(value)[:10]
+
+
+def _dates(start, end):
+    return [(start + timedelta(days=i)).date() for i in range((end - start).days)]
+
+
+# ====================== 报表 ======================
+# 每个报表是一个生成器：参数为统计范围[start, end)（datetime），逐行产生数据（表头见REPORT_KINDS）
+def loans_by_day(start, end):
+    """每日借阅：借出次数、借阅读者数、归还次数（按日期分组在数据库中完成，结果只有天数行）"""
+    loans = _loans_between(start, end)
+    day = db.func.date(loans.c.borrow_time)
+    borrowed = {_day_key(d): (count, readers) for d, count, readers in db.session.execute(
+        db.select(day, db.func.count(), db.func.count(db.distinct(loans.c.user_id))).group_by(day))}
+
+    returns = _loans_between(start, end, 'return_time')
+    day = db.func.date(returns.c.return_time)
+    returned = {_day_key(d): count for d, count in db.session.execute(
+        db.select(day, db.func.count()).group_by(day))}
+
+    for d in _dates(start, end):
+        key = d.isoformat()
+        count, readers = borrowed.get(key, (0, 0))
+        yield [key, count, readers, returned.get(key, 0)]
+
+
+def loans_by_category(start, end):
+    """按类型、分类统计借出次数、涉及的出版物数和读者数"""
+    loans = _loans_between(start, end)
+    count = db.func.count().label('loans')
+    query = db.select(
+        Publication.type, Publication.category, count,
+        db.func.count(db.distinct(loans.c.publication_id)), db.func.count(db.distinct(loans.c.user_id))
+    ).join_from(loans, Publication, Publication.id == loans.c.publication_id).group_by(
+        Publication.type, Publication.category).order_by(count.desc())
+    with _stream(query) as rows:
+        for pub_type, category, loan_count, publications, readers in rows:
+            yield [TYPE_LABELS.get(pub_type, pub_type), category or '未分类', loan_count, publications, readers]
+
+
+def loans_by_user(start, end):
+    """按读者统计借出次数、借阅的出版物数和其中尚未归还的数量（读者多时行数多，流式写出）"""
+    loans = _loans_between(start, end)
+    count = db.func.count().label('loans')
+    query = db.select(
+        User.id, User.username, count, db.func.count(db.distinct(loans.c.publication_id)),
+        db.func.sum(db.case((loans.c.return_time.is_(None), 1), else_=0))
+    ).join_from(loans, User, User.id == loans.c.user_id).group_by(User.id, User.username).order_by(
+        count.desc(), User.id)
+    with _stream(query) as rows:
+        for user_id, username, loan_count, publications, unreturned in rows:
+            yield [user_id, username, loan_count, publications, unreturned]
+
+
+def utilization(start, end):
+    """
+    副本利用率（按类型、分类）：借出副本天数 / (副本数 × 天数)。
+    副本数取当前值（副本增减没有历史记录）；借出时长取借阅与统计范围重叠的部分，未归还的计到范围结束或当前时间
+    """
+    stop = min(end, datetime.utcnow())
+    days = max((stop - start).total_seconds() / 86400, 0)
+    copies = {(pub_type, category): int(total or 0) for pub_type, category, total in db.session.execute(
+        db.select(Publication.type, Publication.category, db.func.sum(Publication.total_copies))
+        .group_by(Publication.type, Publication.category))}
+
+    # (类型, 分类) -> [范围内借出次数, 借出秒数]
+    stats = {}
+    loans = _loans_overlapping(start, end)
+    query = db.select(Publication.type, Publication.category, loans.c.borrow_time, loans.c.return_time).join_from(
+        loans, Publication, Publication.id == loans.c.publication_id)
+    with _stream(query) as rows:
+        for pub_type, category, borrow_time, return_time in rows:
+            entry = stats.setdefault((pub_type, category), [0, 0.0])
+            if borrow_time >= start:
+                entry[0] += 1
+            seconds = (min(return_time or stop, stop) - max(borrow_time, start)).total_seconds()
+            if seconds > 0:
+                entry[1] += seconds
+
+    for key in sorted(set(copies) | set(stats), key=lambda k: (k[0] or '', k[1] or '')):
+        pub_type, category = key
+        loan_count, seconds = stats.get(key, (0, 0.0))
+        loan_days = seconds / 86400
+        capacity = copies.get(key, 0) * days
+        yield [TYPE_LABELS.get(pub_type, pub_type), category or '未分类', copies.get(key, 0), loan_count,
+               round(loan_days, 1), round(capacity, 1), round(loan_days / capacity * 100, 2) if capacity else 0]
+
+
+def overdue_trend(start, end):
+    """
+    逾期趋势（每日）：当日新增逾期数、当日逾期归还数、日终仍逾期未还的借阅数。
+    借阅记录不保存历史到期时间，按借阅时间 + 该类型的最大借阅天数推算（与Publication.get_max_loan_days一致）
+    """
+    now = datetime.utcnow()
+    n_days = (end - start).days
+    new_overdue = [0] * n_days
+    late_returns = [0] * n_days
+    # 日终逾期未还数的差分数组：逾期区间覆盖的日期[first, last)各+1
+    delta = [0] * (n_days + 1)
+
+    loans = _loans_overlapping(start, end)
+    query = db.select(Publication.type, loans.c.borrow_time, loans.c.return_time).join_from(
+        loans, Publication, Publication.id == loans.c.publication_id)
+    with _stream(query) as rows:
+        for pub_type, borrow_time, return_time in rows:
+            due = borrow_time + timedelta(days=MAX_BOOK_LOAN_DAYS if pub_type == 'book' else MAX_MAGAZINE_LOAN_DAYS)
+            if due >= (return_time or now):
+                continue
+            if start <= due < end:
+                new_overdue[(due - start).days] += 1
+            if return_time is not None and start <= return_time < end:
+                late_returns[(return_time - start).days] += 1
+            # 到期当日结束时已逾期；归还当日结束时已归还，未归还的计到今天
+            first = max((due - start).days, 0)
+            last = min((return_time - start).days if return_time else (now - start).days + 1, n_days)
+            if first < last:
+                delta[first] += 1
+                delta[last] -= 1
+
+    overdue = 0
+    for i, d in enumerate(_dates(start, end)):
+        overdue += delta[i]
+        yield [d.isoformat(), new_overdue[i], late_returns[i], overdue]
+
+
+# 报表类型 -> (名称, 表头, 生成函数)
+REPORT_KINDS = {
+    'loans_by_day': ('每日借阅', ['日期', '借出次数', '借阅读者数', '归还次数'], loans_by_day),
+    'loans_by_category': ('分类借阅', ['类型', '分类', '借出次数', '出版物数', '读者数'], loans_by_category),
+    'loans_by_user': ('读者借阅', ['用户ID', '用户名', '借出次数', '出版物数', '未归还'], loans_by_user),
+    'utilization': ('副本利用率', ['类型', '分类', '副本数', '借出次数', '借出副本天数', '可借副本天数', '利用率(%)'],
+                    utilization),
+    'overdue_trend': ('逾期趋势', ['日期', '新增逾期', '逾期归还', '日终逾期未还'], overdue_trend),
+}
+
+
+# ====================== 文件 ======================
+def _write_csv(path, header, rows, title=None):
+    # 带BOM的UTF-8，Excel直接打开时中文不乱码
+    count = 0
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_xlsx(path, header, rows, title=None):
+    # constant_memory：每写完一行即刷到临时文件，内存占用与行数无关（要求按行顺序写入）
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet(title)
+        sheet.write_row(0, 0, header)
+        count = 0
+        for row in rows:
+            if count + 1 >= XLSX_MAX_ROWS:
+                raise ReportError(f'超过XLSX单个工作表{XLSX_MAX_ROWS}行的上限，请改用CSV格式或缩小日期范围')
+            count += 1
+            sheet.write_row(count, 0, row)
+    finally:
+        workbook.close()
+    return count
+
+
+WRITERS = {'csv': _write_csv, 'xlsx': _write_xlsx}
+
+
+def available_formats():
+    """可用的文件格式（未安装xlsxwriter时只能导出CSV）"""
+    return [fmt for fmt in WRITERS if fmt != 'xlsx' or xlsxwriter is not None]
+
+
+# ====================== 申请与生成 ======================
+def params_hash(kind, start_date, end_date, fmt):
+    """报表参数的哈希（用于查找可复用的相同参数报表）"""
+    params = json.dumps({'kind': kind, 'start': start_date.isoformat(), 'end': end_date.isoformat(), 'format': fmt},
+                        sort_keys=True)
+    return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+
+def request_report(kind, start_date, end_date, fmt, user_id, now=None):
+    """
+    申请报表：相同参数的报表正在生成，或REPORT_CACHE_TTL秒内已生成且文件仍在时直接复用，否则新建pending状态的报表
+    （由调用方提交到report_queue）
+    :param kind: 报表类型（REPORT_KINDS的键）
+    :param start_date: 开始日期（YYYY-MM-DD，含）
+    :param end_date: 结束日期（YYYY-MM-DD，含）
+    :param fmt: 文件格式：csv/xlsx
+    :param user_id: 申请人ID
+    :return: (报表, 提示信息)，参数无效时报表为None
+    """
+    now = now or datetime.utcnow()
+    if kind not in REPORT_KINDS:
+        return None, "未知的报表类型"
+    if fmt not in available_formats():
+        return None, f"不支持的文件格式：{fmt}"
+    try:
+        start_date, end_date = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    except (TypeError, ValueError):
+        return None, "日期格式应为YYYY-MM-DD"
+    if start_date > end_date:
+        return None, "开始日期不能晚于结束日期"
+    if end_date > now.date():
+        return None, "结束日期不能晚于今天"
+    if (end_date - start_date).days + 1 > REPORT_MAX_DAYS:
+        return None, f"日期范围不能超过{REPORT_MAX_DAYS}天"
+
+    digest = params_hash(kind, start_date, end_date, fmt)
+    fresh_after = now - timedelta(seconds=REPORT_CACHE_TTL)
+    existing = Report.query.filter(
+        Report.params_hash == digest,
+        or_(Report.status.in_(('pending', 'processing')),
+            and_(Report.status == 'done', Report.finished_at >= fresh_after))
+    ).order_by(Report.id.desc()).first()
+    if existing is not None:
+        if existing.status != 'done':
+            return existing, "相同参数的报表正在生成，请稍候"
+        if os.path.exists(existing.file_path):
+            return existing, f"已有相同参数的报表（{existing.finished_at:%Y-%m-%d %H:%M}生成），可直接下载"
+
+    report = Report(kind=kind, start_date=start_date, end_date=end_date, format=fmt, params_hash=digest,
+                    status='pending', requested_by=user_id, created_at=now)
+    db.session.add(report)
+    db.session.commit()
+    return report, "报表已加入生成队列"
+
+
+def run_report_job(report_id):
+    """
+    生成报表（在应用上下文中执行）：认领排队中或中断的报表，写入临时文件后改名为正式文件
+    :param report_id: 报表ID
+    :return: 生成后的状态（done/failed），报表已被其他进程认领时为None
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=REPORT_JOB_TIMEOUT)
+    claimed = db.session.execute(
+        db.update(Report).where(
+            Report.id == report_id,
+            or_(Report.status == 'pending', and_(Report.status == 'processing', Report.started_at < stale_before))
+        ).values(status='processing', started_at=now, error=None)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return None
+
+    report = db.session.get(Report, report_id)
+    label, header, generate = REPORT_KINDS[report.kind]
+    start = datetime.combine(report.start_date, datetime.min.time())
+    end = datetime.combine(report.end_date + timedelta(days=1), datetime.min.time())
+    path = os.path.join(REPORT_FOLDER, f"report_{report.id}.{report.format}")
+    tmp_path = path + '.tmp'
+
+    rows = generate(start, end)
+    try:
+        row_count = WRITERS[report.format](tmp_path, header, rows, label)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        # 先关闭生成器（释放服务端游标）再回滚
+        rows.close()
+        db.session.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"报表{report_id}生成失败：{e}")
+        report.status = 'failed'
+        report.error = str(e)[:500]
+        report.finished_at = datetime.utcnow()
+        db.session.commit()
+        return report.status
+
+    report.status = 'done'
+    report.row_count = row_count
+    report.file_path = path
+    report.file_size = os.path.getsize(path)
+    report.finished_at = datetime.utcnow()
+    db.session.commit()
+    return report.status
+
+
+def purge_expired_reports(now=None, days=REPORT_RETENTION_DAYS, limit=100):
+    """
+    删除生成超过保留天数的报表文件和记录
+    :return: 删除的报表数
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)
+    reports = Report.query.filter(Report.finished_at < cutoff).order_by(Report.finished_at).limit(limit).all()
+    for report in reports:
+        if report.file_path and os.path.exists(report.file_path):
+            os.remove(report.file_path)
+        db.session.delete(report)
+    db.session.commit()
+    return len(reports)
+
+
+class ReportQueue(JobQueue):
+    """
+    报表生成队列：申请请求只创建pending状态的报表，由后台线程池生成文件
+    （生成过程主要在等待数据库返回数据，用线程即可，不需要像文档解析那样使用进程池）
+    """
+    model = Report
+    config_prefix = 'REPORT'
+    extension_name = 'reports'
+    messages = {
+        'queued': "报表已在生成队列中",
+        'full': "报表队列已满，将在空闲时自动生成",
+        'submitted': "报表已加入生成队列",
+        'error': "报表{}生成任务异常"
+    }
+    max_workers = REPORT_WORKERS
+    max_queued = REPORT_MAX_QUEUED
+    job_timeout = REPORT_JOB_TIMEOUT
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='report')
+
+    def _submit_job(self, executor, report_id):
+        return executor.submit(self._run, report_id)
+
+    def _run(self, report_id):
+        with self.app.app_context():
+            run_report_job(report_id)
+            purge_expired_reports()
+
+
+# 全局报表队列（在app.py中初始化）
+report_queue = ReportQueue()
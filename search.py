@@ -0,0 +1,108 @@
+import re
+from sqlalchemy import or_, case
+from sqlalchemy.dialects.mysql import match
+from models import db, Publication, Document, DocumentContentChunk
+
+# ISBN格式（10/13位数字，可含连字符）
+ISBN_PATTERN = re.compile(r'^[0-9Xx-]{10,17}$')
+
+
+def _use_fulltext():
+    """MySQL使用FULLTEXT（ngram分词）索引，其他数据库（如SQLite测试环境）退化为LIKE"""
+    return db.engine.dialect.name == 'mysql'
+
+
+def _escape_like(keyword):
+    return keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_publications(keyword, pub_type='all', available_only=True, page=1, per_page=20, entities=None):
+    """
+    按标题/作者/ISBN/出版商全文搜索出版物，按相关度排序
+    :param keyword: 搜索关键词
+    :param pub_type: 出版物类型（all/book/magazine）
+    :param available_only: 是否只返回可直接借阅的出版物（有未借出且未预留的副本）
+    :param page: 页码（从1开始）
+    :param per_page: 每页数量
+    :param entities: 只查询这些列（如页面缓存只需要ID和版本号），None表示返回出版物对象
+    :return: (出版物列表, 总数)
+    """
+    keyword = keyword.strip()
+    query = Publication.query
+    if available_only:
+        query = query.filter(Publication.available_copies > 0)
+    if pub_type != 'all':
+        query = query.filter(Publication.type == pub_type)
+
+    # ISBN精确匹配优先
+    isbn_match = None
+    if ISBN_PATTERN.match(keyword):
+        isbn_match = Publication.isbn.in_(list(dict.fromkeys([keyword, keyword.replace('-', '')])))
+
+    if _use_fulltext():
+        # 字段顺序需与models.py中的FULLTEXT索引一致
+        score = match(Publication.title, Publication.author, Publication.isbn, Publication.publisher,
+                      against=keyword).in_natural_language_mode()
+        query = query.filter(or_(score, isbn_match) if isbn_match is not None else score)
+        if isbn_match is not None:
+            query = query.order_by(case((isbn_match, 1), else_=0).desc())
+        query = query.order_by(score.desc(), Publication.id.desc())
+    else:
+        pattern = f"%{_escape_like(keyword)}%"
+        title_match = Publication.title.like(pattern, escape='\\')
+        conditions = [
+            title_match,
+            Publication.author.like(pattern, escape='\\'),
+            Publication.isbn.like(pattern, escape='\\'),
+            Publication.publisher.like(pattern, escape='\\')
+        ]
+        if isbn_match is not None:
+            # 带连字符的ISBN也能匹配库中不带连字符的ISBN
+            conditions.append(isbn_match)
+            query = query.order_by(case((isbn_match, 1), else_=0).desc())
+        query = query.filter(or_(*conditions))
+        # 标题命中的排在前面
+        query = query.order_by(case((title_match, 1), else_=0).desc(), Publication.id.desc())
+
+    if entities:
+        query = query.with_entities(*entities)
+    total = query.order_by(None).count()
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+    return items, total
+
+
+def search_documents(keyword, uploader_id=None, page=1, per_page=20):
+    """
+    全文搜索已解析文档的原文和译文，按相关度排序
+    :param keyword: 搜索关键词
+    :param uploader_id: 只搜索该用户上传的文档（None表示全部，供管理员使用）
+    :param page: 页码（从1开始）
+    :param per_page: 每页数量
+    :return: (文档列表, 总数)
+    """
+    keyword = keyword.strip()
+    # 内容在document_content_chunks表中按块检索，结果只返回documents行（不加载文档内容）
+    chunks = DocumentContentChunk
+    query = Document.query.filter(Document.status == 'done')
+    if uploader_id is not None:
+        query = query.filter(Document.uploader_id == uploader_id)
+
+    if _use_fulltext():
+        # 文档的相关度取其命中块中的最高分
+        score = match(chunks.content, chunks.translated, against=keyword).in_natural_language_mode()
+        hits = db.session.query(chunks.document_id, db.func.max(score).label('score')).filter(score) \
+            .group_by(chunks.document_id).subquery()
+        query = query.join(hits, hits.c.document_id == Document.id) \
+            .order_by(hits.c.score.desc(), Document.id.desc())
+    else:
+        pattern = f"%{_escape_like(keyword)}%"
+        content_match = db.session.query(chunks.document_id).filter(
+            chunks.document_id == Document.id,
+            or_(chunks.content.like(pattern, escape='\\'), chunks.translated.like(pattern, escape='\\'))
+        ).exists()
+        query = query.filter(or_(Document.filename.like(pattern, escape='\\'), content_match)) \
+            .order_by(Document.id.desc())
+
+    total = query.order_by(None).count()
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+    return items, total
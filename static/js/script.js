@@ -42,6 +42,31 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // 轮询后台解析/报表生成状态（完成后刷新页面）
+    const statusElements = document.querySelectorAll(
+        '.doc-status[data-finished="false"], .report-status[data-finished="false"]');
+    statusElements.forEach(el => {
+        const timer = setInterval(() => {
+            fetch(el.getAttribute('data-status-url'))
+                .then(resp => resp.json())
+                .then(data => {
+                    const bar = el.querySelector('.progress-bar');
+                    if (bar) {
+                        bar.style.width = `${data.progress}%`;
+                    }
+                    const badge = el.querySelector('.badge');
+                    if (badge) {
+                        badge.textContent = data.status_label;
+                    }
+                    if (data.status === 'done' || data.status === 'failed') {
+                        clearInterval(timer);
+                        location.reload();
+                    }
+                })
+                .catch(() => clearInterval(timer));
+        }, 3000);
+    });
+
     // 隐藏过期提示框
     const alertElements = document.querySelectorAll('.alert');
     alertElements.forEach(alert => {
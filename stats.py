@@ -0,0 +1,123 @@
+import time
+import threading
+from datetime import datetime
+from models import db, User, Publication, Copy, StatCounter, OverdueLoan, PublicationBorrowCount
+from config import STATS_CACHE_TTL
+
+# 增量维护的计数器：名称 -> 全量重建时使用的查询
+# （借阅/归还很频繁，已借出数量不做增量维护，否则所有借还事务都要锁同一计数行，见_count_borrowed）
+COUNTER_QUERIES = {
+    'total_books': lambda: Publication.query.filter_by(type='book').count(),
+    'total_magazines': lambda: Publication.query.filter_by(type='magazine').count(),
+    'total_users': lambda: User.query.filter_by(role='reader').count(),
+}
+
+
+class TTLCache:
+    """进程内缓存，条目超过ttl秒后失效"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, force_refresh=False):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is not None and not force_refresh and entry[0] > now:
+            return entry[1]
+
+        value = compute()
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_cache = TTLCache(STATS_CACHE_TTL)
+
+
+def rebuild_counters():
+    """全量重新统计所有计数器并写入stat_counters表"""
+    values = {name: query() for name, query in COUNTER_QUERIES.items()}
+    for name, value in values.items():
+        db.session.merge(StatCounter(name=name, value=value, updated_at=datetime.utcnow()))
+    db.session.commit()
+    return values
+
+
+def get_counters(force_refresh=False):
+    """
+    读取计数器（一次主键查询），计数器缺失或强制刷新时全量重建
+    :return: {计数器名称: 值}
+    """
+    if not force_refresh:
+        values = {counter.name: counter.value for counter in StatCounter.query.all()}
+        if all(name in values for name in COUNTER_QUERIES):
+            return values
+    return rebuild_counters()
+
+
+def _count_borrowed():
+    # 已借出的副本数：在借还事务之外按(status, due_date)索引计数，按TTL缓存
+    return Copy.query.filter_by(status='borrowed').count()
+
+
+def _count_overdue():
+    # 读取逾期扫描任务（overdue.py）维护的状态表，按TTL缓存
+    return OverdueLoan.query.filter_by(state='overdue').count()
+
+
+def get_dashboard_stats(force_refresh=False):
+    """
+    管理员仪表盘统计数据
+    :param force_refresh: 是否强制重新统计
+    :return: 统计字典（total_books/total_magazines/borrowed_count/overdue_count/total_users）
+    """
+    stats = dict(get_counters(force_refresh))
+    stats['borrowed_count'] = _cache.get_or_compute('borrowed_count', _count_borrowed, force_refresh)
+    stats['overdue_count'] = _cache.get_or_compute('overdue_count', _count_overdue, force_refresh)
+    return stats
+
+
+def _compute_statistics():
+    # 按分类统计图书
+    category_stats = db.session.query(
+        Publication.category,
+        db.func.count(Publication.id)
+    ).filter_by(type='book').group_by(Publication.category).all()
+
+    # 借阅次数统计（前10，读取借阅时增量维护的次数表，按索引取前10行）
+    borrow_stats = db.session.query(
+        Publication.title,
+        PublicationBorrowCount.borrow_count
+    ).join(Publication, Publication.id == PublicationBorrowCount.publication_id).order_by(
+        PublicationBorrowCount.borrow_count.desc()).limit(10).all()
+
+    # 逾期用户统计（读取逾期扫描任务维护的状态表）
+    overdue_users = db.session.query(
+        User.username,
+        db.func.count(OverdueLoan.copy_id)
+    ).join(OverdueLoan, User.id == OverdueLoan.user_id).filter(
+        OverdueLoan.state == 'overdue'
+    ).group_by(User.id, User.username).all()
+
+    # 转换为普通元组，缓存中不保留数据库行对象
+    return {
+        'category_stats': [tuple(row) for row in category_stats],
+        'borrow_stats': [tuple(row) for row in borrow_stats],
+        'overdue_users': [tuple(row) for row in overdue_users]
+    }
+
+
+def get_statistics(force_refresh=False):
+    """
+    借阅统计页数据（按TTL缓存，默认STATS_CACHE_TTL秒刷新一次）
+    :param force_refresh: 是否强制重新统计
+    :return: {'category_stats', 'borrow_stats', 'overdue_users'}
+    """
+    return _cache.get_or_compute('statistics', _compute_statistics, force_refresh)
@@ -0,0 +1,67 @@
+"""
+测试环境：临时SQLite数据库（DATABASE_URL）、离线翻译器（TRANSLATOR=local）和最低的bcrypt成本，
+须在导入app之前设置（解析进程以spawn方式启动，会继承这些环境变量）
+"""
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix='library-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp_dir, 'test.db')
+os.environ['TRANSLATOR'] = 'local'
+os.environ['BCRYPT_ROUNDS'] = '4'
+
+import pytest
+from app import app as flask_app
+from models import db, User, Publication, Document, Report, StatCounter, CATALOGUE_VERSION
+from auth import user_cache
+from http_cache import page_cache
+import stats
+
+PASSWORD = 'pw'
+
+
+@pytest.fixture
+def app():
+    """每个测试使用重新建表的数据库，并清空进程内缓存（ID会被复用）"""
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        # 与db.sql一致：目录版本计数器由迁移创建
+        db.session.add(StatCounter(name=CATALOGUE_VERSION, value=1))
+        for username, role in [('admin', 'admin'), ('reader1', 'reader'), ('reader2', 'reader')]:
+            user = User(username=username, role=role)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.commit()
+    user_cache.clear()
+    page_cache.clear()
+    stats._cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        # 删除测试上传的文件和生成的报表
+        for (file_path,) in db.session.query(Document.file_path).union_all(db.session.query(Report.file_path)):
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+        db.session.remove()
+
+
+def login(app, username):
+    """返回已登录username的测试客户端"""
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+def add_publications(count, copies=1, **fields):
+    """添加count个出版物（每个copies个副本），返回ID列表（需在应用上下文中调用）"""
+    ids = []
+    for i in range(count):
+        pub = Publication(title=f"Test Book {Publication.query.count() + 1}", type=fields.get('type', 'book'),
+                          author='作者', category=fields.get('category', '编程'))
+        db.session.add(pub)
+        db.session.flush()
+        pub.add_copies(copies)
+        ids.append(pub.id)
+    db.session.commit()
+    return ids
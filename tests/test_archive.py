@@ -0,0 +1,58 @@
+"""借阅记录归档：归还已久的记录移入归档表后，借阅次数重建和“我的借阅”历史记录仍包含这些借阅"""
+from datetime import datetime, timedelta
+from models import db, User, Publication, BorrowRecord, BorrowRecordArchive, PublicationBorrowCount
+from archive import archive_borrow_records, rebuild_borrow_counts
+from config import BORROW_ARCHIVE_DAYS
+from tests.conftest import add_publications, login
+
+
+def _borrow_and_return(pub_id, user, returned_days_ago=None):
+    """借阅一次（returned_days_ago不为None时归还，并把归还时间改为该天数之前），返回借阅记录ID"""
+    pub = db.session.get(Publication, pub_id)
+    assert pub.borrow(user)[0]
+    record_id = BorrowRecord.query.filter_by(publication_id=pub_id, user_id=user.id, status='borrowed').one().id
+    if returned_days_ago is not None:
+        assert pub.return_book(user)[0]
+        returned = datetime.utcnow() - timedelta(days=returned_days_ago)
+        db.session.execute(db.update(BorrowRecord).where(BorrowRecord.id == record_id)
+                           .values(borrow_time=returned - timedelta(days=7), return_time=returned))
+        db.session.commit()
+    return record_id
+
+
+def test_old_returned_records_are_archived_and_still_counted(app):
+    with app.app_context():
+        reader = User.query.filter_by(username='reader1').one()
+        old_id, recent_id = add_publications(2)
+        archived_ids = [
+            _borrow_and_return(old_id, reader, BORROW_ARCHIVE_DAYS + 30),
+            _borrow_and_return(recent_id, reader, BORROW_ARCHIVE_DAYS + 10),
+        ]
+        kept_ids = [
+            _borrow_and_return(recent_id, reader, 5),
+            _borrow_and_return(old_id, reader),
+        ]
+
+        assert archive_borrow_records(batch_size=1) == 2
+        assert sorted(row_id for (row_id,) in db.session.query(BorrowRecord.id)) == sorted(kept_ids)
+        assert sorted(row_id for (row_id,) in db.session.query(BorrowRecordArchive.id)) == sorted(archived_ids)
+        archived = db.session.get(BorrowRecordArchive, archived_ids[0])
+        assert (archived.publication_id, archived.user_id, archived.status) == (old_id, reader.id, 'returned')
+        # 重复执行不会重复归档
+        assert archive_borrow_records() == 0
+        assert BorrowRecordArchive.query.count() == 2
+
+        # 借阅次数含已归档的记录，全量重建后不变
+        counts = {row.publication_id: row.borrow_count for row in PublicationBorrowCount.query}
+        assert counts == {old_id: 2, recent_id: 2}
+        assert rebuild_borrow_counts() == 2
+        db.session.expire_all()
+        assert {row.publication_id: row.borrow_count for row in PublicationBorrowCount.query} == counts
+
+    client = login(app, 'reader1')
+    current = client.get('/reader/my_borrows?format=json').get_json()['items']
+    history = client.get('/reader/my_borrows?archived=1&format=json').get_json()['items']
+    assert sorted(item['id'] for item in current) == sorted(kept_ids)
+    assert sorted(item['id'] for item in history) == sorted(archived_ids)
+    assert all(item['status'] == 'returned' and item['title'] for item in history)
+    assert client.get('/reader/my_borrows?archived=1').status_code == 200
@@ -0,0 +1,75 @@
+"""登录与用户缓存：旧成本的密码哈希在登录成功时重新计算，修改密码或角色后已登录用户的缓存立即失效"""
+import bcrypt
+from models import db, User
+from auth import authenticate, user_cache
+from config import BCRYPT_ROUNDS
+from tests.conftest import login, PASSWORD
+
+
+def _cost(password_hash):
+    return int(password_hash.split('$')[2])
+
+
+def test_login_rehashes_password_with_old_cost(app):
+    old_cost = BCRYPT_ROUNDS + 1
+    with app.app_context():
+        user = User.query.filter_by(username='reader1').one()
+        user.password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=old_cost)).decode('utf-8')
+        db.session.commit()
+        old_hash = user.password_hash
+
+        # 密码错误时不重新哈希
+        assert authenticate('reader1', 'wrong') == (None, "用户名或密码错误")
+        db.session.expire_all()
+        assert User.query.filter_by(username='reader1').one().password_hash == old_hash
+
+    login(app, 'reader1')
+    with app.app_context():
+        user = User.query.filter_by(username='reader1').one()
+        assert _cost(user.password_hash) == BCRYPT_ROUNDS
+        assert not user.needs_rehash()
+        assert user.check_password(PASSWORD)
+    # 新哈希可以正常登录
+    login(app, 'reader1')
+
+
+def test_role_change_invalidates_cached_user(app):
+    client = login(app, 'reader1')
+    assert client.get('/admin/metrics').status_code == 403
+    with app.app_context():
+        user = User.query.filter_by(username='reader1').one()
+        user_id = user.id
+        # 已登录用户的信息已缓存
+        assert user_cache.get(user_id).role == 'reader'
+        user.role = 'admin'
+        db.session.commit()
+        assert user_cache.get(user_id) is None
+    assert client.get('/admin/metrics').status_code == 200
+    assert user_cache.get(user_id).role == 'admin'
+
+
+def test_password_change_invalidates_cached_user(app):
+    client = login(app, 'reader2')
+    assert client.get('/reader/my_borrows').status_code == 200
+    with app.app_context():
+        user = User.query.filter_by(username='reader2').one()
+        cached_hash = user_cache.get(user.id).password_hash
+        user.set_password('new-pw')
+        # flush时即失效；回滚后重新加载的仍是旧密码
+        db.session.flush()
+        assert user_cache.get(user.id) is None
+        db.session.rollback()
+        client.get('/reader/my_borrows')
+        assert user_cache.get(user.id).password_hash == cached_hash
+
+        user = User.query.filter_by(username='reader2').one()
+        user.set_password('new-pw')
+        db.session.commit()
+        assert user_cache.get(user.id) is None
+        new_hash = user.password_hash
+
+    client.get('/reader/my_borrows')
+    with app.app_context():
+        assert user_cache.get(User.query.filter_by(username='reader2').one().id).password_hash == new_hash
+        assert authenticate('reader2', PASSWORD)[0] is None
+        assert authenticate('reader2', 'new-pw')[0] is not None
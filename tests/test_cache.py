@@ -0,0 +1,46 @@
+"""文件内容缓存：覆盖写入时的大小统计、按访问时间淘汰，以及命中计数在/metrics和/admin/metrics中的输出"""
+import os
+from cache import ContentCache, content_cache
+from tests.conftest import login
+
+
+def test_overwrite_counts_only_the_size_difference(tmp_path):
+    cache = ContentCache(str(tmp_path), 10 * 1024)
+    cache.put('a', {'text': 'x' * 1000})
+    cache.put('a', {'text': 'x' * 2000})
+    cache.put('a', {'text': 'x' * 500})
+    assert cache.stats()['bytes'] == os.path.getsize(os.path.join(str(tmp_path), 'a.json'))
+    # 反复覆盖同一条目不会触发淘汰
+    for _ in range(50):
+        cache.put('a', {'text': 'x' * 1000})
+    assert cache.get('a') == {'text': 'x' * 1000}
+    assert cache.evictions == 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ContentCache(str(tmp_path), 5000)
+    for i in range(4):
+        cache.put(str(i), {'text': 'x' * 1000})
+        os.utime(os.path.join(str(tmp_path), f"{i}.json"), (i, i))
+    cache.put('4', {'text': 'x' * 1000})
+    assert cache.evictions >= 1
+    assert cache.get('0') is None
+    assert cache.get('4') is not None
+    stats = cache.stats()
+    assert stats['bytes'] <= 5000 * 0.9
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_cache_counters_are_exported(app, monkeypatch):
+    monkeypatch.setattr(content_cache, 'hits', 7)
+    monkeypatch.setattr(content_cache, 'misses', 3)
+    text = app.test_client().get('/metrics').get_data(as_text=True)
+    assert '# TYPE content_cache_hits_total counter' in text
+    assert 'content_cache_hits_total 7' in text
+    assert 'content_cache_misses_total 3' in text
+    assert 'translation_cache_evictions_total' in text
+    assert 'translation_cache_bytes' in text
+
+    caches = login(app, 'admin').get('/admin/metrics').get_json()['caches']
+    assert caches['content']['hits'] == 7
+    assert set(caches['translation']) == {'hits', 'misses', 'evictions', 'bytes', 'max_bytes'}
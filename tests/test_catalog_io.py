@@ -0,0 +1,44 @@
+"""批量导入：整批写入失败时每一行都计入错误数"""
+import io
+import catalog_io
+from catalog_io import import_publications
+from models import Publication
+
+
+def _jsonl(lines):
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+
+def test_failed_batch_counts_every_row(app, monkeypatch):
+    def fail(max_id):
+        raise RuntimeError('copies insert failed')
+
+    lines = ['{"title": "Book %d", "type": "book", "isbn": "978-%d"}' % (i, i) for i in range(5)]
+    lines.append('{"title": "", "type": "book"}')
+    lines.append('{"title": "Dup", "type": "book", "isbn": "978-0"}')
+    with app.app_context():
+        monkeypatch.setattr(catalog_io, '_insert_copies', fail)
+        report = import_publications(_jsonl(lines), 'jsonl', batch_size=100)
+        assert report['imported'] == 0
+        assert report['error_count'] == 7
+        assert report['total'] == report['imported'] + report['error_count']
+        assert sorted(line_no for line_no, _ in report['errors']) == list(range(1, 8))
+        assert Publication.query.count() == 0
+
+
+def test_batches_after_failure_still_import(app, monkeypatch):
+    calls = []
+    insert_copies = catalog_io._insert_copies
+
+    def fail_first(max_id):
+        calls.append(max_id)
+        if len(calls) == 1:
+            raise RuntimeError('copies insert failed')
+        insert_copies(max_id)
+
+    lines = ['{"title": "Book %d", "type": "book"}' % i for i in range(4)]
+    with app.app_context():
+        monkeypatch.setattr(catalog_io, '_insert_copies', fail_first)
+        report = import_publications(_jsonl(lines), 'jsonl', batch_size=2)
+        assert (report['total'], report['imported'], report['error_count']) == (4, 2, 2)
+        assert Publication.query.count() == 2
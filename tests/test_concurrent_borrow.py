@@ -0,0 +1,150 @@
+"""
+并发借还和预约：多个线程同时调用Publication.borrow/return_book/place_hold（每个线程独立的应用上下文和数据库会话），
+断言每个副本只借给一位读者、每个副本最多一条未归还的借阅记录、可借数量不小于0，
+同一读者同时提交的预约不会重复、不会超过同时有效的预约数上限
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
+from models import db, User, Publication, Copy, BorrowRecord, Hold
+from config import HOLD_MAX_ACTIVE
+from tests.conftest import add_publications
+
+READERS = 12
+COPIES = 3
+
+
+def _add_readers(count):
+    """批量添加读者（共用一个密码哈希），返回ID列表"""
+    password_hash = User.query.filter_by(username='reader1').one().password_hash
+    db.session.execute(db.insert(User), [
+        {'username': f'concurrent_{i}', 'password_hash': password_hash, 'role': 'reader'} for i in range(count)
+    ])
+    db.session.commit()
+    return [user_id for (user_id,) in
+            db.session.query(User.id).filter(User.username.like('concurrent_%')).order_by(User.id)]
+
+
+def _run(app, action, user_ids, pub_id, barrier):
+    """在独立线程的应用上下文中同时执行action(出版物, 用户)，返回[(用户ID, action的返回值)]"""
+    def task(user_id):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            pub = db.session.get(Publication, pub_id)
+            barrier.wait()
+            result = action(pub, user)
+            db.session.remove()
+            return user_id, result
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as executor:
+        return list(executor.map(task, user_ids))
+
+
+def _assert_consistent(pub_id):
+    """每个借出的副本恰好对应一条未归还的借阅记录，借阅人一致，可借数量与空闲副本数一致"""
+    db.session.expire_all()
+    open_records = BorrowRecord.query.filter_by(publication_id=pub_id, status='borrowed').all()
+    copies = {copy.id: copy for copy in Copy.query.filter_by(publication_id=pub_id)}
+    borrowed = {copy_id: copy for copy_id, copy in copies.items() if copy.status == 'borrowed'}
+    assert len({record.copy_id for record in open_records}) == len(open_records), "同一副本有多条未归还的借阅记录"
+    assert {record.copy_id for record in open_records} == set(borrowed), "借出的副本与借阅记录不一致"
+    assert all(borrowed[record.copy_id].borrower_id == record.user_id for record in open_records), \
+        "副本借阅人与借阅记录不一致"
+    pub = db.session.get(Publication, pub_id)
+    assert pub.available_copies >= 0
+    assert pub.available_copies == sum(1 for copy in copies.values() if copy.status == 'available')
+    return open_records
+
+
+def test_concurrent_borrow_has_one_winner_per_copy(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1, copies=COPIES)
+        user_ids = _add_readers(READERS)
+
+    results = _run(app, lambda pub, user: pub.borrow(user), user_ids, pub_id, threading.Barrier(READERS))
+    winners = {user_id for user_id, (success, _) in results if success}
+    errors = [message for _, (success, message) in results if not success and '已全部借出' not in message]
+    assert not errors, errors
+    assert len(winners) == COPIES
+
+    with app.app_context():
+        open_records = _assert_consistent(pub_id)
+        assert {record.user_id for record in open_records} == winners
+        assert db.session.get(Publication, pub_id).available_copies == 0
+
+
+def test_concurrent_borrow_and_return(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1, copies=COPIES)
+        user_ids = _add_readers(READERS)
+
+    def borrow_and_return(pub, user):
+        # 每位读者反复借阅，借到后立即归还：借还交错进行
+        borrowed = 0
+        for _ in range(5):
+            success, message = pub.borrow(user)
+            if not success:
+                assert '已全部借出' in message, message
+                continue
+            borrowed += 1
+            success, message = pub.return_book(user)
+            assert success, message
+        return borrowed
+
+    results = _run(app, borrow_and_return, user_ids, pub_id, threading.Barrier(READERS))
+    total_borrowed = sum(borrowed for _, borrowed in results)
+    assert total_borrowed >= COPIES
+
+    with app.app_context():
+        assert _assert_consistent(pub_id) == []
+        assert db.session.get(Publication, pub_id).available_copies == COPIES
+        returned = db.session.query(func.count(BorrowRecord.id)).filter_by(
+            publication_id=pub_id, status='returned').scalar()
+        assert returned == total_borrowed
+
+
+def test_concurrent_holds_by_one_reader_create_one_hold(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1, copies=0)
+        (user_id,) = _add_readers(1)
+
+    results = _run(app, lambda pub, user: pub.place_hold(user), [user_id] * READERS, pub_id,
+                   threading.Barrier(READERS))
+    assert sum(1 for _, (success, _) in results if success) == 1
+    errors = [message for _, (success, message) in results if not success and '你已预约' not in message]
+    assert not errors, errors
+
+    with app.app_context():
+        assert Hold.query.filter_by(publication_id=pub_id, user_id=user_id).count() == 1
+        assert db.session.get(Publication, pub_id).hold_queue_length == 1
+
+
+def test_concurrent_holds_respect_active_limit(app):
+    with app.app_context():
+        pub_ids = add_publications(HOLD_MAX_ACTIVE + 3, copies=0)
+        (user_id,) = _add_readers(1)
+        user = db.session.get(User, user_id)
+        for pub_id in pub_ids[:HOLD_MAX_ACTIVE - 1]:
+            assert db.session.get(Publication, pub_id).place_hold(user)[0]
+
+    # 同一读者同时预约多本出版物：只有一个能占用最后一个名额
+    remaining = pub_ids[HOLD_MAX_ACTIVE - 1:]
+    barrier = threading.Barrier(len(remaining))
+
+    def task(pub_id):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            pub = db.session.get(Publication, pub_id)
+            barrier.wait()
+            result = pub.place_hold(user)
+            db.session.remove()
+            return result
+
+    with ThreadPoolExecutor(max_workers=len(remaining)) as executor:
+        results = list(executor.map(task, remaining))
+    assert sum(1 for success, _ in results if success) == 1
+    assert all(f"最多同时预约{HOLD_MAX_ACTIVE}本" in message for success, message in results if not success)
+
+    with app.app_context():
+        assert Hold.query.filter(Hold.user_id == user_id, Hold.status.in_(Hold.ACTIVE_STATUSES)).count() \
+            == HOLD_MAX_ACTIVE
@@ -0,0 +1,80 @@
+"""文档内容分块存储：追加写入只插入新块，按页读取和流式读取跨块拼接"""
+import pytest
+import ingestion
+from models import db, User, Document, DocumentContentChunk
+from search import search_documents
+
+CONTENT = ''.join(f"line {i:03d} 原文内容\n" for i in range(40))
+TRANSLATED = ''.join(f"行 {i:03d} translated content\n" for i in range(40))
+
+
+def _add_document():
+    uploader = User.query.filter_by(username='reader1').one()
+    document = Document(filename='notes.txt', file_path='/nonexistent/notes.txt', file_type='txt',
+                        uploader_id=uploader.id, status='done')
+    db.session.add(document)
+    db.session.commit()
+    return document
+
+
+def test_read_slice_and_iter_text_across_chunks(app):
+    with app.app_context():
+        document = _add_document()
+        document.chunks = [DocumentContentChunk(**row)
+                           for row in DocumentContentChunk.split(CONTENT, TRANSLATED, chunk_chars=37)]
+        db.session.commit()
+        assert len(document.chunks) > 10
+
+        for start, length in [(0, 10), (30, 20), (37, 37), (100, 500), (len(CONTENT) - 5, 100)]:
+            assert DocumentContentChunk.read_slice(document.id, start, length) == \
+                (CONTENT[start:start + length], TRANSLATED[start:start + length])
+        assert ''.join(DocumentContentChunk.iter_text(document.id)) == CONTENT
+        assert ''.join(DocumentContentChunk.iter_text(document.id, translated=True)) == TRANSLATED
+        assert DocumentContentChunk.read_slice(document.id + 1, 0, 10) == (None, None)
+
+
+def test_set_content_replaces_chunks(app):
+    with app.app_context():
+        document = _add_document()
+        document.set_content(CONTENT, TRANSLATED)
+        db.session.commit()
+        document.set_content('new', '新')
+        db.session.commit()
+        assert (document.content_length, document.translated_length) == (3, 1)
+        assert DocumentContentChunk.query.filter_by(document_id=document.id).count() == 1
+        assert DocumentContentChunk.read_slice(document.id, 0, 100) == ('new', '新')
+
+
+def test_incremental_writer_appends_one_chunk_per_flush(app, monkeypatch):
+    with app.app_context():
+        document = _add_document()
+        monkeypatch.setattr(ingestion, '_worker_engine', db.engine)
+        monkeypatch.setattr(ingestion, 'PARSE_FLUSH_CHARS', 100)
+        monkeypatch.setattr(ingestion, 'translate_text', lambda text, breaker=None: text.upper())
+
+        writer = ingestion._IncrementalWriter(document.id)
+        lines = CONTENT.splitlines()
+        for i, line in enumerate(lines):
+            writer.add(line, i / len(lines))
+        writer.flush(1.0)
+
+        db.session.expire_all()
+        chunks = DocumentContentChunk.query.filter_by(document_id=document.id).order_by(DocumentContentChunk.seq).all()
+        assert [chunk.seq for chunk in chunks] == list(range(writer.seq))
+        assert len(chunks) >= 5
+        text = '\n'.join(lines)
+        assert ''.join(chunk.content for chunk in chunks) == text
+        assert ''.join(chunk.translated for chunk in chunks) == text.upper()
+        assert (document.content_length, document.translated_length) == (len(text), len(text))
+        assert DocumentContentChunk.read_slice(document.id, 95, 30) == (text[95:125], text.upper()[95:125])
+
+
+@pytest.mark.parametrize('keyword, found', [('line 039', True), ('translated', True), ('missing', False)])
+def test_search_documents_matches_chunks(app, keyword, found):
+    with app.app_context():
+        document = _add_document()
+        document.chunks = [DocumentContentChunk(**row)
+                           for row in DocumentContentChunk.split(CONTENT, TRANSLATED, chunk_chars=37)]
+        db.session.commit()
+        items, total = search_documents(keyword)
+        assert (total, [item.id for item in items]) == ((1, [document.id]) if found else (0, []))
@@ -0,0 +1,55 @@
+"""目录页面缓存：借还只让显示该出版物的页面失效（ETag和列表片段按页面上出版物的版本号计算）"""
+from models import db, Publication, StatCounter, CATALOGUE_VERSION
+from pagination import encode_cursor
+from tests.conftest import login, add_publications
+
+
+def _page_urls(app):
+    """每页一个出版物：第一页是较新的出版物，第二页是较早的出版物"""
+    with app.app_context():
+        older_id, newer_id = add_publications(2, copies=2)
+    first = '/reader/borrow?availability=all&per_page=1'
+    second = f"{first}&cursor={encode_cursor([newer_id])}"
+    return older_id, first, second
+
+
+def test_loan_only_invalidates_pages_showing_the_title(app):
+    older_id, first, second = _page_urls(app)
+    reader = login(app, 'reader1')
+    # 登录后的第一个页面显示提示消息，不参与缓存
+    reader.get(first)
+    first_etag = reader.get(first).headers['ETag']
+    response = reader.get(second)
+    second_etag = response.headers['ETag']
+    assert '可借副本：2/2' in response.get_data(as_text=True)
+
+    assert login(app, 'reader2').post(f'/api/v1/publications/{older_id}/borrow', json={}).status_code == 200
+
+    assert reader.get(first, headers={'If-None-Match': first_etag}).status_code == 304
+    response = reader.get(second, headers={'If-None-Match': second_etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != second_etag
+    assert '可借副本：1/2' in response.get_data(as_text=True)
+
+
+def test_loans_and_holds_do_not_write_catalogue_version(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1, copies=1)
+        counter = db.session.get(StatCounter, CATALOGUE_VERSION)
+        catalogue_version = counter.value
+        pub_version = db.session.get(Publication, pub_id).version
+    borrower, waiter = login(app, 'reader2'), login(app, 'reader1')
+
+    assert borrower.post(f'/api/v1/publications/{pub_id}/borrow', json={}).status_code == 200
+    hold = waiter.post(f'/api/v1/publications/{pub_id}/hold', json={})
+    assert hold.status_code == 201
+    # 归还后副本预留给预约者，预约者取消后放回可借库存
+    assert borrower.post(f'/api/v1/publications/{pub_id}/return', json={}).status_code == 200
+    assert waiter.delete(f"/api/v1/holds/{hold.get_json()['hold']['id']}").status_code == 204
+
+    with app.app_context():
+        assert db.session.get(StatCounter, CATALOGUE_VERSION).value == catalogue_version
+        pub = db.session.get(Publication, pub_id)
+        # 借阅、预约取号、归还叫号、取消后放回库存各+1
+        assert pub.version == pub_version + 4
+        assert (pub.available_copies, pub.hold_queue_length) == (1, 0)
@@ -0,0 +1,114 @@
+"""文档解析队列：上传后由后台进程解析、队列满时拒绝上传、重启后恢复未完成的文档"""
+import io
+import os
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import pytest
+from models import db, Document, DocumentContentChunk
+from ingestion import ingestion_queue
+from config import UPLOAD_FOLDER
+from upload_stream import new_hasher
+from tests.conftest import login
+
+
+@pytest.fixture(scope='module', autouse=True)
+def shutdown_queue():
+    yield
+    ingestion_queue.shutdown()
+
+
+def english_text():
+    # 内容唯一，不会命中解析缓存
+    return f"Document {uuid.uuid4().hex}.\nThe library system parses this file in the background.\n"
+
+
+def upload(client, text, filename='notes.txt'):
+    return client.post('/document/upload', data={'file': (io.BytesIO(text.encode('utf-8')), filename)},
+                       follow_redirects=True)
+
+
+def wait_for_status(client, doc_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f'/document/status/{doc_id}').get_json()
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.2)
+    raise AssertionError(f"文档{doc_id}在{timeout}秒内未解析完成：{status}")
+
+
+def test_uploaded_document_is_parsed_in_background(app):
+    client = login(app, 'reader1')
+    text = english_text()
+    response = upload(client, text)
+    assert '正在后台解析' in response.get_data(as_text=True)
+
+    with app.app_context():
+        document = Document.query.one()
+        assert document.status in ('pending', 'processing', 'done')
+    status = wait_for_status(client, document.id)
+    assert status['status'] == 'done', status['error']
+    assert status['progress'] == 100
+
+    with app.app_context():
+        content, translated = DocumentContentChunk.read_slice(document.id, 0, 1000)
+        # 离线翻译器原样返回
+        assert content == text.strip()
+        assert translated == content
+
+    # 其他读者无权查询状态
+    assert login(app, 'reader2').get(f'/document/status/{document.id}').status_code == 403
+
+
+def test_upload_rejected_when_queue_is_full(app, monkeypatch):
+    # 第一个任务提交后不会完成（不交给解析进程），队列始终占满，结果与解析速度无关
+    blocked = Future()
+    monkeypatch.setattr(ingestion_queue, 'max_queued', 1)
+    monkeypatch.setattr(ingestion_queue, '_submit_job', lambda executor, doc_id: blocked)
+    client = login(app, 'reader1')
+    upload(client, english_text())
+    assert ingestion_queue.queued_count == 1
+
+    rejected = english_text()
+    response = upload(client, rejected)
+    assert '解析队列已满' in response.get_data(as_text=True)
+    with app.app_context():
+        documents = Document.query.all()
+        # 被拒绝的上传不创建文档，也不残留文件（文件按内容哈希命名）
+        assert len(documents) == 1
+        hasher = new_hasher()
+        hasher.update(rejected.encode('utf-8'))
+        assert not os.path.exists(os.path.join(UPLOAD_FOLDER, hasher.hexdigest() + '.txt'))
+
+    # 放开队列：任务结束后等待中的文档重新提交给解析进程
+    monkeypatch.undo()
+    blocked.set_result(None)
+    assert wait_for_status(client, documents[0].id)['status'] == 'done'
+
+
+def test_unfinished_documents_are_requeued(app):
+    now = datetime.utcnow()
+    doc_ids = {}
+    with app.app_context():
+        for name, status, started_at in [('pending', 'pending', None),
+                                         ('stale', 'processing', now - timedelta(hours=2)),
+                                         ('running', 'processing', now)]:
+            file_path = os.path.join(UPLOAD_FOLDER, f"test-{uuid.uuid4().hex}.txt")
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(english_text())
+            document = Document(filename=os.path.basename(file_path), file_path=file_path, file_type='txt',
+                                uploader_id=2, status=status, started_at=started_at)
+            db.session.add(document)
+            db.session.commit()
+            doc_ids[name] = document.id
+
+    # 模拟服务重启：排队中和超时未完成的文档重新加入队列，仍在其他进程中解析的不受影响
+    ingestion_queue.requeue_unfinished()
+    client = login(app, 'reader1')
+    assert wait_for_status(client, doc_ids['pending'])['status'] == 'done'
+    assert wait_for_status(client, doc_ids['stale'])['status'] == 'done'
+    ingestion_queue.shutdown()
+    with app.app_context():
+        assert db.session.get(Document, doc_ids['running']).status == 'processing'
@@ -0,0 +1,116 @@
+"""
+逾期与预约扫描（固定的扫描时间now）：借阅从即将到期变为逾期、归还或续借后移出overdue_loans，
+预留超时的预约被取消并把副本顺延给下一位预约者
+"""
+from datetime import timedelta
+from decimal import Decimal
+import pytest
+import overdue
+from models import db, User, Publication, Copy, OverdueLoan, Hold
+from config import DUE_SOON_DAYS, OVERDUE_REMIND_INTERVAL_HOURS
+from tests.conftest import add_publications
+
+
+@pytest.fixture
+def reminders(monkeypatch):
+    """收集扫描发送的提醒"""
+    sent = []
+    monkeypatch.setitem(overdue.REMINDER_SINKS, 'test', sent.extend)
+    return sent
+
+
+def _user(username):
+    return User.query.filter_by(username=username).one()
+
+
+def _borrow(pub_id, username):
+    """借阅并返回副本的到期时间"""
+    success, message = db.session.get(Publication, pub_id).borrow(_user(username))
+    assert success, message
+    return Copy.query.filter_by(publication_id=pub_id, borrower_id=_user(username).id).one().due_date
+
+
+def test_loan_becomes_overdue(app, reminders):
+    with app.app_context():
+        pub_id, = add_publications(1)
+        due = _borrow(pub_id, 'reader1')
+
+        # 距到期还早：不在扫描范围内
+        report = overdue.scan_overdue(now=due - timedelta(days=DUE_SOON_DAYS + 1), sink='test')
+        assert (report['due_soon'], report['overdue'], report['reminded']) == (0, 0, 0)
+        assert OverdueLoan.query.count() == 0
+
+        now = due - timedelta(days=1)
+        report = overdue.scan_overdue(now=now, sink='test')
+        assert (report['due_soon'], report['overdue'], report['reminded']) == (1, 0, 1)
+        assert [r['state'] for r in reminders] == ['due_soon']
+        # 提醒间隔内再次扫描不重复提醒
+        report = overdue.scan_overdue(now=now + timedelta(hours=OVERDUE_REMIND_INTERVAL_HOURS - 1), sink='test')
+        assert (report['due_soon'], report['reminded']) == (1, 0)
+
+        # 到期后第二天：状态变化立即提醒，逾期天数向上取整
+        report = overdue.scan_overdue(now=due + timedelta(days=1, hours=12), sink='test')
+        assert (report['due_soon'], report['overdue'], report['reminded']) == (0, 1, 1)
+        loan = OverdueLoan.query.one()
+        assert (loan.state, loan.overdue_days, loan.fine) == ('overdue', 2, Decimal('1.00'))
+        assert reminders[-1]['state'] == 'overdue' and reminders[-1]['username'] == 'reader1'
+        assert overdue.get_overdue_summary(_user('reader1').id) == (1, Decimal('1.00'))
+
+
+def test_returned_and_renewed_loans_drop_out(app, reminders):
+    with app.app_context():
+        returned_id, renewed_id = add_publications(2)
+        due = _borrow(returned_id, 'reader1')
+        _borrow(renewed_id, 'reader1')
+        now = due + timedelta(days=3)
+        assert overdue.scan_overdue(now=now, sink='test')['overdue'] == 2
+
+        # 归还时立即删除该借阅的逾期状态
+        success, message = db.session.get(Publication, returned_id).return_book(_user('reader1'))
+        assert success, message
+        assert [loan.publication_id for loan in OverdueLoan.query] == [renewed_id]
+        assert overdue.get_overdue_summary(_user('reader1').id)[0] == 1
+
+        # 续借（到期时间推后）的借阅在下次扫描时清除
+        db.session.execute(db.update(Copy).where(Copy.publication_id == renewed_id)
+                           .values(due_date=now + timedelta(days=30)))
+        db.session.commit()
+        report = overdue.scan_overdue(now=now + timedelta(hours=1), sink='test')
+        assert (report['overdue'], report['cleared']) == (0, 1)
+        assert OverdueLoan.query.count() == 0
+        assert overdue.get_overdue_summary(_user('reader1').id) == (0, 0)
+
+
+def test_expired_hold_passes_the_copy_to_the_next_ticket(app, reminders):
+    with app.app_context():
+        pub_id, = add_publications(1)
+        _borrow(pub_id, 'reader1')
+        for username in ('reader2', 'admin'):
+            success, message = db.session.get(Publication, pub_id).place_hold(_user(username))
+            assert success, message
+        success, message = db.session.get(Publication, pub_id).return_book(_user('reader1'))
+        assert success, message
+
+        first = Hold.query.filter_by(user_id=_user('reader2').id).one()
+        expires_at = first.expires_at
+        assert first.status == 'ready'
+
+        # 预留期内：只发送可借阅通知
+        assert overdue.scan_holds(now=expires_at - timedelta(hours=1), sink='test') == {'expired': 0, 'notified': 1}
+        assert [(r['username'], r['state']) for r in reminders] == [('reader2', 'hold_ready')]
+
+        # 预留超时：取消并顺延给下一位，通知下一位
+        assert overdue.scan_holds(now=expires_at + timedelta(minutes=1), sink='test') == {'expired': 1, 'notified': 1}
+        assert reminders[-1]['username'] == 'admin'
+        db.session.expire_all()
+        second = Hold.query.filter_by(user_id=_user('admin').id).one()
+        copy = Copy.query.filter_by(publication_id=pub_id).one()
+        assert db.session.get(Hold, first.id).status == 'expired'
+        assert (second.status, second.copy_id) == ('ready', copy.id)
+        assert (copy.status, copy.reserved_for_id) == ('reserved', _user('admin').id)
+        assert db.session.get(Publication, pub_id).available_copies == 0
+
+        # 超时的预约者不能再借阅该副本，下一位可以
+        assert not db.session.get(Publication, pub_id).borrow(_user('reader2'))[0]
+        assert db.session.get(Publication, pub_id).borrow(_user('admin'))[0]
+        assert db.session.get(Hold, second.id).status == 'fulfilled'
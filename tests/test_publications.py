@@ -0,0 +1,38 @@
+"""管理员删除出版物：有未归还的副本或借阅历史（含已归档）时拒绝删除"""
+from datetime import datetime, timedelta
+from archive import archive_borrow_records
+from models import db, Publication, Copy, BorrowRecord
+from tests.conftest import login, add_publications
+
+
+def _delete(admin, pub_id):
+    return admin.get(f'/admin/publications/delete/{pub_id}', follow_redirects=True).get_data(as_text=True)
+
+
+def test_delete_publication_without_history(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1, copies=2)
+    assert '删除成功' in _delete(login(app, 'admin'), pub_id)
+    with app.app_context():
+        assert db.session.get(Publication, pub_id) is None
+        assert Copy.query.filter_by(publication_id=pub_id).count() == 0
+
+
+def test_delete_refused_for_borrowed_or_historical_loans(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1, copies=1)
+    reader, admin = login(app, 'reader1'), login(app, 'admin')
+    reader.get(f'/reader/borrow/{pub_id}')
+    assert '有副本尚未归还' in _delete(admin, pub_id)
+
+    reader.get(f'/reader/return/{pub_id}')
+    assert '有借阅记录' in _delete(admin, pub_id)
+
+    # 借阅记录移入归档表后仍然拒绝删除
+    with app.app_context():
+        assert archive_borrow_records(now=datetime.utcnow() + timedelta(days=365), days=1) == 1
+        assert BorrowRecord.query.count() == 0
+    assert '有借阅记录' in _delete(admin, pub_id)
+    with app.app_context():
+        assert db.session.get(Publication, pub_id) is not None
+        assert Copy.query.filter_by(publication_id=pub_id).count() == 1
@@ -0,0 +1,62 @@
+"""SQL数量预算：主要页面的查询数不超过上限，且不随借阅记录/出版物数量增长（发现N+1查询）"""
+import pytest
+import stats
+from auth import user_cache
+from http_cache import page_cache
+from instrumentation import count_queries, assert_max_queries
+from tests.conftest import login, add_publications
+
+# (登录用户, 页面, 最多SQL数)
+ROUTE_BUDGETS = [
+    ('reader1', '/reader/dashboard', 4),
+    ('reader1', '/reader/my_borrows', 2),
+    ('admin', '/admin/dashboard', 4),
+    ('admin', '/admin/statistics', 4),
+]
+
+
+def seed_loans(app, count):
+    """新增count个出版物，两位读者轮流借阅，每隔两本归还一本（留下已归还和未归还的记录）"""
+    with app.app_context():
+        pub_ids = add_publications(count, copies=2)
+    readers = [login(app, 'reader1'), login(app, 'reader2')]
+    for i, pub_id in enumerate(pub_ids):
+        reader = readers[i % 2]
+        assert reader.post(f'/api/v1/publications/{pub_id}/borrow', json={}).status_code == 200
+        if i % 3 == 0:
+            assert reader.post(f'/api/v1/publications/{pub_id}/return', json={}).status_code == 200
+
+
+def measure(client, url, limit):
+    """清空进程内缓存后请求页面，返回执行的SQL数"""
+    stats._cache.clear()
+    page_cache.clear()
+    user_cache.clear()
+    with assert_max_queries(limit) as query_stats:
+        response = client.get(url)
+    assert response.status_code == 200
+    return query_stats.count
+
+
+@pytest.mark.parametrize('username,url,limit', ROUTE_BUDGETS)
+def test_query_budget_does_not_grow_with_rows(app, username, url, limit):
+    seed_loans(app, 3)
+    client = login(app, username)
+    # 首次访问时全量统计计数器，之后增量维护
+    client.get(url)
+    small = measure(client, url, limit)
+
+    seed_loans(app, 20)
+    assert measure(client, url, limit) == small
+
+
+def test_assert_max_queries_reports_statements(app):
+    with app.app_context():
+        from models import db, Publication
+        with pytest.raises(AssertionError, match='超过上限1条'):
+            with assert_max_queries(1):
+                Publication.query.count()
+                db.session.query(Publication.id).first()
+        with count_queries() as query_stats:
+            Publication.query.count()
+        assert query_stats.count == 1
@@ -0,0 +1,86 @@
+"""统计报表队列：后台生成、状态查询、中断任务恢复和任务异常时标记失败"""
+import time
+from datetime import datetime, timedelta
+import pytest
+from models import db, User, Report
+from reports import report_queue, params_hash
+from tests.conftest import login, add_publications
+
+
+@pytest.fixture(autouse=True, scope='module')
+def shutdown_queue():
+    yield
+    report_queue.shutdown()
+
+
+def wait_for_status(client, report_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f'/admin/reports/{report_id}/status').get_json()
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f"报表{report_id}在{timeout}秒内未生成：{status}")
+
+
+def _add_report(kind='loans_by_day', status='pending', started_at=None, days=1):
+    end_date = datetime.utcnow().date()
+    start_date = end_date - timedelta(days=days)
+    admin = User.query.filter_by(username='admin').one()
+    report = Report(kind=kind, start_date=start_date, end_date=end_date, format='csv',
+                    params_hash=params_hash(kind, start_date, end_date, 'csv'), status=status,
+                    started_at=started_at, requested_by=admin.id)
+    db.session.add(report)
+    db.session.commit()
+    return report.id
+
+
+def test_report_is_generated_in_background(app):
+    with app.app_context():
+        (pub_id,) = add_publications(1)
+    assert login(app, 'reader1').get(f'/reader/borrow/{pub_id}').status_code == 302
+
+    admin = login(app, 'admin')
+    today = datetime.utcnow().date().isoformat()
+    admin.post('/admin/reports', data={'kind': 'loans_by_day', 'start_date': today, 'end_date': today,
+                                       'format': 'csv'})
+    with app.app_context():
+        report_id = Report.query.one().id
+    status = wait_for_status(admin, report_id)
+    assert status['status'] == 'done', status['error']
+    assert status['row_count'] == 1
+
+    lines = admin.get(f'/admin/reports/{report_id}/download').get_data(as_text=True).splitlines()
+    assert lines[0].lstrip('﻿').split(',')[:2] == ['日期', '借出次数']
+    assert lines[1].split(',')[:2] == [today, '1']
+
+
+def test_unfinished_reports_are_requeued(app):
+    now = datetime.utcnow()
+    with app.app_context():
+        report_ids = {
+            'pending': _add_report(days=1),
+            'stale': _add_report(days=2, status='processing', started_at=now - timedelta(hours=2)),
+            'running': _add_report(days=3, status='processing', started_at=now),
+        }
+    report_queue.requeue_unfinished()
+
+    admin = login(app, 'admin')
+    assert wait_for_status(admin, report_ids['pending'])['status'] == 'done'
+    assert wait_for_status(admin, report_ids['stale'])['status'] == 'done'
+    # 刚开始生成的报表视为仍在进行，不会被重复认领
+    assert admin.get(f"/admin/reports/{report_ids['running']}/status").get_json()['status'] == 'processing'
+
+
+def test_job_exception_marks_report_failed(app, monkeypatch):
+    def crash(report_id):
+        raise RuntimeError('worker crashed')
+
+    monkeypatch.setattr(report_queue, '_run', crash)
+    with app.app_context():
+        report_id = _add_report()
+    assert report_queue.submit(report_id) == (True, "报表已加入生成队列")
+
+    status = wait_for_status(login(app, 'admin'), report_id)
+    assert status['status'] == 'failed'
+    assert status['error'] == 'worker crashed'
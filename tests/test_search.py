@@ -0,0 +1,108 @@
+"""
+搜索（SQLite测试环境走LIKE分支）：标题命中排在作者/出版商命中之前，ISBN带或不带连字符都能找到，
+类型和可借状态筛选、通配符转义、分页总数，以及文档按文件名和分块内容检索
+"""
+from models import db, User, Publication, Document
+from search import search_publications, search_documents
+from tests.conftest import login
+
+
+def _add(title, type='book', copies=1, **fields):
+    pub = Publication(title=title, type=type, **fields)
+    db.session.add(pub)
+    db.session.flush()
+    pub.add_copies(copies)
+    db.session.commit()
+    return pub.id
+
+
+def _add_document(filename, uploader, content='', translated='', status='done'):
+    document = Document(filename=filename, file_path=f'/nonexistent/{filename}', file_type='txt',
+                        uploader_id=uploader.id, status=status)
+    document.set_content(content, translated)
+    db.session.add(document)
+    db.session.commit()
+    return document.id
+
+
+def test_title_matches_rank_first(app):
+    with app.app_context():
+        by_author = _add('数据库系统概论', author='Python学会')
+        older_title = _add('Python编程入门', author='张三')
+        by_publisher = _add('程序员月刊', type='magazine', publisher='Python出版社', issue='2024-01')
+        newer_title = _add('流畅的Python', author='李四')
+        _add('算法导论', author='王五')
+
+        items, total = search_publications('python')
+        assert total == 4
+        ids = [pub.id for pub in items]
+        # 标题命中的在前（同组内新添加的在前）
+        assert ids[:2] == [newer_title, older_title]
+        assert set(ids[2:]) == {by_author, by_publisher}
+
+        # 分页：总数不随页码变化
+        first, total = search_publications('python', per_page=3)
+        second, _ = search_publications('python', page=2, per_page=3)
+        assert total == 4 and len(first) == 3 and len(second) == 1
+        assert [pub.id for pub in first + second] == ids
+
+        # 只查询部分列（页面缓存使用）
+        rows, _ = search_publications('python', entities=(Publication.id, Publication.version))
+        assert [row[0] for row in rows] == ids
+
+
+def test_filters_and_isbn(app):
+    with app.app_context():
+        book = _add('深入理解计算机系统', author='Bryant', isbn='9787111544937')
+        magazine = _add('计算机月刊', type='magazine', publisher='科技出版社', issue='2024-02')
+        borrowed = _add('计算机网络', author='谢希仁', copies=1)
+        reader = User.query.filter_by(username='reader1').one()
+        assert db.session.get(Publication, borrowed).borrow(reader)[0]
+
+        assert {pub.id for pub in search_publications('计算机')[0]} == {book, magazine}
+        assert {pub.id for pub in search_publications('计算机', available_only=False)[0]} == {book, magazine, borrowed}
+        assert [pub.id for pub in search_publications('计算机', pub_type='magazine')[0]] == [magazine]
+        assert [pub.id for pub in search_publications('计算机', pub_type='book', available_only=False)[0]] == \
+            [borrowed, book]
+
+        # ISBN带连字符或不带都能找到；ISBN精确匹配排在标题命中之前
+        assert [pub.id for pub in search_publications('978-7-111-54493-7')[0]] == [book]
+        notes = _add('9787111544937读书笔记')
+        assert [pub.id for pub in search_publications(' 9787111544937 ')[0]] == [book, notes]
+
+
+def test_like_wildcards_are_escaped(app):
+    with app.app_context():
+        percent = _add('100%纯净', author='赵六')
+        _add('Python_Cookbook', author='钱七')
+        _add('PythonXCookbook', author='孙八')
+        assert [pub.id for pub in search_publications('%')[0]] == [percent]
+        assert [pub.title for pub in search_publications('n_C')[0]] == ['Python_Cookbook']
+        assert search_publications('不存在的书名') == ([], 0)
+
+
+def test_borrow_page_search(app):
+    with app.app_context():
+        title_id = _add('Flask Web开发')
+        _add('其他图书', author='Flask社区')
+    data = login(app, 'reader1').get('/reader/borrow?search=flask&format=json').get_json()
+    assert data['total'] == 2
+    assert data['items'][0]['id'] == title_id
+
+
+def test_document_search(app):
+    with app.app_context():
+        reader1 = User.query.filter_by(username='reader1').one()
+        reader2 = User.query.filter_by(username='reader2').one()
+        by_name = _add_document('quantum-notes.txt', reader1, 'Nothing relevant here.')
+        by_content = _add_document('lecture.txt', reader1, 'Intro to Quantum computing.', '量子计算入门。')
+        by_translation = _add_document('paper.txt', reader1, 'Qubits and gates.', '量子比特与量子门。')
+        other_user = _add_document('quantum.txt', reader2, 'Quantum.')
+        _add_document('pending-quantum.txt', reader1, status='pending')
+
+        items, total = search_documents('quantum', uploader_id=reader1.id)
+        assert total == 2
+        assert [doc.id for doc in items] == [by_content, by_name]
+        assert [doc.id for doc in search_documents('量子', uploader_id=reader1.id)[0]] == [by_translation, by_content]
+        # 管理员搜索全部用户的文档（仍只包含解析完成的）
+        assert {doc.id for doc in search_documents('quantum')[0]} == {by_name, by_content, other_user}
@@ -0,0 +1,21 @@
+"""仪表盘统计：已借出数量在借还事务之外统计，借还不写stat_counters（包括目录版本号）"""
+from models import db, StatCounter
+from stats import get_dashboard_stats
+from tests.conftest import login, add_publications
+
+
+def test_borrowed_count_is_counted_outside_loan_transactions(app):
+    with app.app_context():
+        pub_ids = add_publications(3, copies=2)
+        assert get_dashboard_stats(force_refresh=True)['borrowed_count'] == 0
+        counters_before = {c.name: c.value for c in StatCounter.query.all()}
+
+    client = login(app, 'reader1')
+    for pub_id in pub_ids:
+        assert client.post(f'/api/v1/publications/{pub_id}/borrow', json={}).status_code == 200
+    assert client.post(f'/api/v1/publications/{pub_ids[0]}/return', json={}).status_code == 200
+
+    with app.app_context():
+        db.session.expire_all()
+        assert {c.name: c.value for c in StatCounter.query.all()} == counters_before
+        assert get_dashboard_stats(force_refresh=True)['borrowed_count'] == 2
@@ -0,0 +1,132 @@
+"""长文本分段翻译（离线翻译器TRANSLATOR=local）：分块边界、拼接顺序、修改后的分段缓存复用和熔断"""
+import random
+import threading
+import pytest
+import translation
+from cache import ContentCache
+from config import TRANSLATION_WORKERS
+
+WORDS = ['the', 'library', 'system', 'book', 'reader', 'borrow', 'return', 'data', 'query', 'index', 'cache']
+
+
+def sentence(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize() + '.'
+
+
+def document(rng, paragraphs=200):
+    """英文文档：以短段落为主，夹杂空行、中文段落和超长段落"""
+    lines = []
+    for i in range(paragraphs):
+        if i % 17 == 0:
+            lines.append('')
+        elif i % 23 == 0:
+            lines.append('这是一段中文说明，不需要翻译。')
+        elif i % 31 == 0:
+            lines.append(' '.join(sentence(rng) for _ in range(60)))
+        else:
+            lines.append(f"{i}. " + ' '.join(sentence(rng) for _ in range(rng.randint(1, 3))))
+    return '\n'.join(lines)
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    """统计离线翻译器的调用次数；每个测试使用空的分段缓存且不限流"""
+    monkeypatch.setattr(translation, 'chunk_cache', ContentCache(str(tmp_path), 64 * 1024 * 1024))
+    monkeypatch.setattr(translation, '_rate_limiter', translation.RateLimiter(0))
+    counted = []
+    lock = threading.Lock()
+
+    def local(text):
+        with lock:
+            counted.append(text)
+        return translation.local_translator(text)
+
+    monkeypatch.setitem(translation.TRANSLATORS, 'local', local)
+    return counted
+
+
+def test_chunks_are_packed_within_limit_and_rebuild_the_text():
+    text = document(random.Random(1))
+    pieces = translation.split_chunks(text, 2000)
+    assert ''.join(chunk + separator for chunk, separator in pieces) == text
+    assert all(len(chunk) <= 2000 for chunk, _ in pieces)
+    # 短段落被合并，请求数远少于段落数
+    assert len(pieces) < len(text.split('\n')) / 2
+    assert any('\n' in chunk for chunk, _ in pieces)
+    for chunk, _ in pieces:
+        # 空行不参与翻译，中英文段落不合并在同一块中
+        assert chunk.strip() or chunk == ''
+        languages = {translation.is_english(line) for line in chunk.split('\n')}
+        assert len(languages) == 1
+
+
+def test_long_paragraph_is_split_at_sentences():
+    rng = random.Random(2)
+    paragraph = ' '.join(sentence(rng) for _ in range(100))
+    pieces = translation.split_chunks(paragraph, 300)
+    assert len(pieces) > 1
+    assert [separator for _, separator in pieces] == [' '] * (len(pieces) - 1) + ['']
+    assert all(chunk.endswith('.') and len(chunk) <= 300 for chunk, _ in pieces)
+    assert ' '.join(chunk for chunk, _ in pieces) == paragraph
+
+
+def test_translation_keeps_paragraph_order(calls):
+    text = document(random.Random(3))
+    assert translation.translate_text(text, 'local') == text
+    assert len(calls) == len([chunk for chunk, _ in translation.split_chunks(text)
+                              if chunk.strip() and translation.is_english(chunk)])
+
+
+def test_packed_chunk_falls_back_to_paragraphs_when_lines_are_merged(calls, monkeypatch):
+    # 翻译引擎把多行合并成一行时，逐段重新翻译，段落仍与原文对应
+    def merge_lines(text):
+        calls.append(text)
+        return text.replace('\n', ' ').upper()
+
+    monkeypatch.setitem(translation.TRANSLATORS, 'local', merge_lines)
+    text = 'First short line.\nSecond short line.\nThird short line.'
+    assert translation.translate_text(text, 'local') == text.upper()
+
+
+def test_only_edited_chunks_are_translated_again(calls):
+    rng = random.Random(4)
+    text = document(rng)
+    translation.translate_text(text, 'local')
+    first_calls = len(calls)
+
+    lines = text.split('\n')
+    lines[100] = lines[100] + ' ' + sentence(rng)
+    edited = '\n'.join(lines)
+    calls.clear()
+    assert translation.translate_text(edited, 'local') == edited
+    # 只有被修改段落所在的块（分界变化时还有相邻的一块）需要重新翻译
+    assert 1 <= len(calls) <= 2
+    assert any(lines[100] in chunk for chunk in calls)
+
+    calls.clear()
+    translation.translate_text(edited, 'local')
+    assert calls == []
+    assert first_calls > 10
+
+
+def test_breaker_stops_calling_a_failing_translator(calls, monkeypatch):
+    def unavailable(text):
+        calls.append(text)
+        raise ImportError("No module named 'translators'")
+
+    monkeypatch.setitem(translation.TRANSLATORS, 'local', unavailable)
+    text = document(random.Random(5))
+    breaker = translation.TranslationBreaker(max_failures=3)
+    # 翻译失败时保留原文
+    assert translation.translate_text(text, 'local', breaker) == text
+    assert breaker.is_open
+    # 熔断前已提交到线程池的请求最多再失败TRANSLATION_WORKERS次
+    assert 3 <= len(calls) <= 3 + TRANSLATION_WORKERS
+
+    # 同一任务的后续内容不再调用翻译引擎，失败的内容也不写入缓存
+    calls.clear()
+    assert translation.translate_text('Another paragraph.\nAnd one more.', 'local', breaker) == \
+        'Another paragraph.\nAnd one more.'
+    assert calls == []
+    monkeypatch.setitem(translation.TRANSLATORS, 'local', translation.local_translator)
+    assert translation.translate_text(text, 'local') == text
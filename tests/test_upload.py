@@ -0,0 +1,71 @@
+"""
+上传大小上限：声明的Content-Length超限时直接拒绝，分块传输（无Content-Length）时接收到超限为止；
+两种情况都由413处理函数提示并返回上传页面，不留下临时文件，也不创建文档
+"""
+import io
+import os
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+from models import Document
+from upload_stream import HashingFile
+from config import UPLOAD_TEMP_FOLDER
+from tests.conftest import login
+
+LIMIT = 100 * 1024
+BOUNDARY = 'upload-limit-boundary'
+
+
+def multipart_body(size):
+    return (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="big.txt"\r\n'
+            f'Content-Type: text/plain\r\n\r\n').encode('utf-8') + b'x' * size + f'\r\n--{BOUNDARY}--\r\n'.encode('utf-8')
+
+
+def chunked_request(body):
+    """不带Content-Length的上传请求（服务器负责结束输入流，如分块传输）"""
+    environ = EnvironBuilder(path='/document/upload', method='POST', input_stream=io.BytesIO(body),
+                             content_type=f'multipart/form-data; boundary={BOUNDARY}').get_environ()
+    del environ['CONTENT_LENGTH']
+    environ['wsgi.input_terminated'] = True
+    return Request(environ)
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', LIMIT)
+    return login(app, 'reader1')
+
+
+def temp_files():
+    os.makedirs(UPLOAD_TEMP_FOLDER, exist_ok=True)
+    return set(os.listdir(UPLOAD_TEMP_FOLDER))
+
+
+def assert_rejected(app, client, response, before):
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/document/upload')
+    assert '文件过大' in client.get(response.headers['Location']).get_data(as_text=True)
+    assert temp_files() == before
+    with app.app_context():
+        assert Document.query.count() == 0
+
+
+def test_declared_length_over_limit_is_rejected(app, client):
+    before = temp_files()
+    response = client.post('/document/upload', data={'file': (io.BytesIO(b'x' * (LIMIT + 1)), 'big.txt')})
+    assert_rejected(app, client, response, before)
+
+
+def test_streamed_upload_over_limit_removes_partial_file(app, client):
+    before = temp_files()
+    response = client.open(chunked_request(multipart_body(3 * LIMIT)))
+    assert_rejected(app, client, response, before)
+
+
+def test_hashing_file_stops_at_its_own_limit():
+    container = HashingFile(max_bytes=10)
+    container.write(b'x' * 10)
+    with pytest.raises(RequestEntityTooLarge):
+        container.write(b'x')
+    assert not os.path.exists(container.path)
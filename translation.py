@@ -0,0 +1,264 @@
+import re
+import time
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import TRANSLATOR, TRANSLATION_CHUNK_CHARS, TRANSLATION_WORKERS, TRANSLATION_RATE_LIMIT, \
+    TRANSLATION_MAX_FAILURES, TRANSLATION_CACHE_DIR, TRANSLATION_CACHE_MAX_BYTES
+from cache import ContentCache
+
+# 句子结束位置（中英文标点后切分）
+SENTENCE_END = re.compile(r'(?<=[.!?。！？])\s+')
+# 短段落合并时，约每PACK_BOUNDARY_MODULUS个段落出现一个按内容确定的分界（见_is_pack_boundary）
+PACK_BOUNDARY_MODULUS = 8
+
+# 分段翻译结果缓存（文档修改后只需重新翻译变化的段落）
+chunk_cache = ContentCache(TRANSLATION_CACHE_DIR, TRANSLATION_CACHE_MAX_BYTES)
+
+
+# ====================== 翻译引擎 ======================
+def _online_translator(name):
+    """translators库提供的在线翻译引擎（有道、必应等）"""
+    def translate(text):
+        import translators as ts  # 延迟导入，避免拖慢Web进程启动
+        return ts.translate_text(text, translator=name, to_language='zh')
+    return translate
+
+
+def local_translator(text):
+    """离线替身翻译器：原样返回文本，用于测试和无网络环境"""
+    return text
+
+
+# 已注册的翻译引擎（未注册的名称按translators库的引擎名处理）
+TRANSLATORS = {
+    'local': local_translator
+}
+
+
+def register_translator(name, func):
+    """
+    注册翻译引擎
+    :param name: 引擎名称（对应config.TRANSLATOR）
+    :param func: 翻译函数，接收原文返回译文
+    """
+    TRANSLATORS[name] = func
+
+
+def get_translator(name):
+    return TRANSLATORS.get(name) or _online_translator(name)
+
+
+# ====================== 限流 ======================
+class RateLimiter:
+    """简单限流器：保证相邻两次请求的间隔不小于1/rate秒（多线程安全）"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_time = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+
+_rate_limiter = RateLimiter(TRANSLATION_RATE_LIMIT)
+
+
+class TranslationBreaker:
+    """
+    熔断器：翻译引擎连续失败max_failures次后，同一任务的剩余内容不再请求翻译（保留原文），
+    避免引擎不可用（未安装translators库、网络中断等）时每个块都等待限流后再失败（多线程安全）
+    """
+
+    def __init__(self, max_failures=TRANSLATION_MAX_FAILURES):
+        self.max_failures = max_failures
+        self.failures = 0
+        self._consecutive = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._consecutive >= self.max_failures
+
+    def record(self, success):
+        """记录一次翻译请求的结果"""
+        with self._lock:
+            if success:
+                self._consecutive = 0
+                return
+            self.failures += 1
+            self._consecutive += 1
+            if self._consecutive == self.max_failures:
+                print(f"翻译连续失败{self.max_failures}次，本次任务的剩余内容不再翻译")
+
+
+# ====================== 分段 ======================
+def is_english(text):
+    """判断是否为英文（英文字母占全部字母的80%以上），只遍历一次文本"""
+    english_chars = 0
+    total_chars = 0
+    for c in text:
+        if c.isalpha():
+            total_chars += 1
+            if c.isascii():
+                english_chars += 1
+    return total_chars > 0 and english_chars / total_chars > 0.8
+
+
+def _language(paragraph):
+    """段落的语言：True为英文，False为其他语言，没有字母（空行、数字等）时为None"""
+    if not any(c.isalpha() for c in paragraph):
+        return None
+    return is_english(paragraph)
+
+
+def _is_pack_boundary(paragraph):
+    # 按段落内容（而不是累计长度）决定在哪些段落后结束合并：修改一个段落只影响它所在的块，
+    # 后面的块边界不变，仍能命中分段缓存
+    return zlib.crc32(paragraph.encode('utf-8')) % PACK_BOUNDARY_MODULUS == 0
+
+
+def _split_sentences(paragraph, max_chars):
+    """过长的段落按句子合并成不超过max_chars的块（单个句子过长时强制截断）"""
+    chunks = []
+    current = ''
+    for sentence in SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_chunks(text, max_chars=TRANSLATION_CHUNK_CHARS):
+    """
+    将文本切分为翻译块：连续的同语言短段落合并为一块（以'\n'连接，不超过max_chars，减少翻译请求数），
+    过长的段落按句子切分，空行不参与翻译
+    :return: [(文本块, 块后的分隔符)]，按顺序拼接（块 + 分隔符）即为原文（长段落中句子间的空白统一为一个空格）
+    """
+    pieces = []
+    pack = []
+    pack_chars = 0
+    pack_language = None
+
+    def end_pack():
+        nonlocal pack, pack_chars, pack_language
+        if pack:
+            pieces.append(('\n'.join(pack), '\n'))
+            pack, pack_chars, pack_language = [], 0, None
+
+    for paragraph in text.split('\n'):
+        if not paragraph.strip():
+            # 空行并入前一块的分隔符
+            end_pack()
+            if pieces:
+                pieces[-1] = (pieces[-1][0], pieces[-1][1] + paragraph + '\n')
+            else:
+                pieces.append(('', paragraph + '\n'))
+            continue
+
+        if len(paragraph) > max_chars:
+            end_pack()
+            chunks = _split_sentences(paragraph, max_chars)
+            pieces.extend((chunk, ' ') for chunk in chunks[:-1])
+            pieces.append((chunks[-1], '\n'))
+            continue
+
+        language = _language(paragraph)
+        if pack and (pack_chars + 1 + len(paragraph) > max_chars or
+                     None not in (language, pack_language) and language != pack_language):
+            end_pack()
+        pack.append(paragraph)
+        pack_chars += len(paragraph) + 1
+        if pack_language is None:
+            pack_language = language
+        if _is_pack_boundary(paragraph):
+            end_pack()
+    end_pack()
+
+    # 每个段落后都加了'\n'，最后一个段落后面没有
+    pieces[-1] = (pieces[-1][0], pieces[-1][1][:-1])
+    return pieces
+
+
+# ====================== 翻译 ======================
+def translate_chunk(chunk, translator=TRANSLATOR, breaker=None):
+    """
+    翻译单个文本块（非英文/空白块原样返回，结果按内容缓存）；
+    合并了多个段落的块翻译后按'\n'拆回各段，段数对不上时改为逐段翻译，保证段落与原文一一对应
+    :param breaker: 熔断器（TranslationBreaker），已熔断时不再请求翻译
+    :return: 译文（翻译失败时返回原文）
+    """
+    return _translate_chunk(chunk, translator, breaker)[0]
+
+
+def _translate_chunk(chunk, translator, breaker):
+    """:return: (译文, 是否成功)，失败的内容（全部或部分为原文）不写入缓存"""
+    if not chunk.strip() or not is_english(chunk):
+        return chunk, True
+
+    cache_key = ContentCache.make_key('chunk', translator, chunk)
+    cached = chunk_cache.get(cache_key)
+    if cached is not None:
+        return cached['text'], True
+
+    if breaker is not None and breaker.is_open:
+        return chunk, False
+    try:
+        _rate_limiter.wait()
+        translated = get_translator(translator)(chunk)
+    except Exception as e:
+        print(f"翻译失败: {e}")
+        if breaker is not None:
+            breaker.record(False)
+        return chunk, False
+    if breaker is not None:
+        breaker.record(True)
+
+    paragraphs = chunk.split('\n')
+    if len(paragraphs) > 1 and len(translated.split('\n')) != len(paragraphs):
+        results = [_translate_chunk(paragraph, translator, breaker) for paragraph in paragraphs]
+        translated = '\n'.join(text for text, _ in results)
+        if not all(success for _, success in results):
+            return translated, False
+
+    chunk_cache.put(cache_key, {'text': translated})
+    return translated, True
+
+
+def translate_text(text, translator=TRANSLATOR, breaker=None):
+    """
+    翻译长文本（英文转中文）：分段后并发翻译，按原顺序拼接
+    :param text: 原文
+    :param translator: 翻译引擎名称
+    :param breaker: 熔断器（同一任务多次调用时传入同一个，默认每次调用单独计数）
+    :return: 译文
+    """
+    if not text or not is_english(text):
+        return text
+
+    breaker = breaker or TranslationBreaker()
+    pieces = split_chunks(text)
+    if len(pieces) == 1:
+        return translate_chunk(pieces[0][0], translator, breaker)
+
+    with ThreadPoolExecutor(max_workers=TRANSLATION_WORKERS) as executor:
+        translated = executor.map(lambda piece: translate_chunk(piece[0], translator, breaker), pieces)
+        return ''.join(chunk + separator for chunk, (_, separator) in zip(translated, pieces))
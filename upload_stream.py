@@ -0,0 +1,97 @@
+import os
+import hashlib
+import tempfile
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import UPLOAD_TEMP_FOLDER, UPLOAD_BUFFER_SIZE, UPLOAD_HASH_ALGORITHM, MAX_UPLOAD_BYTES
+
+
+def new_hasher(algorithm=UPLOAD_HASH_ALGORITHM):
+    """创建文件哈希对象（blake2b输出32字节，十六进制64位，与file_hash字段长度一致）"""
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=32)
+    return hashlib.new(algorithm)
+
+
+class HashingFile:
+    """
+    上传文件容器：数据边写入临时文件边计算哈希，超过大小上限立即中止，
+    接收完成后用claim()原子地移动到最终位置，无需再次读取文件
+    """
+
+    def __init__(self, max_bytes=MAX_UPLOAD_BYTES, algorithm=UPLOAD_HASH_ALGORITHM,
+                 buffer_size=UPLOAD_BUFFER_SIZE, temp_dir=UPLOAD_TEMP_FOLDER):
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix='upload_', suffix='.part', dir=temp_dir)
+        self._file = os.fdopen(fd, 'w+b', buffering=buffer_size)
+        self._hasher = new_hasher(algorithm)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.claimed = False
+
+    @classmethod
+    def from_stream(cls, stream, buffer_size=UPLOAD_BUFFER_SIZE, **kwargs):
+        """从已有文件流复制（用于非UploadRequest接收的文件）"""
+        container = cls(buffer_size=buffer_size, **kwargs)
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(buffer_size), b""):
+            container.write(chunk)
+        container.seek(0)
+        return container
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            # 超限立即删除已写入的部分，不再继续接收
+            self.close()
+            raise RequestEntityTooLarge(f"文件超过大小上限{self.max_bytes // (1024 * 1024)}MB")
+        self._hasher.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hasher.hexdigest()
+
+    def claim(self, dest_path):
+        """
+        将临时文件移动到dest_path
+        :return: 是否移动（dest_path已存在相同内容的文件时丢弃临时文件，返回False）
+        """
+        self._file.flush()
+        if os.path.exists(dest_path):
+            self.close()
+            return False
+        os.replace(self.path, dest_path)
+        self.claimed = True
+        return True
+
+    def close(self):
+        """关闭文件；未被claim()的临时文件随之删除"""
+        self._file.close()
+        if not self.claimed:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        # read/seek/tell等操作交给底层文件
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """上传的文件直接流式写入HashingFile（替代werkzeug默认的临时文件），请求结束时清理未使用的临时文件"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        container = HashingFile()
+        self.__dict__.setdefault('_upload_containers', []).append(container)
+        return container
+
+    def close(self):
+        super().close()
+        # 解析中途失败（如超限、客户端断开）的文件不在request.files中，这里一并清理
+        for container in self.__dict__.get('_upload_containers', ()):
+            if not container.closed:
+                container.close()
@@ -1,24 +1,65 @@
 import os
-import shutil
+import time
 import hashlib
+import threading
 from docx import Document as DocxDocument
 from PyPDF2 import PdfReader
-import translators as ts
-from marker.converters.pdf import PdfConverter
-from marker.models import create_model_dict
-from marker.config.parser import ConfigParser
-from marker.output import text_from_rendered
-from config import UPLOAD_FOLDER, MARKER_CONFIG
-
-# 初始化Marker PDF解析器（保留原代码）
-config_parser = ConfigParser(MARKER_CONFIG)
-pdf_converter = PdfConverter(
-    config=config_parser.generate_config_dict(),
-    artifact_dict=create_model_dict(),
-    processor_list=config_parser.get_processors(),
-    renderer=config_parser.get_renderer(),
-    llm_service=config_parser.get_llm_service()
-)
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import UPLOAD_FOLDER, MARKER_CONFIG, MAX_UPLOAD_BYTES, UPLOAD_BUFFER_SIZE, PARSE_SEGMENT_CHARS, \
+    PDF_PAGE_BATCH, PDF_TEXT_MIN_CHARS
+from upload_stream import HashingFile, new_hasher
+import translation
+
+# Marker模型：首次需要Marker解析PDF时才加载（Web进程、脚本导入本模块时不加载）
+_marker_models = None
+_marker_models_lock = threading.Lock()
+# 模型加载耗时（秒），未加载时为None
+pdf_converter_load_seconds = None
+
+
+def get_marker_models():
+    """获取Marker模型（懒加载，进程内只加载一次，各PdfConverter共享）"""
+    global _marker_models, pdf_converter_load_seconds
+    if _marker_models is None:
+        with _marker_models_lock:
+            if _marker_models is None:
+                start = time.perf_counter()
+                from marker.models import create_model_dict
+
+                _marker_models = create_model_dict()
+                pdf_converter_load_seconds = time.perf_counter() - start
+                print(f"Marker模型加载完成，耗时{pdf_converter_load_seconds:.2f}秒（进程{os.getpid()}）")
+    return _marker_models
+
+
+def get_pdf_converter(page_range=None):
+    """
+    创建Marker PDF解析器（模型只加载一次，解析器本身创建开销很小）
+    :param page_range: 只解析指定页，如"0-9"（从0开始），None表示全部页
+    """
+    from marker.converters.pdf import PdfConverter
+    from marker.config.parser import ConfigParser
+
+    config = dict(MARKER_CONFIG)
+    if page_range:
+        config['page_range'] = page_range
+    config_parser = ConfigParser(config)
+    return PdfConverter(
+        config=config_parser.generate_config_dict(),
+        artifact_dict=get_marker_models(),
+        processor_list=config_parser.get_processors(),
+        renderer=config_parser.get_renderer(),
+        llm_service=config_parser.get_llm_service()
+    )
+
+
+def warm_up_pdf_converter():
+    """
+    预热Marker模型（供解析进程启动时调用）
+    :return: 模型加载耗时（秒）
+    """
+    get_marker_models()
+    return pdf_converter_load_seconds
 
 
 # 检查允许的文件类型（保留原代码）
@@ -29,26 +70,26 @@ def allowed_file(filename):
 # ========== 修复：重构哈希计算函数 ==========
 def generate_file_hash(file_obj, is_stream=True):
     """
-    计算文件哈希值
+    计算文件哈希值（算法由UPLOAD_HASH_ALGORITHM配置）
     :param file_obj: 文件流对象 或 文件路径字符串
     :param is_stream: 是否为文件流（True）或文件路径（False）
     :return: 哈希值字符串
     """
-    hash_md5 = hashlib.md5()
+    hasher = new_hasher()
     try:
         if is_stream:
             # 处理文件流：先重置指针，再分块读取
             file_obj.seek(0)
-            for chunk in iter(lambda: file_obj.read(4096), b""):
-                hash_md5.update(chunk)
+            for chunk in iter(lambda: file_obj.read(UPLOAD_BUFFER_SIZE), b""):
+                hasher.update(chunk)
             # 重置指针，供后续使用
             file_obj.seek(0)
         else:
             # 处理文件路径
             with open(file_obj, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+                for chunk in iter(lambda: f.read(UPLOAD_BUFFER_SIZE), b""):
+                    hasher.update(chunk)
+        return hasher.hexdigest()
     except Exception as e:
         print(f"计算文件哈希失败：{e}")
         # 生成随机哈希避免冲突
@@ -57,94 +98,143 @@ def generate_file_hash(file_obj, is_stream=True):
 
 # 解析文档内容（保留原代码，增加异常捕获）
 def parse_document(file_path, file_type):
-    content = ""
     try:
-        if file_type in ['txt', 'md']:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-        elif file_type in ['doc', 'docx']:
-            doc = DocxDocument(file_path)
-            for para in doc.paragraphs:
-                content += para.text + '\n'
-        elif file_type == 'pdf':
-            # 使用Marker解析PDF为markdown
-            rendered = pdf_converter(file_path)
-            content, _, _ = text_from_rendered(rendered)
+        return _parse_document(file_path, file_type)
     except Exception as e:
         print(f"解析文档失败: {e}")
-        content = f"解析失败: {str(e)}"
-    return content.strip()
+        return f"解析失败: {str(e)}"
+
 
+# 解析文档内容（解析失败时抛出异常，由调用方决定如何处理）
+def _parse_document(file_path, file_type):
+    segments = (segment for segment, _ in iter_document_segments(file_path, file_type) if segment)
+    return '\n'.join(segments).strip()
 
-# 翻译文本（英文转中文，保留原代码）
-def translate_text(text):
+
+def iter_document_segments(file_path, file_type):
+    """
+    逐段解析文档（生成器）：每段约PARSE_SEGMENT_CHARS个字符（PDF为一批页），不在内存中拼接全文
+    :param file_path: 文件存储路径
+    :param file_type: 文件类型（txt/md/doc/docx/pdf）
+    :return: 生成器，产出(文本段, 解析进度0-1)
+    """
+    if file_type in ['txt', 'md']:
+        yield from _iter_text_segments(file_path)
+    elif file_type in ['doc', 'docx']:
+        yield from _iter_docx_segments(file_path)
+    elif file_type == 'pdf':
+        yield from _iter_pdf_segments(file_path)
+
+
+def _iter_text_segments(file_path):
+    total_bytes = os.path.getsize(file_path) or 1
+    read_bytes = 0
+    lines = []
+    size = 0
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            read_bytes += len(line.encode('utf-8'))
+            if size >= PARSE_SEGMENT_CHARS:
+                yield ''.join(lines).rstrip('\n'), min(read_bytes / total_bytes, 1.0)
+                lines = []
+                size = 0
+    if lines:
+        yield ''.join(lines).rstrip('\n'), 1.0
+
+
+def _iter_docx_segments(file_path):
+    paragraphs = DocxDocument(file_path).paragraphs
+    total = len(paragraphs) or 1
+    texts = []
+    size = 0
+    for i, para in enumerate(paragraphs, start=1):
+        texts.append(para.text)
+        size += len(para.text) + 1
+        if size >= PARSE_SEGMENT_CHARS:
+            yield '\n'.join(texts), i / total
+            texts = []
+            size = 0
+    if texts:
+        yield '\n'.join(texts), 1.0
+
+
+def _marker_pdf_text(file_path, page_range=None):
+    """用Marker解析PDF（指定页）为markdown"""
+    from marker.output import text_from_rendered
+    rendered = get_pdf_converter(page_range)(file_path)
+    text, _, _ = text_from_rendered(rendered)
+    return text.strip()
+
+
+def _iter_pdf_segments(file_path):
+    """
+    按PDF_PAGE_BATCH页一批解析：有文本层的页直接用PyPDF2提取（快），
+    文本过少（扫描件等）的批次再交给Marker解析
+    """
     try:
-        # 判断是否为英文（简单判断：包含较多英文字母）
-        english_chars = sum(1 for c in text if c.isalpha() and c.isascii())
-        total_chars = sum(1 for c in text if c.isalpha())
-        if total_chars > 0 and english_chars / total_chars > 0.8:
-            translated = ts.translate_text(text, translator='youdao', to_language='zh')
-            return translated
-        return text
+        reader = PdfReader(file_path)
+        total = len(reader.pages)
     except Exception as e:
-        print(f"翻译失败: {e}")
-        return text
+        # PyPDF2无法读取的文件整体交给Marker
+        print(f"PyPDF2读取PDF失败，改用Marker解析：{e}")
+        yield _marker_pdf_text(file_path), 1.0
+        return
+
+    for start in range(0, total, PDF_PAGE_BATCH):
+        end = min(start + PDF_PAGE_BATCH, total)
+        texts = [(reader.pages[i].extract_text() or '').strip() for i in range(start, end)]
+        if sum(len(text) for text in texts) >= PDF_TEXT_MIN_CHARS * (end - start):
+            yield '\n'.join(text for text in texts if text), end / total
+        else:
+            yield _marker_pdf_text(file_path, f"{start}-{end - 1}"), end / total
+
+
+# 翻译文本（英文转中文，分段并发翻译，见translation.py）
+def translate_text(text, breaker=None):
+    return translation.translate_text(text, breaker=breaker)
 
 
 # ========== 修复：重构文件保存函数 ==========
 def save_uploaded_file(file):
     """
-    保存上传的文件并解析内容
+    保存上传的文件（解析与翻译交给后台任务队列，见ingestion.py）
+    文件在接收时已边写入临时文件边计算哈希（见upload_stream.py），这里只需移动到最终位置
     :param file: Flask上传的File对象
     :return: (结果字典/None, 提示信息)
     """
+    container = None
     try:
         if not allowed_file(file.filename):
             return None, "不支持的文件类型（仅支持txt/md/doc/docx/pdf）"
 
-        # 1. 生成临时文件路径（先保存文件）
-        file_ext = file.filename.rsplit('.', 1)[1].lower()
-        temp_filename = f"temp_{hash(file.filename)}_{os.urandom(4).hex()}.{file_ext}"
-        temp_file_path = os.path.join(UPLOAD_FOLDER, temp_filename)
-
-        # 2. 保存临时文件（关键：先保存再计算哈希）
-        file.stream.seek(0)  # 重置文件流指针
-        with open(temp_file_path, 'wb') as f:
-            shutil.copyfileobj(file.stream, f)
+        container = file.stream
+        if not isinstance(container, HashingFile):
+            # 未经UploadRequest接收的文件流：复制到临时文件的同时计算哈希
+            container = HashingFile.from_stream(file.stream)
+        file_hash = container.hexdigest()
 
-        # 3. 计算文件哈希（传文件路径，而非文件流）
-        file_hash = generate_file_hash(temp_file_path, is_stream=False)
-
-        # 4. 生成最终文件名（避免重复）
+        # 按内容哈希命名：相同内容的文件已存在时直接丢弃临时文件
+        file_ext = file.filename.rsplit('.', 1)[1].lower()
         final_filename = f"{file_hash}.{file_ext}"
         final_file_path = os.path.join(UPLOAD_FOLDER, final_filename)
-
-        # 5. 移动/重命名临时文件（避免重复保存）
-        if not os.path.exists(final_file_path):
-            os.rename(temp_file_path, final_file_path)
-        else:
-            # 如果文件已存在，删除临时文件
-            os.remove(temp_file_path)
-
-        # 6. 解析文件内容
-        content = parse_document(final_file_path, file_ext)
-        # 7. 翻译内容
-        translated_content = translate_text(content)
+        container.claim(final_file_path)
 
         return {
             'filename': final_filename,
             'file_path': final_file_path,
             'file_type': file_ext,
-            'content': content,
-            'translated_content': translated_content
+            'file_hash': file_hash,
+            'file_size': container.size
         }, "成功"
 
+    except RequestEntityTooLarge:
+        return None, f"文件过大（最大{MAX_UPLOAD_BYTES // (1024 * 1024)}MB）"
     except Exception as e:
         print(f"保存上传文件失败：{e}")
-        # 清理临时文件
-        try:
-            if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-        except:
-            pass
-        return None, f"文件处理失败：{str(e)}"
\ No newline at end of file
+        return None, f"文件处理失败：{str(e)}"
+    finally:
+        # 关闭时自动删除未移动的临时文件
+        if container is not None:
+            container.close()